@@ -0,0 +1,95 @@
+"""
+Agregacion de aristas duplicadas entre sentencias
+La misma relacion origen -> destino se emite muchas veces (insert overwrite repetidos,
+varias sentencias alimentando la misma tabla): lineage_from_statement genera un registro
+por sentencia y el notebook luego deduplica con seen_edges en cada cierre.
+
+Notas:
+- nivel 'tablas': clave (tabla_origen, tabla_destino)
+- nivel 'campos': clave (tabla_origen, campo_origen, tabla_destino, campo_destino)
+- cada arista agregada lleva conteo, ids de sentencia (consulta_id), transformaciones/recomendaciones
+  distintas en orden de aparicion y el sql de las primeras max_consultas sentencias
+- AcumuladorAristas es la etapa comun: la usan agregar_aristas y los elementos cytoscape de
+  indice_linaje.construir_elementos (cierres, vistas, rutas, cierre progresivo)
+- la pertenencia se resuelve con conjuntos por arista: O(1) por registro aunque una arista junte miles de sentencias
+- el detalle por sentencia sigue accesible: consulta_id -> CatalogoConsultas del snapshot,
+  id de registro -> registro original (agregar_aristas)
+"""
+
+from formato_compacto import CatalogoConsultas
+
+NIVELES_AGREGACION = ('tablas', 'campos')
+
+
+def clave_agregacion(rec: dict, nivel: str) -> tuple:
+    if nivel == 'tablas':
+        return (rec.get('tabla_origen'), rec.get('tabla_destino'))
+    return (rec.get('tabla_origen'), rec.get('campo_origen'), rec.get('tabla_destino'), rec.get('campo_destino'))
+
+
+class AcumuladorAristas:
+    """
+    Acumula registros sobre la data de cada arista (un dict por clave, creado por quien llama).
+    catalogo: CatalogoConsultas donde se registra el sql de cada sentencia (el del snapshot);
+    asi toda consulta_id emitida se puede resolver con responder_consulta.
+    """
+
+    def __init__(self, catalogo: CatalogoConsultas, max_consultas: int = 3, con_ids: bool = False):
+        self.catalogo = catalogo
+        self.max_consultas = max_consultas
+        self.con_ids = con_ids
+        self._vistos = {}  # clave -> (consulta_ids, transformaciones, recomendaciones) como conjuntos
+
+    def agregar(self, clave, data: dict, rec: dict) -> None:
+        vistos = self._vistos.get(clave)
+        if vistos is None:
+            vistos = self._vistos[clave] = (set(), set(), set())
+            data.update({'transformaciones': [], 'recomendaciones': [], 'consultas': [],
+                         'conteo': 0, 'consulta_ids': []})
+            if self.con_ids:
+                data['ids'] = []
+        cids, transformaciones, recomendaciones = vistos
+        t = (rec.get('transformacion_aplicada') or '').strip()
+        if t and t not in transformaciones:
+            transformaciones.add(t)
+            data['transformaciones'].append(t)
+        r = (rec.get('recomendaciones') or '').strip()
+        if r and r not in recomendaciones:
+            recomendaciones.add(r)
+            data['recomendaciones'].append(r)
+        data['conteo'] += 1
+        if self.con_ids and rec.get('id') is not None:
+            data['ids'].append(rec['id'])
+        c = (rec.get('consulta') or '').strip()
+        if c:
+            # todas las sentencias quedan referenciadas por id (resoluble en el catalogo); el texto solo de las primeras
+            cid = self.catalogo.registrar(c)
+            if cid not in cids:
+                cids.add(cid)
+                data['consulta_ids'].append(cid)
+                if len(data['consultas']) < self.max_consultas:
+                    data['consultas'].append(c)
+
+
+def agregar_aristas(registros, nivel: str = 'campos', *, catalogo: CatalogoConsultas,
+                    max_consultas: int = 3) -> list:
+    """
+    Colapsa registros duplicados en una arista por clave. Retorna lista en orden de primera aparicion:
+    {tabla_origen, tabla_destino, [campo_origen, campo_destino], transformaciones, recomendaciones,
+     consultas, conteo, consulta_ids, ids}
+    """
+    if nivel not in NIVELES_AGREGACION:
+        raise ValueError('nivel no soportado: %s (usar %s)' % (nivel, ', '.join(NIVELES_AGREGACION)))
+    acumulador = AcumuladorAristas(catalogo, max_consultas, con_ids=True)
+    aristas = {}
+    for rec in registros:
+        clave = clave_agregacion(rec, nivel)
+        arista = aristas.get(clave)
+        if arista is None:
+            arista = {'tabla_origen': rec.get('tabla_origen'), 'tabla_destino': rec.get('tabla_destino')}
+            if nivel == 'campos':
+                arista['campo_origen'] = rec.get('campo_origen')
+                arista['campo_destino'] = rec.get('campo_destino')
+            aristas[clave] = arista
+        acumulador.agregar(clave, arista, rec)
+    return list(aristas.values())
@@ -0,0 +1,308 @@
+"""
+Almacen de linaje embebido en SQLite (sin servidor)
+Alternativa a guardar_linaje_en_json: en vez de un json monolitico que cada consumidor
+debe cargar completo, se persisten sentencias, nombres y aristas en tablas indexadas.
+
+Notas:
+- tablas: sentencias (sql una sola vez por texto), nombres (tablas, con zona e iniciable), aristas
+  (los campos van como texto en la arista)
+- una arista se identifica por su contenido (hash de consulta + tablas/campos + transformacion), no por
+  el id uuid4 que linaje.py regenera en cada corrida: reingestar el mismo linaje no duplica filas
+- cada ingesta es una corrida; con reemplazar=True, al terminar se borran las aristas de corridas
+  anteriores que la nueva no volvio a escribir (linaje que ya no existe)
+- indices por tabla/campo origen y destino: busquedas puntuales sin leer todo el archivo
+- cierres upstream/downstream con CTE recursivo en el propio motor
+- escritura por lotes dentro de una transaccion; los escritores agregan filas sin reescribir el archivo
+- modo WAL: lectores concurrentes (una conexion por proceso/hilo) mientras se agrega una nueva ingesta
+- una misma instancia se puede compartir entre hilos (check_same_thread=False): el uso de la
+  conexion se serializa con un lock (una ingesta en curso bloquea las consultas de esa instancia;
+  para leer durante una ingesta usar otra instancia sobre el mismo archivo)
+
+Uso:
+    from almacen_sqlite import AlmacenLinaje
+    with AlmacenLinaje('json/linaje.sqlite') as almacen:
+        almacen.agregar_registros(generar_linaje_impala_stream(open('dump.sql')))
+        almacen.cierre_upstream('resultados_bipa_vpr.tb_fact_prestamos')
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+
+from nombres_linaje import SIMBOLOS, es_tabla_iniciable, tipo_zona, zona_de_tabla
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS sentencias (
+    id INTEGER PRIMARY KEY,
+    hash TEXT NOT NULL UNIQUE,
+    consulta TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS nombres (
+    id INTEGER PRIMARY KEY,
+    nombre TEXT NOT NULL UNIQUE,
+    zona TEXT,
+    tipo_zona TEXT,
+    iniciable INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS corridas (
+    id INTEGER PRIMARY KEY,
+    inicio TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS aristas (
+    clave TEXT PRIMARY KEY,
+    id TEXT,
+    corrida_id INTEGER REFERENCES corridas(id),
+    sentencia_id INTEGER REFERENCES sentencias(id),
+    tabla_origen INTEGER REFERENCES nombres(id),
+    tabla_destino INTEGER REFERENCES nombres(id),
+    campo_origen TEXT,
+    campo_destino TEXT,
+    transformacion_aplicada TEXT,
+    recomendaciones TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_aristas_origen ON aristas (tabla_origen, campo_origen);
+CREATE INDEX IF NOT EXISTS ix_aristas_destino ON aristas (tabla_destino, campo_destino);
+CREATE INDEX IF NOT EXISTS ix_aristas_sentencia ON aristas (sentencia_id);
+CREATE INDEX IF NOT EXISTS ix_aristas_corrida ON aristas (corrida_id);
+"""
+
+_COLUMNAS_REGISTRO = """
+a.id, s.consulta, o.nombre, d.nombre, a.campo_origen, a.campo_destino,
+a.transformacion_aplicada, a.recomendaciones
+FROM aristas a
+LEFT JOIN sentencias s ON s.id = a.sentencia_id
+LEFT JOIN nombres o ON o.id = a.tabla_origen
+LEFT JOIN nombres d ON d.id = a.tabla_destino
+"""
+_SELECT_REGISTRO = 'SELECT' + _COLUMNAS_REGISTRO
+
+# cierre upstream (params: tabla, restringido); restringido replica computeUpstreamClosureConstrained
+_CTE_CIERRE_UPSTREAM = """
+WITH RECURSIVE cierre(id, iniciable) AS (
+    SELECT id, 1 FROM nombres WHERE nombre = ?
+    UNION
+    SELECT a.tabla_origen, n.iniciable
+    FROM aristas a
+    JOIN cierre c ON a.tabla_destino = c.id
+    JOIN nombres n ON n.id = a.tabla_origen
+    WHERE c.iniciable = 1 OR ? = 0
+)
+"""
+
+_CAMPOS_REGISTRO = ('id', 'consulta', 'tabla_origen', 'tabla_destino', 'campo_origen', 'campo_destino',
+                    'transformacion_aplicada', 'recomendaciones')
+
+
+def _hash_consulta(consulta: str) -> str:
+    return hashlib.sha1(consulta.encode('utf-8')).hexdigest()
+
+
+def clave_contenido(rec: dict) -> str:
+    """Identidad de la arista por contenido (estable entre corridas de linaje.py, a diferencia del id)."""
+    consulta = rec.get('consulta')
+    partes = [_hash_consulta(consulta) if consulta else None]
+    partes.extend(rec.get(k) for k in ('tabla_origen', 'tabla_destino', 'campo_origen', 'campo_destino',
+                                        'transformacion_aplicada'))
+    return hashlib.sha1(json.dumps(partes, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class AlmacenLinaje:
+    """Conexion a un archivo sqlite de linaje (se crea con su esquema si no existe)."""
+
+    def __init__(self, ruta: str = 'json/linaje.sqlite'):
+        if ruta != ':memory:':
+            os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+        self.ruta = ruta
+        self.con = sqlite3.connect(ruta, check_same_thread=False)
+        self._lock = threading.RLock()
+        self.con.execute('PRAGMA journal_mode=WAL')
+        self.con.execute('PRAGMA synchronous=NORMAL')
+        self.con.executescript(_ESQUEMA)
+        self._ids_nombre = {}
+        self._ids_sentencia = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def cerrar(self) -> None:
+        with self._lock:
+            self.con.close()
+
+    # -------------------------
+    # Escritura
+    # -------------------------
+
+    def _id_nombre(self, nombre: str) -> int:
+        if not nombre:
+            return None
+        nid = self._ids_nombre.get(nombre)
+        if nid is None:
+            norm = SIMBOLOS.texto(nombre)
+            zona = zona_de_tabla(norm)
+            self.con.execute(
+                'INSERT OR IGNORE INTO nombres (nombre, zona, tipo_zona, iniciable) VALUES (?, ?, ?, ?)',
+                (norm, zona, tipo_zona(zona), int(es_tabla_iniciable(norm))))
+            nid = self.con.execute('SELECT id FROM nombres WHERE nombre = ?', (norm,)).fetchone()[0]
+            self._ids_nombre[nombre] = nid
+        return nid
+
+    def _id_sentencia(self, consulta: str) -> int:
+        if not consulta:
+            return None
+        h = _hash_consulta(consulta)
+        sid = self._ids_sentencia.get(h)
+        if sid is None:
+            self.con.execute('INSERT OR IGNORE INTO sentencias (hash, consulta) VALUES (?, ?)', (h, consulta))
+            sid = self.con.execute('SELECT id FROM sentencias WHERE hash = ?', (h,)).fetchone()[0]
+            self._ids_sentencia[h] = sid
+        return sid
+
+    def agregar_registros(self, registros, tam_lote: int = 5000, reemplazar: bool = False) -> int:
+        """
+        Agrega registros de linaje (iterable, puede ser un generador) en lotes por transaccion,
+        como una corrida nueva. Una arista con el mismo contenido que otra ya guardada la reemplaza.
+        reemplazar=True: al terminar sin errores se borran las aristas de corridas anteriores que esta
+        corrida no volvio a escribir (el almacen queda igual a la salida de esta corrida).
+        Retorna la cantidad escrita.
+        """
+        with self._lock:
+            with self.con:
+                corrida = self.con.execute('INSERT INTO corridas DEFAULT VALUES').lastrowid
+            n = 0
+            lote = []
+            for rec in registros:
+                lote.append(rec)
+                if len(lote) >= tam_lote:
+                    n += self._escribir_lote(lote, corrida)
+                    lote = []
+            if lote:
+                n += self._escribir_lote(lote, corrida)
+            if reemplazar:
+                with self.con:
+                    self.con.execute('DELETE FROM aristas WHERE corrida_id <> ?', (corrida,))
+            return n
+
+    def _escribir_lote(self, lote: list, corrida: int) -> int:
+        # los caches de ids solo valen si el lote se confirma: ante un rollback se descartan
+        # las entradas agregadas en el lote (los dicts conservan el orden de insercion)
+        n_nombres = len(self._ids_nombre)
+        n_sentencias = len(self._ids_sentencia)
+        try:
+            self._insertar_lote(lote, corrida)
+        except BaseException:
+            for clave in list(self._ids_nombre)[n_nombres:]:
+                del self._ids_nombre[clave]
+            for clave in list(self._ids_sentencia)[n_sentencias:]:
+                del self._ids_sentencia[clave]
+            raise
+        return len(lote)
+
+    def _insertar_lote(self, lote: list, corrida: int) -> None:
+        with self.con:
+            filas = [(
+                clave_contenido(rec),
+                rec.get('id'),
+                corrida,
+                self._id_sentencia(rec.get('consulta')),
+                self._id_nombre(rec.get('tabla_origen')),
+                self._id_nombre(rec.get('tabla_destino')),
+                rec.get('campo_origen'),
+                rec.get('campo_destino'),
+                rec.get('transformacion_aplicada'),
+                rec.get('recomendaciones'),
+            ) for rec in lote]
+            self.con.executemany('INSERT OR REPLACE INTO aristas VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', filas)
+
+    # -------------------------
+    # Consultas
+    # -------------------------
+
+    def _registros(self, where: str, params: tuple) -> list:
+        with self._lock:
+            cur = self.con.execute(_SELECT_REGISTRO + where, params)
+            return [dict(zip(_CAMPOS_REGISTRO, fila)) for fila in cur]
+
+    def _filas(self, sql: str, params: tuple = ()) -> list:
+        with self._lock:
+            return self.con.execute(sql, params).fetchall()
+
+    def relaciones_entrantes(self, tabla: str, campo: str = None) -> list:
+        """Registros cuyo destino es la tabla (y campo, si se indica)."""
+        tabla = SIMBOLOS.texto(tabla)
+        if campo is None:
+            return self._registros('WHERE d.nombre = ?', (tabla,))
+        return self._registros('WHERE d.nombre = ? AND a.campo_destino = ?', (tabla, SIMBOLOS.texto(campo)))
+
+    def relaciones_salientes(self, tabla: str, campo: str = None) -> list:
+        """Registros cuyo origen es la tabla (y campo, si se indica)."""
+        tabla = SIMBOLOS.texto(tabla)
+        if campo is None:
+            return self._registros('WHERE o.nombre = ?', (tabla,))
+        return self._registros('WHERE o.nombre = ? AND a.campo_origen = ?', (tabla, SIMBOLOS.texto(campo)))
+
+    def cierre_upstream(self, tabla: str, restringido: bool = True) -> list:
+        """
+        Tablas upstream de la tabla con CTE recursivo.
+        restringido=True replica computeUpstreamClosureConstrained: incluye todos los origenes
+        pero solo sigue recorriendo desde tablas iniciables (resultados*/proceso*).
+        """
+        sql = _CTE_CIERRE_UPSTREAM + """
+        SELECT DISTINCT n.nombre FROM cierre c JOIN nombres n ON n.id = c.id ORDER BY n.nombre
+        """
+        return [f[0] for f in self._filas(sql, (SIMBOLOS.texto(tabla), int(restringido)))]
+
+    def cierre_downstream(self, tabla: str) -> list:
+        """Tablas downstream de la tabla (origen -> destinos) con CTE recursivo."""
+        sql = """
+        WITH RECURSIVE cierre(id) AS (
+            SELECT id FROM nombres WHERE nombre = ?
+            UNION
+            SELECT a.tabla_destino FROM aristas a JOIN cierre c ON a.tabla_origen = c.id
+            WHERE a.tabla_destino IS NOT NULL
+        )
+        SELECT n.nombre FROM cierre c JOIN nombres n ON n.id = c.id ORDER BY n.nombre
+        """
+        return [f[0] for f in self._filas(sql, (SIMBOLOS.texto(tabla),))]
+
+    def registros_cierre_upstream(self, tabla: str) -> list:
+        """Registros cuyo destino esta en el cierre upstream restringido (lo que el visor dibuja)."""
+        # join contra el propio CTE: sin lista de parametros (limite de variables de sqlite)
+        filas = self._filas(_CTE_CIERRE_UPSTREAM + _SELECT_REGISTRO +
+                            'WHERE a.tabla_destino IN (SELECT id FROM cierre)', (SIMBOLOS.texto(tabla), 1))
+        return [dict(zip(_CAMPOS_REGISTRO, fila)) for fila in filas]
+
+    def consulta(self, sentencia_id: int) -> str:
+        filas = self._filas('SELECT consulta FROM sentencias WHERE id = ?', (sentencia_id,))
+        return filas[0][0] if filas else None
+
+    def iter_registros(self, tam_lote: int = 5000):
+        """Todos los registros en streaming (para exportar o construir indices en memoria)."""
+        # paginado por rowid: el lock se toma por lote y no queda tomado mientras el consumidor itera
+        ultimo = 0
+        while True:
+            filas = self._filas('SELECT a.rowid,' + _COLUMNAS_REGISTRO +
+                                'WHERE a.rowid > ? ORDER BY a.rowid LIMIT ?', (ultimo, tam_lote))
+            if not filas:
+                return
+            for fila in filas:
+                yield dict(zip(_CAMPOS_REGISTRO, fila[1:]))
+            ultimo = filas[-1][0]
+
+    def contar(self) -> dict:
+        return {
+            'aristas': self._filas('SELECT COUNT(*) FROM aristas')[0][0],
+            'sentencias': self._filas('SELECT COUNT(*) FROM sentencias')[0][0],
+            'nombres': self._filas('SELECT COUNT(*) FROM nombres')[0][0],
+            'corridas': self._filas('SELECT COUNT(*) FROM corridas')[0][0],
+        }
+
+
+def guardar_linaje_en_sqlite(datos, ruta: str = 'json/linaje.sqlite') -> int:
+    """Equivalente a guardar_linaje_en_json: el almacen queda con el linaje de esta corrida."""
+    with AlmacenLinaje(ruta) as almacen:
+        return almacen.agregar_registros(datos, reemplazar=True)
@@ -0,0 +1,214 @@
+"""
+Envio progresivo del cierre de linaje (nivel por nivel) hacia el cliente
+Con linaje profundo el front espera el cierre completo antes de que drawGraph dibuje algo.
+Aqui el recorrido BFS sobre el indice produce eventos por nivel que se pueden enviar como
+NDJSON (chunked) o Server-Sent Events a medida que se calculan.
+
+Notas:
+- upstream respeta computeUpstreamClosureConstrained: se emiten las aristas entrantes de cada
+  tabla del cierre, pero solo se sigue recorriendo desde tablas resultados*/proceso*
+  (la union de los eventos = IndiceNivel.posiciones_filtradas(tabla=...))
+- downstream sigue salientes (igual que IndiceNivel.cierre_downstream)
+- las aristas de un nivel se agregan una sola vez con todos sus registros (cada arista sale en un
+  solo evento, con todas sus consultas); niveles muy anchos se parten en lotes de tam_lote aristas
+- cada evento trae solo nodos nuevos (un nodo se envia la primera vez que aparece, antes que
+  las aristas que lo usan) y sus aristas
+- un nodo tabla ya enviado que gana columnas en un nivel posterior vuelve en 'updates' con la data
+  completa (union de columnas enviadas): el cliente la aplica con cy.getElementById(id).data(...)
+- cancelacion con threading.Event: se revisa entre lotes; CancelacionesPorCliente cancela el
+  stream anterior de un cliente cuando pide otra tabla
+"""
+
+import json
+import threading
+
+from indice_linaje import construir_elementos
+from nombres_linaje import SIMBOLOS
+
+DIRECCIONES = ('upstream', 'downstream')
+TAM_LOTE_POR_DEFECTO = 500
+
+
+def _expandir_upstream(indice_nivel, frontera: list, cierre: set, inicio: int, ocultar_lz: bool):
+    """Posiciones del nivel y siguiente frontera (origenes nuevos de tablas iniciables)."""
+    posiciones = []
+    siguiente = []
+    for dest in frontera:
+        recorrer = dest == inicio or SIMBOLOS.tabla(dest).iniciable
+        for pos in indice_nivel.entrantes.get(dest, ()):
+            origen = indice_nivel.origen[pos]
+            if ocultar_lz and SIMBOLOS.tabla(origen).es_lz:
+                continue
+            posiciones.append(pos)
+            if recorrer and origen not in cierre:
+                cierre.add(origen)
+                siguiente.append(origen)
+    return posiciones, siguiente
+
+
+def _expandir_downstream(indice_nivel, frontera: list, cierre: set, inicio: int, ocultar_lz: bool):
+    posiciones = []
+    siguiente = []
+    for origen in frontera:
+        if ocultar_lz and SIMBOLOS.tabla(origen).es_lz:
+            continue
+        for pos in indice_nivel.salientes.get(origen, ()):
+            posiciones.append(pos)
+            dest = indice_nivel.destino[pos]
+            if dest not in cierre:
+                cierre.add(dest)
+                siguiente.append(dest)
+    return posiciones, siguiente
+
+
+def iter_cierre_por_niveles(indice_nivel, tabla, direccion: str = 'upstream', ocultar_lz: bool = False,
+                            cancelar: threading.Event = None, max_niveles: int = None,
+                            tam_lote: int = TAM_LOTE_POR_DEFECTO):
+    """
+    Generador de eventos del cierre, en orden BFS:
+        {'event': 'level', 'level': n, 'nodes': [...], 'updates': [...], 'edges': [...], 'records': k}
+        ...
+    (un nivel puede salir en varios eventos; records va en el primero y 0 en los siguientes)
+        {'event': 'done', 'levels': n, 'nodes': total, 'updates': total, 'edges': total, 'cancelled': bool}
+    Los elementos tienen el formato de indice_linaje.construir_elementos.
+    """
+    if direccion not in DIRECCIONES:
+        raise ValueError('direccion no soportada: %s (usar %s)' % (direccion, ', '.join(DIRECCIONES)))
+    expandir = _expandir_upstream if direccion == 'upstream' else _expandir_downstream
+    inicio = SIMBOLOS.buscar_tabla(tabla) if isinstance(tabla, str) else tabla
+    enviados = {}  # id de nodo -> (columnas enviadas en orden, mismo contenido como conjunto)
+    total_nodos = 0
+    total_actualizados = 0
+    total_aristas = 0
+    nivel = 0
+    cancelado = False
+    if inicio is not None:
+        cierre = {inicio}
+        frontera = [inicio]
+        while frontera and (max_niveles is None or nivel < max_niveles):
+            if cancelar is not None and cancelar.is_set():
+                cancelado = True
+                break
+            posiciones, frontera = expandir(indice_nivel, frontera, cierre, inicio, ocultar_lz)
+            registros = [indice_nivel.registros[p] for p in posiciones]
+            elementos = construir_elementos(registros, indice_nivel.nivel, catalogo=indice_nivel.catalogo)
+            nodos_nivel = {n['data']['id']: n for n in elementos['nodes']}
+            aristas = elementos['edges']
+            pendientes_registros = len(registros)
+            for i in range(0, max(len(aristas), 1), tam_lote):
+                if cancelar is not None and cancelar.is_set():
+                    cancelado = True
+                    break
+                lote = aristas[i:i + tam_lote]
+                ids = []
+                for arista in lote:
+                    ids.append(arista['data']['source'])
+                    ids.append(arista['data']['target'])
+                if i + tam_lote >= len(aristas):
+                    ids.extend(nodos_nivel)  # el ultimo lote lleva los nodos que falten
+                nodos = []
+                actualizados = []
+                for nid in ids:
+                    _agregar_nodo(nodos_nivel, nid, enviados, nodos, actualizados)
+                if not nodos and not actualizados and not lote and not pendientes_registros:
+                    continue
+                total_nodos += len(nodos)
+                total_actualizados += len(actualizados)
+                total_aristas += len(lote)
+                yield {'event': 'level', 'level': nivel, 'nodes': nodos, 'updates': actualizados, 'edges': lote,
+                       'records': pendientes_registros}
+                pendientes_registros = 0
+            if cancelado:
+                break
+            nivel += 1
+    yield {'event': 'done', 'levels': nivel, 'nodes': total_nodos, 'updates': total_actualizados,
+           'edges': total_aristas, 'cancelled': cancelado}
+
+
+def _agregar_nodo(nodos_nivel: dict, nid: str, enviados: dict, nodos: list, actualizados: list) -> None:
+    """
+    Agrega el nodo (y antes su padre, en nivel campos) si todavia no se envio. Si ya se envio
+    y en este nivel trae columnas nuevas, agrega a actualizados una copia con la union de columnas.
+    """
+    nodo = nodos_nivel.get(nid)
+    if nodo is None:
+        return
+    columnas = nodo['data'].get('columns')
+    previas = enviados.get(nid)
+    if previas is None:
+        padre = nodo['data'].get('parent')
+        if padre:
+            _agregar_nodo(nodos_nivel, padre, enviados, nodos, actualizados)
+        enviados[nid] = (list(columnas or ()), set(columnas or ()))
+        nodos.append(nodo)
+        return
+    orden, vistas = previas
+    nuevas = [c for c in columnas or () if c not in vistas]
+    if nuevas:
+        orden.extend(nuevas)
+        vistas.update(nuevas)
+        actualizados.append({'data': dict(nodo['data'], columns=list(orden)), 'classes': nodo['classes']})
+
+
+# -------------------------
+# Serializacion para el transporte
+# -------------------------
+
+def a_ndjson(eventos):
+    """Un objeto json por linea (Content-Type: application/x-ndjson, Transfer-Encoding: chunked)."""
+    for ev in eventos:
+        yield (json.dumps(ev, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+def a_sse(eventos):
+    """Server-Sent Events (Content-Type: text/event-stream); el nombre del evento va en 'event:'."""
+    for ev in eventos:
+        datos = json.dumps(ev, ensure_ascii=False, separators=(',', ':'))
+        yield ('event: %s\ndata: %s\n\n' % (ev['event'], datos)).encode('utf-8')
+
+
+FORMATOS_STREAM = {
+    'ndjson': ('application/x-ndjson', a_ndjson),
+    'sse': ('text/event-stream', a_sse),
+}
+
+
+def responder_cierre_stream(indice_nivel, tabla, formato: str = 'ndjson', cancelar: threading.Event = None,
+                            **kwargs):
+    """(status, headers, cuerpo iterable de bytes) para el endpoint de cierre progresivo."""
+    if formato not in FORMATOS_STREAM:
+        raise ValueError('formato no soportado: %s (usar %s)' % (formato, ', '.join(FORMATOS_STREAM)))
+    tipo, serializar = FORMATOS_STREAM[formato]
+    headers = {'Content-Type': tipo + '; charset=utf-8', 'Cache-Control': 'no-cache'}
+    if formato == 'sse':
+        headers['X-Accel-Buffering'] = 'no'  # que el proxy no acumule el stream
+    return 200, headers, serializar(iter_cierre_por_niveles(indice_nivel, tabla, cancelar=cancelar, **kwargs))
+
+
+class CancelacionesPorCliente:
+    """Un Event por cliente: pedir un stream nuevo cancela el anterior del mismo cliente."""
+
+    def __init__(self):
+        self._eventos = {}
+        self._lock = threading.Lock()
+
+    def nuevo(self, cliente: str) -> threading.Event:
+        evento = threading.Event()
+        with self._lock:
+            previo = self._eventos.get(cliente)
+            self._eventos[cliente] = evento
+        if previo is not None:
+            previo.set()
+        return evento
+
+    def cancelar(self, cliente: str) -> None:
+        with self._lock:
+            evento = self._eventos.pop(cliente, None)
+        if evento is not None:
+            evento.set()
+
+    def terminar(self, cliente: str, evento: threading.Event) -> None:
+        """Quita el Event al terminar el stream (si no fue reemplazado por otro)."""
+        with self._lock:
+            if self._eventos.get(cliente) is evento:
+                del self._eventos[cliente]
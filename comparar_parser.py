@@ -0,0 +1,222 @@
+"""
+Arnes diferencial para cambios de rendimiento en el parser de linaje
+Cualquier reescritura de find_top_level_keyword, top_level_split o parse_select_item puede
+cambiar el linaje sin que nadie lo note. Este script reproduce un corpus sql con la
+implementacion de referencia (linaje.generar_linaje_impala) y con una candidata, compara
+los registros sentencia por sentencia y reporta diferencias y speedup por categoria.
+
+Notas:
+- candidata y referencia se indican como 'modulo:funcion' o 'ruta/archivo.py:funcion';
+  la funcion recibe texto sql y retorna la lista de registros
+- normalizacion: se descarta el id (uuid4) y se comparan los registros como multiconjunto
+  (el orden dentro de la sentencia no importa)
+- categorias = clases de linaje.clasificar_sentencia (insert, create, with, select, drop, ...)
+- tiempos: mejor de --repeticiones corridas por sentencia (reduce ruido de gc / cache)
+- por defecto se desactiva el presupuesto de tiempo por sentencia en ambos lados: una
+  degradacion por tiempo depende de la maquina y no es una diferencia real
+- codigo de salida 1 si hay diferencias (sirve como gate en CI)
+
+Uso:
+    python comparar_parser.py corpus/ --candidata linaje_opt.py:generar_linaje_impala
+    python comparar_parser.py a.sql b.sql --candidata mi_paquete.linaje:generar_linaje_impala --salida reporte.json
+"""
+
+import argparse
+import importlib
+import importlib.util
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+import linaje
+
+CAMPOS_COMPARADOS = ('consulta', 'tabla_origen', 'tabla_destino', 'campo_origen', 'campo_destino',
+                     'transformacion_aplicada', 'recomendaciones')
+REFERENCIA_POR_DEFECTO = 'linaje:generar_linaje_impala'
+
+
+# -------------------------
+# Carga de implementaciones y corpus
+# -------------------------
+
+def cargar_implementacion(spec: str):
+    """'modulo:funcion' o 'ruta.py:funcion' -> (modulo, funcion)."""
+    objetivo, _, nombre = spec.rpartition(':')
+    if not objetivo or not nombre:
+        raise ValueError('implementacion invalida: %s (usar modulo:funcion o archivo.py:funcion)' % spec)
+    if objetivo.endswith('.py'):
+        nombre_mod = '_candidata_' + os.path.splitext(os.path.basename(objetivo))[0]
+        spec_mod = importlib.util.spec_from_file_location(nombre_mod, objetivo)
+        if spec_mod is None:
+            raise ValueError('no se pudo cargar %s' % objetivo)
+        modulo = importlib.util.module_from_spec(spec_mod)
+        spec_mod.loader.exec_module(modulo)
+    else:
+        modulo = importlib.import_module(objetivo)
+    return modulo, getattr(modulo, nombre)
+
+
+def _desactivar_presupuesto(modulo) -> None:
+    if hasattr(modulo, 'MAX_SEGUNDOS_SENTENCIA'):
+        modulo.MAX_SEGUNDOS_SENTENCIA = 0
+
+
+def archivos_corpus(rutas) -> list:
+    """Expande carpetas a sus .sql (recursivo, orden estable)."""
+    res = []
+    for ruta in rutas:
+        if os.path.isdir(ruta):
+            for base, dirs, archivos in os.walk(ruta):
+                dirs.sort()
+                res.extend(os.path.join(base, a) for a in sorted(archivos) if a.lower().endswith('.sql'))
+        else:
+            res.append(ruta)
+    return res
+
+
+def iter_sentencias_corpus(rutas):
+    """(archivo, n, sentencia cruda) para cada sentencia del corpus."""
+    for archivo in archivos_corpus(rutas):
+        with open(archivo, encoding='utf-8-sig', errors='replace') as f:
+            for n, stmt in enumerate(linaje.iter_statements_stream(f)):
+                yield archivo, n, stmt
+
+# -------------------------
+# Comparacion
+# -------------------------
+
+def normalizar_registros(registros) -> Counter:
+    """Multiconjunto de registros sin id (uuid) ni orden."""
+    return Counter(tuple(r.get(c) for c in CAMPOS_COMPARADOS) for r in registros)
+
+
+def _medir(funcion, stmt: str, repeticiones: int):
+    mejor = None
+    res = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        try:
+            res = funcion(stmt)
+        except Exception as exc:
+            res = exc
+        dt = time.perf_counter() - inicio
+        mejor = dt if mejor is None or dt < mejor else mejor
+    return res, mejor
+
+
+def _como_registros(res) -> list:
+    return [dict(zip(CAMPOS_COMPARADOS, t)) for t in sorted(res, key=lambda t: tuple('' if v is None else str(v) for v in t))]
+
+
+def comparar_corpus(sentencias, referencia, candidata, repeticiones: int = 3, max_diferencias: int = 50) -> dict:
+    """
+    sentencias: iterable de (archivo, n, sql). referencia / candidata: funcion(sql) -> registros.
+    Retorna {'resumen', 'categorias': {clase: {...}}, 'diferencias': [...]}.
+    """
+    categorias = {}
+    diferencias = []
+    total = {'sentencias': 0, 'iguales': 0, 'distintas': 0, 'segundos_referencia': 0.0, 'segundos_candidata': 0.0}
+    for archivo, n, stmt in sentencias:
+        clase = linaje.clasificar_sentencia(linaje.normalize_sql(stmt))
+        res_ref, t_ref = _medir(referencia, stmt, repeticiones)
+        res_cand, t_cand = _medir(candidata, stmt, repeticiones)
+        cat = categorias.setdefault(clase, {'sentencias': 0, 'distintas': 0,
+                                            'segundos_referencia': 0.0, 'segundos_candidata': 0.0})
+        cat['sentencias'] += 1
+        cat['segundos_referencia'] += t_ref
+        cat['segundos_candidata'] += t_cand
+        total['sentencias'] += 1
+        total['segundos_referencia'] += t_ref
+        total['segundos_candidata'] += t_cand
+        if isinstance(res_ref, Exception) or isinstance(res_cand, Exception):
+            iguales = type(res_ref) is type(res_cand) and str(res_ref) == str(res_cand)
+            faltantes = sobrantes = None
+        else:
+            norm_ref = normalizar_registros(res_ref)
+            norm_cand = normalizar_registros(res_cand)
+            iguales = norm_ref == norm_cand
+            faltantes = norm_ref - norm_cand
+            sobrantes = norm_cand - norm_ref
+        if iguales:
+            total['iguales'] += 1
+            continue
+        total['distintas'] += 1
+        cat['distintas'] += 1
+        if len(diferencias) < max_diferencias:
+            dif = {'archivo': archivo, 'sentencia': n, 'categoria': clase, 'sql': linaje.normalize_sql(stmt)[:500]}
+            if faltantes is None:
+                dif['error_referencia'] = repr(res_ref) if isinstance(res_ref, Exception) else None
+                dif['error_candidata'] = repr(res_cand) if isinstance(res_cand, Exception) else None
+            else:
+                dif['faltantes'] = _como_registros(faltantes.elements())
+                dif['sobrantes'] = _como_registros(sobrantes.elements())
+            diferencias.append(dif)
+    for cat in categorias.values():
+        cat['speedup'] = _speedup(cat['segundos_referencia'], cat['segundos_candidata'])
+    total['speedup'] = _speedup(total['segundos_referencia'], total['segundos_candidata'])
+    return {
+        'resumen': total,
+        'categorias': dict(sorted(categorias.items(), key=lambda kv: -kv[1]['segundos_referencia'])),
+        'diferencias': diferencias,
+    }
+
+
+def _speedup(t_ref: float, t_cand: float) -> float:
+    return round(t_ref / t_cand, 3) if t_cand else 0.0
+
+# -------------------------
+# CLI
+# -------------------------
+
+def imprimir_reporte(reporte: dict, salida=sys.stdout) -> None:
+    r = reporte['resumen']
+    print('sentencias: %d  iguales: %d  distintas: %d  speedup total: %.2fx (%.3fs -> %.3fs)' % (
+        r['sentencias'], r['iguales'], r['distintas'], r['speedup'],
+        r['segundos_referencia'], r['segundos_candidata']), file=salida)
+    print('%-20s %10s %10s %12s %12s %9s' % ('categoria', 'sentencias', 'distintas', 'ref (s)', 'cand (s)', 'speedup'),
+          file=salida)
+    for clase, c in reporte['categorias'].items():
+        print('%-20s %10d %10d %12.4f %12.4f %8.2fx' % (clase, c['sentencias'], c['distintas'],
+                                                       c['segundos_referencia'], c['segundos_candidata'],
+                                                       c['speedup']), file=salida)
+    for dif in reporte['diferencias']:
+        print('\n--- %s #%d [%s]' % (dif['archivo'], dif['sentencia'], dif['categoria']), file=salida)
+        print(dif['sql'][:200], file=salida)
+        if 'faltantes' in dif:
+            for rec in dif['faltantes']:
+                print('  - %s' % json.dumps(rec, ensure_ascii=False), file=salida)
+            for rec in dif['sobrantes']:
+                print('  + %s' % json.dumps(rec, ensure_ascii=False), file=salida)
+        else:
+            print('  referencia: %s / candidata: %s' % (dif['error_referencia'], dif['error_candidata']), file=salida)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Compara el linaje de una implementacion candidata contra la referencia')
+    parser.add_argument('corpus', nargs='+', help='archivos .sql o carpetas')
+    parser.add_argument('--candidata', required=True, help='modulo:funcion o archivo.py:funcion')
+    parser.add_argument('--referencia', default=REFERENCIA_POR_DEFECTO)
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--max-diferencias', type=int, default=50)
+    parser.add_argument('--con-presupuesto', action='store_true',
+                        help='mantener el presupuesto de tiempo por sentencia (por defecto se desactiva)')
+    parser.add_argument('--salida', help='escribir el reporte completo en json')
+    args = parser.parse_args(argv)
+    mod_ref, referencia = cargar_implementacion(args.referencia)
+    mod_cand, candidata = cargar_implementacion(args.candidata)
+    if not args.con_presupuesto:
+        _desactivar_presupuesto(mod_ref)
+        _desactivar_presupuesto(mod_cand)
+    reporte = comparar_corpus(iter_sentencias_corpus(args.corpus), referencia, candidata,
+                              max(1, args.repeticiones), args.max_diferencias)
+    imprimir_reporte(reporte)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(reporte, f, ensure_ascii=False, indent=2)
+    return 1 if reporte['resumen']['distintas'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
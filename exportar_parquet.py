@@ -0,0 +1,236 @@
+"""
+Exportador de linaje a Parquet para el reporte Power BI (LINAJE_DATA_LAKE_BANISTMO.pbix)
+Reemplaza los json/csv (to_csv(..., quoting=csv.QUOTE_ALL) del notebook) por archivos columnares.
+
+Salida:
+    <destino>/aristas/tipo_zona=<s_|lz|proceso|resultados|otro>/part-00000.parquet
+    <destino>/sentencias/part-00000.parquet
+
+Notas:
+- particionado hive por tipo de zona de la tabla destino: el reporte puede podar por zona
+- columnas de texto con codificacion diccionario (nombres de tablas/campos muy repetidos)
+- el sql va en una tabla aparte (sentencias) y las aristas solo llevan consulta_id
+- escritura por lotes con un ParquetWriter por particion: memoria acotada por tam_lote
+- requiere pyarrow (dependencia opcional, solo para exportar)
+- se escribe en una carpeta temporal dentro de destino y al terminar se reemplazan aristas/ y
+  sentencias/ completas: una reexportacion no deja particiones viejas (p. ej. una zona que ya no
+  tiene filas) y una exportacion que falla mientras escribe no toca la anterior
+- el reemplazo NO es atomico (dos renames por carpeta): la carpeta vieja se aparta como
+  .anterior-<carpeta>, la nueva toma su lugar y recien despues se borra la vieja. Si el proceso
+  muere entre los dos renames, la siguiente exportacion restaura la carpeta apartada antes de empezar;
+  un lector que entra justo en ese instante puede no encontrar la carpeta
+
+Uso:
+    python exportar_parquet.py json/linaje.json export/linaje_parquet
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+from formato_compacto import id_consulta
+from linaje_diff import iter_registros_json
+from nombres_linaje import SIMBOLOS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # dependencia opcional
+    pa = None
+    pq = None
+
+PARTICIONES = ('s_', 'lz', 'proceso', 'resultados', 'otro')
+
+COLUMNAS_ARISTAS = ('id', 'consulta_id', 'tabla_origen', 'tabla_destino', 'campo_origen', 'campo_destino',
+                    'transformacion_aplicada', 'recomendaciones', 'zona_origen', 'zona_destino')
+# columnas que no se codifican con diccionario (casi unicas por fila)
+_COLUMNAS_PLANAS = ('id',)
+
+
+def particion_zona(tabla: str) -> str:
+    """Particion por tipo de zona: s_ / lz / proceso / resultados / otro."""
+    if not tabla:
+        return 'otro'
+    info = SIMBOLOS.tabla(SIMBOLOS.id_tabla(tabla))
+    if info.es_lz:
+        return 'lz'
+    return {'S': 's_', 'P': 'proceso', 'R': 'resultados'}.get(info.prefijo_zona, 'otro')
+
+
+def _requiere_pyarrow() -> None:
+    if pa is None:
+        raise ImportError('exportar a parquet requiere pyarrow: pip install pyarrow')
+
+
+def _esquema_aristas():
+    dic = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([pa.field(c, pa.string() if c in _COLUMNAS_PLANAS else dic) for c in COLUMNAS_ARISTAS])
+
+
+def _esquema_sentencias():
+    return pa.schema([pa.field('consulta_id', pa.string()), pa.field('consulta', pa.string())])
+
+
+def _tabla_arrow(columnas: dict, esquema):
+    arrays = []
+    for campo in esquema:
+        valores = pa.array(columnas[campo.name], type=pa.string())
+        if pa.types.is_dictionary(campo.type):
+            valores = valores.dictionary_encode()
+        arrays.append(valores)
+    return pa.Table.from_arrays(arrays, schema=esquema)
+
+
+class _EscritorParticionado:
+    """Un ParquetWriter por particion, abierto al llegar la primera fila."""
+
+    def __init__(self, directorio: str, esquema, compresion: str, columna_particion: str = None):
+        self.directorio = directorio
+        self.esquema = esquema
+        self.compresion = compresion
+        self.columna_particion = columna_particion
+        self._escritores = {}
+        self.filas = {}
+
+    def escribir(self, particion: str, columnas: dict) -> None:
+        if not columnas[self.esquema[0].name]:
+            return
+        escritor = self._escritores.get(particion)
+        if escritor is None:
+            carpeta = self.directorio
+            if self.columna_particion:
+                carpeta = os.path.join(carpeta, '%s=%s' % (self.columna_particion, particion))
+            os.makedirs(carpeta, exist_ok=True)
+            escritor = pq.ParquetWriter(os.path.join(carpeta, 'part-00000.parquet'), self.esquema,
+                                        compression=self.compresion, use_dictionary=True)
+            self._escritores[particion] = escritor
+        tabla = _tabla_arrow(columnas, self.esquema)
+        escritor.write_table(tabla)
+        self.filas[particion] = self.filas.get(particion, 0) + tabla.num_rows
+
+    def cerrar(self) -> None:
+        for escritor in self._escritores.values():
+            escritor.close()
+        self._escritores = {}
+
+
+def exportar_parquet(registros, destino: str, tam_lote: int = 100000, compresion: str = 'snappy') -> dict:
+    """
+    Exporta registros de generar_linaje_impala (iterable) a parquet particionado por zona.
+    Retorna conteos {'aristas': {particion: n}, 'sentencias': n}.
+    """
+    _requiere_pyarrow()
+    os.makedirs(destino, exist_ok=True)
+    _recuperar_reemplazo(destino)
+    temporal = tempfile.mkdtemp(prefix='.exportando-', dir=destino)
+    try:
+        res = _exportar_en(registros, temporal, tam_lote, compresion)
+        for sub in ('aristas', 'sentencias'):
+            _reemplazar_carpeta(os.path.join(temporal, sub), os.path.join(destino, sub))
+    finally:
+        shutil.rmtree(temporal, ignore_errors=True)
+    return res
+
+
+def _apartada(final: str) -> str:
+    carpeta, nombre = os.path.split(final)
+    return os.path.join(carpeta, '.anterior-' + nombre)
+
+
+def _recuperar_reemplazo(destino: str) -> None:
+    """Deja destino como antes de un reemplazo interrumpido (y borra temporales de corridas caidas)."""
+    for sub in ('aristas', 'sentencias'):
+        final = os.path.join(destino, sub)
+        apartada = _apartada(final)
+        if os.path.isdir(apartada):
+            if os.path.isdir(final):
+                shutil.rmtree(apartada)  # el reemplazo llego a completarse
+            else:
+                os.rename(apartada, final)
+    for nombre in os.listdir(destino):
+        if nombre.startswith('.exportando-'):
+            shutil.rmtree(os.path.join(destino, nombre), ignore_errors=True)
+
+
+def _reemplazar_carpeta(nueva: str, final: str) -> None:
+    """
+    Pone nueva en lugar de final (renames dentro del mismo sistema de archivos). La vieja se aparta,
+    la nueva entra y solo entonces se borra la vieja: nunca queda destino sin ninguna de las dos
+    salvo entre los dos renames (ver _recuperar_reemplazo).
+    """
+    apartada = _apartada(final)
+    if os.path.isdir(final):
+        os.rename(final, apartada)
+    if os.path.isdir(nueva):
+        os.rename(nueva, final)
+    if os.path.isdir(apartada):
+        shutil.rmtree(apartada)
+
+
+def _exportar_en(registros, destino: str, tam_lote: int, compresion: str) -> dict:
+    aristas = _EscritorParticionado(os.path.join(destino, 'aristas'), _esquema_aristas(), compresion, 'tipo_zona')
+    sentencias = _EscritorParticionado(os.path.join(destino, 'sentencias'), _esquema_sentencias(), compresion)
+    lotes = {}
+    lote_sentencias = {'consulta_id': [], 'consulta': []}
+    vistas = set()
+    try:
+        for rec in registros:
+            destino_tabla = rec.get('tabla_destino')
+            particion = particion_zona(destino_tabla)
+            consulta = rec.get('consulta')
+            cid = id_consulta(consulta) if consulta else None
+            if cid and cid not in vistas:
+                vistas.add(cid)
+                lote_sentencias['consulta_id'].append(cid)
+                lote_sentencias['consulta'].append(consulta)
+                if len(lote_sentencias['consulta_id']) >= tam_lote:
+                    sentencias.escribir('', lote_sentencias)
+                    lote_sentencias = {'consulta_id': [], 'consulta': []}
+            lote = lotes.get(particion)
+            if lote is None:
+                lote = lotes[particion] = {c: [] for c in COLUMNAS_ARISTAS}
+            origen_tabla = rec.get('tabla_origen')
+            fila = {
+                'id': rec.get('id'),
+                'consulta_id': cid,
+                'tabla_origen': origen_tabla,
+                'tabla_destino': destino_tabla,
+                'campo_origen': rec.get('campo_origen'),
+                'campo_destino': rec.get('campo_destino'),
+                'transformacion_aplicada': rec.get('transformacion_aplicada'),
+                'recomendaciones': rec.get('recomendaciones'),
+                'zona_origen': SIMBOLOS.tabla(SIMBOLOS.id_tabla(origen_tabla)).zona if origen_tabla else None,
+                'zona_destino': SIMBOLOS.tabla(SIMBOLOS.id_tabla(destino_tabla)).zona if destino_tabla else None,
+            }
+            for c in COLUMNAS_ARISTAS:
+                lote[c].append(fila[c])
+            if len(lote['id']) >= tam_lote:
+                aristas.escribir(particion, lote)
+                lotes[particion] = {c: [] for c in COLUMNAS_ARISTAS}
+        for particion, lote in lotes.items():
+            aristas.escribir(particion, lote)
+        sentencias.escribir('', lote_sentencias)
+    finally:
+        aristas.cerrar()
+        sentencias.cerrar()
+    return {'aristas': dict(sorted(aristas.filas.items())), 'sentencias': sum(sentencias.filas.values())}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Exporta json de linaje a parquet particionado por zona')
+    parser.add_argument('entrada', help='json de linaje (salida de linaje.py)')
+    parser.add_argument('destino', help='carpeta de salida')
+    parser.add_argument('--tam-lote', type=int, default=100000)
+    parser.add_argument('--compresion', default='snappy', help='snappy, zstd, gzip o none')
+    args = parser.parse_args(argv)
+    res = exportar_parquet(iter_registros_json(args.entrada), args.destino, args.tam_lote, args.compresion)
+    for particion, n in res['aristas'].items():
+        print('aristas tipo_zona=%s: %d' % (particion, n))
+    print('sentencias: %d' % res['sentencias'])
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,219 @@
+"""
+Formato compacto para respuestas de relaciones de linaje
+Los registros que hoy viajan como json verboso (nombres largos repetidos + sql completo
+en cada registro) se codifican como payload columnar con diccionario de strings.
+
+Notas:
+- 'strings': tabla de strings unicos; cada columna es una lista de enteros (indice o -1 para None)
+- el sql no viaja: cada registro lleva 'consulta_id' (hash corto) y el texto se pide bajo demanda
+  al abrir el detalle de la arista (CatalogoConsultas.consulta)
+- el catalogo pertenece al snapshot: se construye con el indice al cargar (IndiceLinaje.catalogo)
+  y se descarta con el; responder_consulta no depende de serializaciones previas
+- serializacion negociada por Accept: json compacto o MessagePack (si msgpack esta instalado)
+- compresion negociada por Accept-Encoding: br (si brotli esta instalado) o gzip
+- decodificar_columnar reconstruye los registros (clientes python, pruebas)
+"""
+
+import gzip
+import hashlib
+import json
+
+try:
+    import msgpack
+except ImportError:  # dependencia opcional
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:  # dependencia opcional
+    brotli = None
+
+FORMATO_COLUMNAR = 'linaje-columnar/1'
+TIPO_JSON = 'application/json'
+TIPO_COLUMNAR_JSON = 'application/vnd.linaje.columnar+json'
+TIPO_COLUMNAR_MSGPACK = 'application/vnd.linaje.columnar+msgpack'
+
+COLUMNAS_DICCIONARIO = ('tabla_origen', 'tabla_destino', 'campo_origen', 'campo_destino',
+                        'transformacion_aplicada', 'recomendaciones')
+
+# respuestas pequenas no se comprimen (el overhead supera la ganancia)
+MIN_BYTES_COMPRESION = 1024
+
+# -------------------------
+# Catalogo de consultas (sql bajo demanda)
+# -------------------------
+
+def id_consulta(consulta: str) -> str:
+    """Id estable del texto sql (mismo texto -> mismo id entre recargas)."""
+    return hashlib.sha1(consulta.encode('utf-8')).hexdigest()[:16]
+
+
+class CatalogoConsultas:
+    """id_consulta -> texto sql de un snapshot; se consulta al abrir el detalle de una arista."""
+
+    def __init__(self):
+        self._consultas = {}
+
+    def registrar(self, consulta: str) -> str:
+        if not consulta:
+            return None
+        cid = id_consulta(consulta)
+        self._consultas.setdefault(cid, consulta)
+        return cid
+
+    def consulta(self, cid: str) -> str:
+        return self._consultas.get(cid)
+
+    def __len__(self) -> int:
+        return len(self._consultas)
+
+# -------------------------
+# Codificacion columnar
+# -------------------------
+
+def codificar_columnar(registros, catalogo: CatalogoConsultas = None, incluir_ids: bool = False) -> dict:
+    """
+    Codifica registros de linaje como payload columnar con diccionario de strings.
+    Campos extra del registro (ej. valid) no se incluyen: solo se envian registros ya filtrados.
+    """
+    strings = []
+    indices = {}
+
+    def idx(valor):
+        if valor is None:
+            return -1
+        i = indices.get(valor)
+        if i is None:
+            i = len(strings)
+            strings.append(valor)
+            indices[valor] = i
+        return i
+
+    columnas = {c: [] for c in COLUMNAS_DICCIONARIO}
+    consultas = []
+    ids = []
+    n = 0
+    for rec in registros:
+        for c in COLUMNAS_DICCIONARIO:
+            columnas[c].append(idx(rec.get(c)))
+        consulta = rec.get('consulta')
+        cid = catalogo.registrar(consulta) if catalogo is not None else (id_consulta(consulta) if consulta else None)
+        consultas.append(idx(cid))
+        if incluir_ids:
+            ids.append(rec.get('id'))
+        n += 1
+    columnas['consulta_id'] = consultas
+    payload = {'formato': FORMATO_COLUMNAR, 'n': n, 'strings': strings, 'columnas': columnas}
+    if incluir_ids:
+        payload['ids'] = ids
+    return payload
+
+
+def decodificar_columnar(payload: dict) -> list:
+    """Inverso de codificar_columnar: lista de registros (con consulta_id en lugar de consulta)."""
+    if payload.get('formato') != FORMATO_COLUMNAR:
+        raise ValueError('formato no soportado: %s' % payload.get('formato'))
+    strings = payload['strings']
+    columnas = payload['columnas']
+    nombres = list(COLUMNAS_DICCIONARIO) + ['consulta_id']
+    ids = payload.get('ids')
+    res = []
+    for i in range(payload['n']):
+        rec = {c: (strings[columnas[c][i]] if columnas[c][i] >= 0 else None) for c in nombres}
+        if ids is not None:
+            rec['id'] = ids[i]
+        res.append(rec)
+    return res
+
+# -------------------------
+# Negociacion de contenido
+# -------------------------
+
+def _preferencias(cabecera: str) -> list:
+    """Parsea Accept / Accept-Encoding en [(valor, q)] ordenado por q descendente."""
+    res = []
+    for orden, parte in enumerate((cabecera or '').split(',')):
+        parte = parte.strip()
+        if not parte:
+            continue
+        valor, _, params = parte.partition(';')
+        q = 1.0
+        for p in params.split(';'):
+            k, _, v = p.strip().partition('=')
+            if k == 'q':
+                try:
+                    q = float(v)
+                except ValueError:
+                    q = 0.0
+        res.append((valor.strip().lower(), q, orden))
+    res.sort(key=lambda t: (-t[1], t[2]))
+    return [(v, q) for v, q, _ in res if q > 0]
+
+
+def negociar(accept: str = None, accept_encoding: str = None) -> tuple:
+    """Retorna (tipo_contenido, codificacion o None) segun lo que acepta el cliente y lo disponible."""
+    disponibles = [TIPO_COLUMNAR_JSON, TIPO_JSON]
+    if msgpack is not None:
+        disponibles.insert(0, TIPO_COLUMNAR_MSGPACK)
+    tipo = TIPO_JSON
+    for valor, _q in _preferencias(accept):
+        if valor in disponibles:
+            tipo = valor
+            break
+        if valor in ('*/*', 'application/*'):
+            break
+    codificaciones = ['gzip'] if brotli is None else ['br', 'gzip']
+    codificacion = None
+    for valor, _q in _preferencias(accept_encoding):
+        if valor in codificaciones:
+            codificacion = valor
+            break
+        if valor == '*':
+            codificacion = codificaciones[0]
+            break
+    return tipo, codificacion
+
+
+def serializar(registros, tipo: str, catalogo: CatalogoConsultas = None) -> bytes:
+    if tipo == TIPO_JSON:
+        datos = list(registros)
+    else:
+        datos = codificar_columnar(registros, catalogo)
+    if tipo == TIPO_COLUMNAR_MSGPACK:
+        return msgpack.packb(datos, use_bin_type=True)
+    return json.dumps(datos, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def comprimir(cuerpo: bytes, codificacion: str) -> bytes:
+    if codificacion == 'br':
+        return brotli.compress(cuerpo, quality=5)
+    if codificacion == 'gzip':
+        return gzip.compress(cuerpo, compresslevel=6)
+    return cuerpo
+
+
+def responder_relaciones(registros, accept: str = None, accept_encoding: str = None,
+                         catalogo: CatalogoConsultas = None) -> tuple:
+    """
+    Respuesta http negociada para una lista de relaciones: (status, headers, cuerpo).
+    application/json mantiene el formato actual (compatibilidad con el front existente).
+    """
+    tipo, codificacion = negociar(accept, accept_encoding)
+    cuerpo = serializar(registros, tipo, catalogo)
+    headers = {'Content-Type': tipo + ('; charset=utf-8' if tipo.endswith('json') else ''),
+               'Vary': 'Accept, Accept-Encoding'}
+    if codificacion and len(cuerpo) >= MIN_BYTES_COMPRESION:
+        cuerpo = comprimir(cuerpo, codificacion)
+        headers['Content-Encoding'] = codificacion
+    return 200, headers, cuerpo
+
+
+def responder_consulta(catalogo: CatalogoConsultas, cid: str) -> tuple:
+    """Texto sql de una arista bajo demanda (renderEdgeDetails)."""
+    consulta = catalogo.consulta(cid)
+    if consulta is None:
+        return 404, {'Content-Type': 'application/json; charset=utf-8'}, b'{"detail":"consulta no encontrada"}'
+    cuerpo = json.dumps({'consulta_id': cid, 'consulta': consulta}, ensure_ascii=False).encode('utf-8')
+    # el texto de un id nunca cambia: cacheable sin revalidar
+    return 200, {'Content-Type': 'application/json; charset=utf-8',
+                 'Cache-Control': 'public, max-age=31536000, immutable'}, cuerpo
@@ -0,0 +1,358 @@
+"""
+Indice de linaje en memoria (lado servidor)
+Lleva al backend el procesamiento que hoy hace app.js en el cliente:
+sanitizeRecords, computeZoneInfo, computeUpstreamClosureConstrained,
+getFilteredRecords y buildTableElements/buildFieldElements.
+
+Notas:
+- entrada: registros de generar_linaje_impala (o json/linaje.json)
+- dos niveles: 'tablas' (todas las relaciones, campos nulos se tratan como '*') y
+  'campos' (solo relaciones campo a campo validas)
+- las tablas se referencian por id de la tabla de simbolos (nombres_linaje.SIMBOLOS);
+  los indices entrada/salida son listas de posiciones de registro por id de tabla
+- el sql de todas las sentencias queda en IndiceLinaje.catalogo (consulta_id -> texto) al cargar
+- registros invalidos se conservan marcados con valid=False / invalid_reason (el front solo consume valid=True)
+"""
+
+from agregacion_aristas import AcumuladorAristas
+from formato_compacto import CatalogoConsultas
+from nombres_linaje import SIMBOLOS, es_campo_valido, ORDEN_TIPO_ZONA
+
+NIVELES = ('tablas', 'campos')
+
+# -------------------------
+# Sanitizacion (sanitizeRecords de app.js)
+# -------------------------
+
+def sanitizar_registro(rec: dict, nivel: str) -> dict:
+    """Copia normalizada del registro con valid / invalid_reason."""
+    td = SIMBOLOS.texto(rec.get('tabla_destino')) or ''
+    to = SIMBOLOS.texto(rec.get('tabla_origen')) or ''
+    cd = SIMBOLOS.texto(rec.get('campo_destino'))
+    co = SIMBOLOS.texto(rec.get('campo_origen'))
+    if nivel == 'tablas':
+        # linaje.py deja None en relaciones tabla -> tabla; el visor las maneja como '*'
+        cd = cd or '*'
+        co = co or '*'
+    tid_d = SIMBOLOS.id_tabla(td)
+    tid_o = SIMBOLOS.id_tabla(to)
+    reason = None
+    if tid_d is None or tid_o is None or not SIMBOLOS.tabla(tid_d).permitida or not SIMBOLOS.tabla(tid_o).permitida:
+        reason = 'tabla no permitida'
+    elif not cd:
+        reason = 'campo_destino nulo'
+    elif nivel == 'campos':
+        if cd == '*':
+            reason = "usa '*' a nivel campos"
+        elif not es_campo_valido(cd, td):
+            reason = 'campo_destino invalido'
+        elif not co or co == '*' or not es_campo_valido(co, to):
+            reason = 'campo_origen invalido'
+    else:
+        if not es_campo_valido(cd, td):
+            reason = 'campo_destino invalido'
+        elif co and not es_campo_valido(co, to):
+            reason = 'campo_origen invalido'
+    new_rec = dict(rec)
+    new_rec.update({
+        'tabla_destino': td,
+        'tabla_origen': to,
+        'campo_destino': cd,
+        'campo_origen': co,
+        'valid': reason is None,
+        'invalid_reason': reason,
+    })
+    return new_rec
+
+
+def sanitizar_registros(registros, nivel: str) -> list:
+    return [sanitizar_registro(r, nivel) for r in registros]
+
+# -------------------------
+# Indice
+# -------------------------
+
+class IndiceNivel:
+    """Registros validos de un nivel + indices por tabla destino / origen (ids de simbolo)."""
+
+    def __init__(self, registros: list, nivel: str, catalogo: CatalogoConsultas = None):
+        self.nivel = nivel
+        self.catalogo = catalogo  # sql por consulta_id (compartido con IndiceLinaje)
+        self.registros = []   # registros validos (dicts sanitizados)
+        self.invalidos = 0
+        self.origen = []      # posicion -> id tabla origen
+        self.destino = []     # posicion -> id tabla destino
+        self.entrantes = {}   # id tabla destino -> [posiciones]
+        self.salientes = {}   # id tabla origen -> [posiciones]
+        for rec in registros:
+            san = sanitizar_registro(rec, nivel)
+            if not san['valid']:
+                self.invalidos += 1
+                continue
+            pos = len(self.registros)
+            tid_o = SIMBOLOS.id_tabla(san['tabla_origen'])
+            tid_d = SIMBOLOS.id_tabla(san['tabla_destino'])
+            self.registros.append(san)
+            self.origen.append(tid_o)
+            self.destino.append(tid_d)
+            self.entrantes.setdefault(tid_d, []).append(pos)
+            self.salientes.setdefault(tid_o, []).append(pos)
+
+    def posiciones_base(self, ocultar_lz: bool = False) -> list:
+        """Base para combos: todos los registros salvo, opcionalmente, los que vienen de lz."""
+        if not ocultar_lz:
+            return list(range(len(self.registros)))
+        return [p for p, tid in enumerate(self.origen) if not SIMBOLOS.tabla(tid).es_lz]
+
+    def cierre_upstream(self, tabla, ocultar_lz: bool = False) -> set:
+        """
+        Cierre upstream con restriccion (computeUpstreamClosureConstrained):
+        incluye todos los origenes pero solo recurre desde tablas resultados*/proceso*.
+        Retorna conjunto de ids de tabla.
+        """
+        inicio = SIMBOLOS.buscar_tabla(tabla) if isinstance(tabla, str) else tabla
+        if inicio is None:
+            return set()
+        cierre = {inicio}
+        pila = [inicio]
+        while pila:
+            dest = pila.pop()
+            for pos in self.entrantes.get(dest, ()):
+                origen = self.origen[pos]
+                info = SIMBOLOS.tabla(origen)
+                if ocultar_lz and info.es_lz:
+                    continue
+                if origen not in cierre:
+                    cierre.add(origen)
+                    if info.iniciable:
+                        pila.append(origen)
+        return cierre
+
+    def cierre_downstream(self, tabla, ocultar_lz: bool = False) -> set:
+        """Recorre hacia adelante: origen -> destinos (zonas s_*)."""
+        inicio = SIMBOLOS.buscar_tabla(tabla) if isinstance(tabla, str) else tabla
+        if inicio is None:
+            return set()
+        cierre = {inicio}
+        pila = [inicio]
+        while pila:
+            origen = pila.pop()
+            if ocultar_lz and SIMBOLOS.tabla(origen).es_lz:
+                continue
+            for pos in self.salientes.get(origen, ()):
+                dest = self.destino[pos]
+                if dest not in cierre:
+                    cierre.add(dest)
+                    pila.append(dest)
+        return cierre
+
+    def posiciones_filtradas(self, zona: str = 'all', tabla: str = 'all', mostrar_todo: bool = False,
+                             ocultar_lz: bool = False) -> list:
+        """getFilteredRecords de app.js: posiciones de registros segun filtros del visor."""
+        def visible(pos):
+            return not (ocultar_lz and SIMBOLOS.tabla(self.origen[pos]).es_lz)
+
+        if tabla and tabla != 'all':
+            cierre = self.cierre_upstream(tabla, ocultar_lz)
+            res = []
+            for tid in cierre:
+                res.extend(p for p in self.entrantes.get(tid, ()) if visible(p))
+            res.sort()
+            return res
+        res = []
+        for pos, tid_d in enumerate(self.destino):
+            info = SIMBOLOS.tabla(tid_d)
+            if zona != 'all' and info.zona != zona:
+                continue
+            if info.iniciable and visible(pos):
+                res.append(pos)
+        return res
+
+    def registros_filtrados(self, **filtros) -> list:
+        return [self.registros[p] for p in self.posiciones_filtradas(**filtros)]
+
+    def zonas(self, ocultar_lz: bool = False) -> list:
+        """computeZoneInfo: zonas por tabla destino con startTables / destinations, ordenadas para el front."""
+        zonas = {}
+        for pos in self.posiciones_base(ocultar_lz):
+            info = SIMBOLOS.tabla(self.destino[pos])
+            if not info.zona:
+                continue
+            z = zonas.setdefault(info.zona, {
+                'zone': info.zona,
+                'type': info.tipo_zona,
+                'startTables': set(),
+                'destinations': set(),
+            })
+            z['destinations'].add(info.nombre)
+            if info.iniciable:
+                z['startTables'].add(info.nombre)
+        res = []
+        for z in zonas.values():
+            z['startTables'] = sorted(z['startTables'])
+            z['destinations'] = sorted(z['destinations'])
+            res.append(z)
+        res.sort(key=lambda z: (ORDEN_TIPO_ZONA.get(z['type'], 99), z['zone']))
+        return res
+
+
+def catalogo_de_registros(registros) -> CatalogoConsultas:
+    """Catalogo con el sql de todas las sentencias de los registros (un sha1 por texto distinto)."""
+    catalogo = CatalogoConsultas()
+    vistos = set()
+    for rec in registros:
+        consulta = rec.get('consulta')
+        if consulta and consulta not in vistos:
+            vistos.add(consulta)
+            catalogo.registrar(consulta)
+    return catalogo
+
+
+class IndiceLinaje:
+    """Indices de ambos niveles construidos una vez a partir de la salida de linaje.py."""
+
+    def __init__(self, registros):
+        registros = list(registros)
+        self.total_registros = len(registros)
+        self.catalogo = catalogo_de_registros(registros)
+        self.niveles = {nivel: IndiceNivel(registros, nivel, self.catalogo) for nivel in NIVELES}
+
+    def nivel(self, nivel: str) -> IndiceNivel:
+        if nivel not in self.niveles:
+            raise ValueError('nivel no soportado: %s (usar %s)' % (nivel, ', '.join(NIVELES)))
+        return self.niveles[nivel]
+
+# -------------------------
+# Elementos para cytoscape (buildTableElements / buildFieldElements)
+# -------------------------
+
+def _zona_clase(tipo: str) -> str:
+    return 'zone-' + tipo if tipo in ORDEN_TIPO_ZONA and tipo != 'otro' else 'zone-otro'
+
+
+def _nodo_tabla(nodos: dict, tabla: str) -> dict:
+    nid = 'table:' + tabla
+    nodo = nodos.get(nid)
+    if nodo is None:
+        info = SIMBOLOS.tabla(SIMBOLOS.id_tabla(tabla))
+        zona = info.zona or tabla
+        nodo = {
+            'data': {
+                'id': nid,
+                'label': tabla,
+                'table': tabla,
+                'type': 'table',
+                'zone': zona,
+                'zoneType': info.tipo_zona,
+                'columns': [],
+            },
+            'classes': 'table-node ' + _zona_clase(info.tipo_zona),
+        }
+        nodos[nid] = nodo
+    return nodo
+
+
+def _nodo_campo(campos: dict, campo: str, nodo_tabla: dict) -> dict:
+    nid = 'column:%s:%s' % (nodo_tabla['data']['table'], campo)
+    nodo = campos.get(nid)
+    if nodo is None:
+        nodo = {
+            'data': {
+                'id': nid,
+                'label': campo,
+                'column': campo,
+                'table': nodo_tabla['data']['table'],
+                'type': 'column',
+                'zone': nodo_tabla['data']['zone'],
+                'zoneType': nodo_tabla['data']['zoneType'],
+                'parent': nodo_tabla['data']['id'],
+            },
+            'classes': 'column-node ' + _zona_clase(nodo_tabla['data']['zoneType']),
+        }
+        if campo not in nodo_tabla['data']['columns']:
+            nodo_tabla['data']['columns'].append(campo)
+        campos[nid] = nodo
+    return nodo
+
+
+def _arista(aristas: dict, clave: str, data: dict, es_lz: bool, clases: list) -> dict:
+    arista = aristas.get(clave)
+    if arista is None:
+        data['id'] = clave
+        if es_lz:
+            clases = clases + ['lz-edge']
+        arista = {'data': data, 'classes': ' '.join(clases)}
+        aristas[clave] = arista
+    return arista
+
+
+def construir_elementos_tablas(registros, max_consultas: int = 3, catalogo: CatalogoConsultas = None) -> dict:
+    """
+    Nodos tabla y aristas tabla -> tabla (una por par, con transformaciones/recomendaciones).
+    catalogo: donde quedan registradas las consulta_ids de las aristas (el del indice/snapshot);
+    sin catalogo se usa uno local solo para calcular los ids.
+    Los duplicados se colapsan con agregacion_aristas.AcumuladorAristas.
+    """
+    acumulador = AcumuladorAristas(catalogo if catalogo is not None else CatalogoConsultas(), max_consultas)
+    nodos = {}
+    aristas = {}
+    for rec in registros:
+        origen = rec.get('tabla_origen')
+        destino = rec.get('tabla_destino')
+        if not origen or not destino:
+            continue
+        n_o = _nodo_tabla(nodos, origen)
+        n_d = _nodo_tabla(nodos, destino)
+        co = rec.get('campo_origen')
+        if co and co != '*' and co not in n_o['data']['columns']:
+            n_o['data']['columns'].append(co)
+        cd = rec.get('campo_destino')
+        if cd:
+            col = '(*)' if cd == '*' else cd
+            if col not in n_d['data']['columns']:
+                n_d['data']['columns'].append(col)
+        clave = '%s->%s' % (n_o['data']['id'], n_d['data']['id'])
+        arista = _arista(aristas, clave, {
+            'source': n_o['data']['id'],
+            'target': n_d['data']['id'],
+            'sourceTable': origen,
+            'targetTable': destino,
+            'nivel': 'tabla',
+        }, SIMBOLOS.tabla(SIMBOLOS.id_tabla(origen)).es_lz, ['table-edge'])
+        acumulador.agregar(clave, arista['data'], rec)
+    return {'nodes': list(nodos.values()), 'edges': list(aristas.values())}
+
+
+def construir_elementos_campos(registros, max_consultas: int = 3, catalogo: CatalogoConsultas = None) -> dict:
+    """Nodos tabla (padres) + nodos campo y aristas campo -> campo (catalogo: ver construir_elementos_tablas)."""
+    acumulador = AcumuladorAristas(catalogo if catalogo is not None else CatalogoConsultas(), max_consultas)
+    nodos = {}
+    campos = {}
+    aristas = {}
+    for rec in registros:
+        origen = rec.get('tabla_origen')
+        destino = rec.get('tabla_destino')
+        co = rec.get('campo_origen')
+        cd = rec.get('campo_destino')
+        if not origen or not destino or not co or not cd:
+            continue
+        c_o = _nodo_campo(campos, co, _nodo_tabla(nodos, origen))
+        c_d = _nodo_campo(campos, cd, _nodo_tabla(nodos, destino))
+        clave = '%s->%s' % (c_o['data']['id'], c_d['data']['id'])
+        arista = _arista(aristas, clave, {
+            'source': c_o['data']['id'],
+            'target': c_d['data']['id'],
+            'sourceTable': origen,
+            'targetTable': destino,
+            'sourceField': co,
+            'targetField': cd,
+            'nivel': 'campo',
+        }, SIMBOLOS.tabla(SIMBOLOS.id_tabla(origen)).es_lz, [])
+        acumulador.agregar(clave, arista['data'], rec)
+    return {'nodes': list(nodos.values()) + list(campos.values()), 'edges': list(aristas.values())}
+
+
+def construir_elementos(registros, nivel: str, max_consultas: int = 3, catalogo: CatalogoConsultas = None) -> dict:
+    if nivel == 'campos':
+        return construir_elementos_campos(registros, max_consultas, catalogo)
+    return construir_elementos_tablas(registros, max_consultas, catalogo)
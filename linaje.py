@@ -7,6 +7,9 @@ Notas:
 - todo en minÃºsculas
 - heurÃ­stico: intenta manejar insert/select, create as select, with ... insert ... as
 - si detecta '*' o 'table.*' genera relaciones a nivel tabla
+- sentencias sin linaje (compute stats, refresh, invalidate metadata, drop, set, use, alter ... partition)
+  se omiten con clasificar_sentencia antes de parsear; contadores por clase en obtener_metricas()
+- para dumps grandes usar generar_linaje_impala_stream(open(ruta)) + guardar_linaje_en_json_stream (memoria acotada por sentencia)
 - comentarÃ© el cÃ³digo paso a paso (en espaÃ±ol)
 """
 
@@ -14,6 +17,109 @@ import re
 import json
 import uuid
 import os
+import time
+import threading
+from collections import deque
+
+from nombres_linaje import SIMBOLOS, es_campo_valido, normalizar_nombre
+
+# -------------------------
+# Presupuestos por sentencia (tamaño y tiempo) y métricas
+# -------------------------
+
+# sentencias por encima de estos límites se degradan a linaje a nivel de tablas
+MAX_CHARS_SENTENCIA = 200000
+MAX_SEGUNDOS_SENTENCIA = 5.0
+
+class PresupuestoExcedido(Exception):
+    """Se lanza cuando una sentencia supera su presupuesto de tiempo de parseo."""
+
+_presupuesto = threading.local()
+_metricas_lock = threading.Lock()
+_METRICAS = {
+    'sentencias': 0,
+    'registros': 0,
+    'degradadas_tamano': 0,
+    'degradadas_tiempo': 0,
+    'segundos_parseo': 0.0,
+}
+# últimos eventos de degradación (motivo, largo de la sentencia, tabla destino)
+_EVENTOS_PRESUPUESTO = deque(maxlen=100)
+
+def _contar(clave: str, n=1) -> None:
+    with _metricas_lock:
+        _METRICAS[clave] = _METRICAS.get(clave, 0) + n
+
+def obtener_metricas() -> dict:
+    """Copia de los contadores de parseo (incluye eventos recientes de presupuesto excedido)."""
+    with _metricas_lock:
+        res = dict(_METRICAS)
+        res['eventos_presupuesto'] = list(_EVENTOS_PRESUPUESTO)
+    return res
+
+def reiniciar_metricas() -> None:
+    with _metricas_lock:
+        for k in _METRICAS:
+            _METRICAS[k] = 0.0 if isinstance(_METRICAS[k], float) else 0
+        _EVENTOS_PRESUPUESTO.clear()
+
+def _verificar_presupuesto() -> None:
+    """Corta el parseo de la sentencia en curso si se agotó su tiempo (no-op sin presupuesto activo)."""
+    limite = getattr(_presupuesto, 'limite', None)
+    if limite is not None and time.perf_counter() > limite:
+        raise PresupuestoExcedido()
+
+# -------------------------
+# Preclasificador de sentencias por palabra inicial
+# -------------------------
+
+# clases que no producen linaje: se omiten sin pasar por los parsers
+CLASES_SIN_LINAJE = ('compute_stats', 'refresh', 'invalidate_metadata', 'drop', 'set', 'use',
+                     'alter_particion', 'show', 'describe')
+# clases que se enrutan directo a su rama de lineage_from_statement
+CLASES_CON_LINAJE = ('insert', 'create', 'with', 'select', 'otro')
+CLASES_SENTENCIA = CLASES_SIN_LINAJE + CLASES_CON_LINAJE
+# False: las sentencias sin linaje vuelven a generar el registro "no se detecto un patron..."
+OMITIR_SENTENCIAS_SIN_LINAJE = True
+
+# sentencias por clase del preclasificador (clase_insert, clase_drop, ...)
+_METRICAS.update({'clase_' + c: 0 for c in CLASES_SENTENCIA})
+_METRICAS['omitidas_sin_linaje'] = 0
+
+_RX_PALABRAS_INICIALES = re.compile(r'\(*\s*([a-z_]+)(?: ([a-z_]+))?')
+_RX_PARTICION = re.compile(r'\bpartitions?\b')
+_RX_INSERT_CREATE = re.compile(r'\b(?:insert|create)\b')
+_RX_CREATE = re.compile(r'\bcreate\b')
+
+def clasificar_sentencia(stmt: str) -> str:
+    """
+    Clase de una sentencia normalizada mirando solo sus primeras palabras (mas una
+    busqueda de palabra clave cuando hace falta confirmar la ruta). No usa los parsers.
+    """
+    m = _RX_PALABRAS_INICIALES.match(stmt)
+    if not m:
+        return 'otro'
+    p1, p2 = m.group(1), m.group(2)
+    if p1 == 'compute' and p2 in ('stats', 'incremental'):
+        return 'compute_stats'
+    if p1 == 'invalidate' and p2 == 'metadata':
+        return 'invalidate_metadata'
+    if p1 in ('refresh', 'drop', 'set', 'use', 'show', 'describe'):
+        return p1
+    if p1 == 'desc':
+        return 'describe'
+    if p1 == 'alter':
+        return 'alter_particion' if _RX_PARTICION.search(stmt) else 'otro'
+    if p1 == 'insert':
+        # si aparece create en cualquier lado se deja la ruta completa (mismo resultado que antes)
+        return 'otro' if _RX_CREATE.search(stmt) else 'insert'
+    if p1 == 'create':
+        return 'create'
+    if p1 == 'with':
+        return 'with'
+    if p1 == 'select':
+        return 'otro' if _RX_INSERT_CREATE.search(stmt) else 'select'
+    return 'otro'
 
 # -------------------------
 # Helpers de anÃ¡lisis lÃ©xico simples (manejan parÃ©ntesis y comillas)
@@ -41,6 +147,8 @@ def top_level_split(s: str, delimiter: str=',') -> list:
     in_d = False
     i = 0
     while i < len(s):
+        if not i & 0xFFFF:
+            _verificar_presupuesto()
         ch = s[i]
         # manejo de comillas (no interpretamos escapes)
         if ch == "'" and not in_d:
@@ -82,6 +190,8 @@ def find_top_level_keyword(s: str, keyword: str, start: int=0) -> int:
     in_d = False
     L = len(s)
     while i < L:
+        if not i & 0xFFFF:
+            _verificar_presupuesto()
         ch = s[i]
         if ch == "'" and not in_d:
             in_s = not in_s; i += 1; continue
@@ -108,38 +218,120 @@ def find_top_level_keyword(s: str, keyword: str, start: int=0) -> int:
 
 def split_statements_top_level(sql: str) -> list:
     """Divide mÃºltiples sentencias separadas por ; a nivel top."""
-    parts = []
-    cur = []
+    return list(iter_statements_stream(sql))
+
+# caracteres que cambian el estado del divisor de sentencias
+_RX_ESPECIALES_SENTENCIA = re.compile(r'[\'";()]')
+
+def _iter_bloques(fuente, tam_bloque: int):
+    """Entrega la fuente por bloques: acepta str, objeto tipo archivo (read) o iterable de str."""
+    if isinstance(fuente, str):
+        yield fuente
+        return
+    if hasattr(fuente, 'read'):
+        while True:
+            bloque = fuente.read(tam_bloque)
+            if not bloque:
+                return
+            yield bloque
+    else:
+        for bloque in fuente:
+            if bloque:
+                yield bloque
+
+class SentenciaTruncada(str):
+    """
+    Cabeza (primeros max_chars) de una sentencia que superó el presupuesto de tamaño
+    dentro del divisor; largo = caracteres descartados hasta el ';' de resincronización.
+    """
+    largo = 0
+
+def iter_statements_stream(fuente, tam_bloque: int=1 << 20, max_chars: int=None):
+    """
+    Divide sentencias separadas por ; a nivel top leyendo la fuente por bloques.
+    El estado de comillas y profundidad de paréntesis se mantiene entre bloques,
+    por lo que la memoria queda acotada por la sentencia más grande y no por el archivo.
+    Produce cada sentencia sin normalizar (recortada) apenas se cierra su ';'.
+    max_chars (por defecto MAX_CHARS_SENTENCIA, 0 desactiva): una sentencia que lo supera
+    (ej. una comilla sin cerrar en un comentario '-- don't') deja de acumularse; se produce
+    su cabeza como SentenciaTruncada y el divisor se resincroniza en el siguiente ';'
+    (con el estado de comillas y paréntesis reiniciado). Memoria: max_chars + tam_bloque.
+    """
+    max_chars = MAX_CHARS_SENTENCIA if max_chars is None else max_chars
     depth = 0
-    in_s = False
-    in_d = False
-    i = 0
-    while i < len(sql):
-        ch = sql[i]
-        if ch == "'" and not in_d:
-            in_s = not in_s; cur.append(ch); i += 1; continue
-        if ch == '"' and not in_s:
-            in_d = not in_d; cur.append(ch); i += 1; continue
-        if in_s or in_d:
-            cur.append(ch); i += 1; continue
-        if ch == '(':
-            depth += 1; cur.append(ch); i += 1; continue
-        if ch == ')':
-            if depth > 0: depth -= 1
-            cur.append(ch); i += 1; continue
-        if ch == ';' and depth == 0:
-            stmt = ''.join(cur).strip()
-            if stmt:
-                parts.append(stmt)
-            cur = []
-            i += 1
-            continue
-        cur.append(ch)
-        i += 1
-    last = ''.join(cur).strip()
+    comilla = None  # comilla abierta: "'" o '"' (no interpretamos escapes)
+    piezas = []     # fragmentos de la sentencia en curso (puede cruzar bloques)
+    acumulado = 0   # largo de piezas
+    truncada = None # cabeza de la sentencia sobredimensionada que se está descartando
+    for bloque in _iter_bloques(fuente, tam_bloque):
+        inicio = 0
+        i = 0
+        L = len(bloque)
+        while True:
+            if truncada is not None:
+                # descartando hasta el próximo ';'
+                j = bloque.find(';', i)
+                if j == -1:
+                    truncada.largo += L - i
+                    break
+                truncada.largo += j - i
+                yield truncada
+                truncada = None
+                inicio = i = j + 1
+            while i < L:
+                if comilla:
+                    # dentro de comillas solo importa la comilla de cierre
+                    j = bloque.find(comilla, i)
+                    if j == -1:
+                        i = L
+                        break
+                    comilla = None
+                    i = j + 1
+                    continue
+                m = _RX_ESPECIALES_SENTENCIA.search(bloque, i)
+                if not m:
+                    i = L
+                    break
+                ch = m.group()
+                i = m.end()
+                if ch == "'" or ch == '"':
+                    comilla = ch
+                elif ch == '(':
+                    depth += 1
+                elif ch == ')':
+                    if depth > 0:
+                        depth -= 1
+                elif depth == 0:
+                    # ';' a nivel top: cierra la sentencia en curso
+                    piezas.append(bloque[inicio:i - 1])
+                    stmt = ''.join(piezas).strip()
+                    piezas = []
+                    acumulado = 0
+                    inicio = i
+                    if stmt:
+                        yield stmt
+            if not max_chars or acumulado + (L - inicio) <= max_chars:
+                piezas.append(bloque[inicio:])
+                acumulado += L - inicio
+                break
+            # sentencia sobredimensionada: se conserva la cabeza y se resincroniza
+            # desde el punto donde se superó el límite, con el estado reiniciado
+            corte = inicio + (max_chars - acumulado)
+            piezas.append(bloque[inicio:corte])
+            truncada = SentenciaTruncada(''.join(piezas).strip())
+            truncada.largo = max_chars
+            piezas = []
+            acumulado = 0
+            depth = 0
+            comilla = None
+            i = corte
+    if truncada is not None:
+        if truncada:
+            yield truncada
+        return
+    last = ''.join(piezas).strip()
     if last:
-        parts.append(last)
-    return parts
+        yield last
 
 # -------------------------
 # ExtracciÃ³n de partes principales
@@ -206,6 +398,7 @@ def extract_tables_from_from_clause(from_clause: str) -> list:
     parts = top_level_split(tmp, delimiter=',')
     reserved = set(['select','from','where','join','on','left','right','inner','outer','full','as','group','order','by','limit','union','insert','into','table','with','stored','parquet','if','not','exists'])
     for p in parts:
+        _verificar_presupuesto()
         p = p.strip()
         # buscar pattern schema.table (ej. sbani.tablacontacta)
         m = re.search(r'([a-z0-9_]+\.[a-z0-9_]+)', p)
@@ -608,6 +801,7 @@ def parse_select_item(item: str) -> dict:
       'is_star': True/False
     }
     """
+    _verificar_presupuesto()
     res = {'raw': item, 'origin_cols': [], 'alias': None, 'expr': item.strip(), 'is_star': False}
     it = item.strip()
     # detectar aliases con ' as alias' o ' expr alias'
@@ -662,15 +856,18 @@ def parse_select_item(item: str) -> dict:
 # Construir mapeos de linaje por sentencia
 # -------------------------
 
-def lineage_from_statement(stmt: str, cte_map: dict=None) -> list:
+def lineage_from_statement(stmt: str, cte_map: dict=None, clase: str=None) -> list:
     """
     Dada una sentencia SQL (normalizada en lowercase), retorna lista de registros de linaje (dicts).
+    clase (opcional, de clasificar_sentencia): 'insert' y 'select' saltan los parsers de create
+    (y 'select' tambien el de insert), que no pueden matchear en esas sentencias.
     """
     stmt = stmt.strip()
     cte_map = cte_map or {}
     results = []
+    probar_create = clase not in ('insert', 'select')
     # primero detectar si es create table ... like
-    dest_like, src_like = parse_create_like(stmt)
+    dest_like, src_like = parse_create_like(stmt) if probar_create else (None, None)
     if dest_like and src_like:
         rec = {
             'id': str(uuid.uuid4()),
@@ -685,7 +882,7 @@ def lineage_from_statement(stmt: str, cte_map: dict=None) -> list:
         return [rec]
 
     # luego detectar si es create table ... as select (ctas)
-    tabla_create, cols_create, is_ctas = parse_create_target(stmt)
+    tabla_create, cols_create, is_ctas = parse_create_target(stmt) if probar_create else (None, None, False)
     if is_ctas and tabla_create:
         # CTAS: tabla destino = tabla_create
         target_table = tabla_create
@@ -774,7 +971,7 @@ def lineage_from_statement(stmt: str, cte_map: dict=None) -> list:
     # -------------------------
     # Caso INSERT ... SELECT
     # -------------------------
-    tabla_insert, cols_insert = parse_insert_target(stmt)
+    tabla_insert, cols_insert = parse_insert_target(stmt) if clase != 'select' else (None, None)
     if tabla_insert:
         target_table = tabla_insert
         target_cols = cols_insert  # None o lista
@@ -929,30 +1126,164 @@ def lineage_from_statement(stmt: str, cte_map: dict=None) -> list:
 # FunciÃ³n principal pÃºblica
 # -------------------------
 
+_RX_TABLAS_FROM_JOIN = re.compile(r'\b(?:from|join)\s+([a-z0-9_]+\.[a-z0-9_]+)\b')
+
+def linaje_nivel_tabla(stmt: str, motivo: str) -> list:
+    """
+    Linaje degradado (solo tablas) para sentencias que exceden el presupuesto.
+    Usa búsquedas lineales: destino por insert/create y orígenes por 'from/join schema.tabla'.
+    """
+    dest, src_like = parse_create_like(stmt)
+    origenes = [src_like] if src_like else []
+    if not dest:
+        dest, _cols = parse_insert_target(stmt)
+    if not dest:
+        dest, _cols, _ctas = parse_create_target(stmt)
+    for m in _RX_TABLAS_FROM_JOIN.finditer(stmt):
+        tabla = m.group(1)
+        if tabla != dest and tabla not in origenes:
+            origenes.append(tabla)
+    recomendacion = ('presupuesto de parseo excedido (%s): linaje degradado a nivel de tablas; '
+                     'revisar la sentencia manualmente si necesita mapping columna a columna' % motivo)
+    results = []
+    for src in origenes or [None]:
+        results.append({
+            'id': str(uuid.uuid4()),
+            'consulta': stmt,
+            'tabla_origen': src,
+            'tabla_destino': dest,
+            'campo_origen': None,
+            'campo_destino': None,
+            'transformacion_aplicada': None,
+            'recomendaciones': recomendacion
+        })
+    return results
+
+def _registrar_degradacion(motivo: str, stmt: str, recs: list, largo: int=None) -> None:
+    _contar('degradadas_' + motivo)
+    with _metricas_lock:
+        _EVENTOS_PRESUPUESTO.append({
+            'motivo': motivo,
+            'largo': len(stmt) if largo is None else largo,
+            'tabla_destino': recs[0]['tabla_destino'] if recs else None
+        })
+
+def _linaje_de_sentencia(stmt_raw: str, max_chars: int=None, max_segundos: float=None) -> list:
+    """
+    Normaliza una sola sentencia y obtiene sus registros de linaje respetando
+    los presupuestos de tamaño y tiempo (por defecto MAX_CHARS_SENTENCIA / MAX_SEGUNDOS_SENTENCIA).
+    """
+    s = normalize_sql(stmt_raw)
+    if not s:
+        return []
+    if isinstance(stmt_raw, SentenciaTruncada):
+        # el divisor ya cortó la sentencia por tamaño: solo queda su cabeza
+        inicio = time.perf_counter()
+        recs = linaje_nivel_tabla(s, 'tamano')
+        _registrar_degradacion('tamano', s, recs, stmt_raw.largo)
+        return _finalizar_registros(recs, inicio)
+    clase = clasificar_sentencia(s)
+    _contar('clase_' + clase)
+    if OMITIR_SENTENCIAS_SIN_LINAJE and clase in CLASES_SIN_LINAJE:
+        _contar('omitidas_sin_linaje')
+        return []
+    max_chars = MAX_CHARS_SENTENCIA if max_chars is None else max_chars
+    max_segundos = MAX_SEGUNDOS_SENTENCIA if max_segundos is None else max_segundos
+    inicio = time.perf_counter()
+    if max_chars and len(s) > max_chars:
+        recs = linaje_nivel_tabla(s, 'tamano')
+        _registrar_degradacion('tamano', s, recs)
+    else:
+        _presupuesto.limite = (inicio + max_segundos) if max_segundos else None
+        try:
+            recs = lineage_from_statement(s, clase=clase)
+        except PresupuestoExcedido:
+            recs = None
+        finally:
+            _presupuesto.limite = None
+        if recs is None:
+            # el fallback corre sin presupuesto: es lineal sobre la sentencia
+            recs = linaje_nivel_tabla(s, 'tiempo')
+            _registrar_degradacion('tiempo', s, recs)
+    return _finalizar_registros(recs, inicio)
+
+def _finalizar_registros(recs: list, inicio: float) -> list:
+    """Métricas de la sentencia + normalización final de los registros."""
+    _contar('sentencias')
+    _contar('registros', len(recs))
+    _contar('segundos_parseo', time.perf_counter() - inicio)
+    # garantizar que todas las claves estÃ©n en minÃºscula y sin None problemÃ¡tico (dejamos None para campos vacÃ­os)
+    for r in recs:
+        # normalizar strings a minÃºsculas (si existen)
+        for k in ['consulta','transformacion_aplicada','recomendaciones']:
+            if k in r and isinstance(r[k], str):
+                r[k] = r[k].lower()
+        # nombres de tablas/campos: modelo canónico compartido (se normalizan e internan una sola vez;
+        # los ids de tabla los asigna el índice al cargar, no el parser)
+        for k in ['tabla_origen','tabla_destino']:
+            if k in r and isinstance(r[k], str):
+                r[k] = SIMBOLOS.texto(r[k])
+        # solo se internan campos con nombre válido: expresiones (registros de funciones) solo se normalizan
+        for k in ['campo_origen','campo_destino']:
+            if k in r and isinstance(r[k], str):
+                v = normalizar_nombre(r[k])
+                r[k] = SIMBOLOS.texto(v) if es_campo_valido(v) else v
+    return recs
+
 def generar_linaje_impala(sql_text: str) -> list:
     """
     Dado un texto sql (puede contener mÃºltiples sentencias) devuelve lista de registros de linaje.
     """
-    sql_norm = normalize_sql(sql_text)
-    stmts = split_statements_top_level(sql_norm)
-    all_results = []
-    for s in stmts:
-        if not s.strip():
-            continue
-        recs = lineage_from_statement(s)
-        # garantizar que todas las claves estÃ©n en minÃºscula y sin None problemÃ¡tico (dejamos None para campos vacÃ­os)
-        for r in recs:
-            # normalizar strings a minÃºsculas (si existen)
-            for k in ['consulta','tabla_origen','tabla_destino','campo_origen','campo_destino','transformacion_aplicada','recomendaciones']:
-                if k in r and isinstance(r[k], str):
-                    r[k] = r[k].lower()
-            all_results.append(r)
-    return all_results
+    return list(generar_linaje_impala_stream(sql_text))
+
+def generar_linaje_impala_stream(fuente, tam_bloque: int=1 << 20, max_chars: int=None, max_segundos: float=None):
+    """
+    Igual que generar_linaje_impala pero en streaming: fuente puede ser un str,
+    un archivo abierto o un iterable de str (ej. un dump sql de varios GB).
+    La normalización se aplica por sentencia y los registros se producen uno a uno.
+    max_chars / max_segundos: presupuesto por sentencia (0 desactiva el límite).
+    """
+    for stmt in iter_statements_stream(fuente, tam_bloque, max_chars):
+        for r in _linaje_de_sentencia(stmt, max_chars, max_segundos):
+            yield r
+
+def _escribir_atomico(ruta, escribir):
+    """
+    Escribe en un temporal del mismo directorio y lo renombra sobre ruta (os.replace):
+    quien lea ruta (ej. el vigia de snapshot_linaje) ve el archivo anterior o el nuevo completo.
+    """
+    directorio = os.path.dirname(ruta) or '.'
+    os.makedirs(directorio, exist_ok=True)
+    temporal = os.path.join(directorio, '.%s.%d.tmp' % (os.path.basename(ruta), os.getpid()))
+    try:
+        with open(temporal, 'w', encoding='utf-8') as f:
+            res = escribir(f)
+        os.replace(temporal, ruta)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+    return res
 
 def guardar_linaje_en_json(datos, ruta='json/linaje.json'):
-    os.makedirs('json', exist_ok=True)
-    with open(ruta, 'w', encoding='utf-8') as f:
-        json.dump(datos, f, ensure_ascii=False, indent=2)
+    _escribir_atomico(ruta, lambda f: json.dump(datos, f, ensure_ascii=False, indent=2))
+
+def guardar_linaje_en_json_stream(registros, ruta='json/linaje.json') -> int:
+    """
+    Escribe los registros (iterable, ej. generar_linaje_impala_stream) como lista json
+    sin materializarlos en memoria. Retorna la cantidad de registros escritos.
+    """
+    def escribir(f):
+        n = 0
+        f.write('[')
+        for r in registros:
+            f.write(',\n  ' if n else '\n  ')
+            f.write(json.dumps(r, ensure_ascii=False))
+            n += 1
+        f.write('\n]\n' if n else ']\n')
+        return n
+
+    return _escribir_atomico(ruta, escribir)
 
 # -------------------------
 # Ejemplos de uso / pruebas
@@ -0,0 +1,268 @@
+"""
+Diff de linaje entre dos ejecuciones (snapshots tipo json/linaje.json)
+Salida: aristas agregadas, eliminadas y cambiadas, agrupadas por tabla destino.
+
+Notas:
+- una arista se identifica por (tabla_origen, tabla_destino, campo_origen, campo_destino)
+- una arista "cambia" cuando mantiene la clave pero varian sus transformaciones o consultas
+- modo en memoria: conjuntos hash de claves (rapido, memoria proporcional al numero de aristas)
+- modo externo: ordenamiento externo en disco + merge de flujos ordenados (memoria acotada)
+- los snapshots se leen en streaming, sin cargar la lista completa con json.load
+
+Uso:
+    python linaje_diff.py json/linaje_anterior.json json/linaje.json
+    python linaje_diff.py anterior.json actual.json --externo --salida json/linaje_diff.json
+"""
+
+import argparse
+import hashlib
+import heapq
+import json
+import os
+import sys
+import tempfile
+
+CAMPOS_CLAVE = ('tabla_origen', 'tabla_destino', 'campo_origen', 'campo_destino')
+MAX_CHARS_REGISTRO = 64 << 20  # un registro mas grande que esto es un archivo corrupto
+
+# -------------------------
+# Lectura en streaming de snapshots
+# -------------------------
+
+def iter_registros_json(ruta: str, tam_bloque: int = 1 << 20, max_chars_registro: int = MAX_CHARS_REGISTRO):
+    """
+    Recorre un archivo json con una lista de registros y produce un dict a la vez.
+    Solo mantiene en memoria el bloque leido y el registro en curso; se avanza con un
+    desplazamiento dentro del bloque y el resto se compacta solo al leer el siguiente.
+    Un registro que no termina de decodificarse en max_chars_registro caracteres es un error.
+    """
+    decoder = json.JSONDecoder()
+    with open(ruta, 'r', encoding='utf-8-sig') as f:
+        buf = ''
+        pos = 0
+        eof = False
+        abierto = False
+        while True:
+            # descartar separadores (espacios y comas) entre registros
+            while pos < len(buf) and (buf[pos].isspace() or buf[pos] == ','):
+                pos += 1
+            if pos >= len(buf):
+                if eof:
+                    # sin ']' de cierre el snapshot esta truncado (escritura a medias):
+                    # tomarlo como valido reportaria como eliminadas todas las aristas faltantes
+                    raise ValueError('el snapshot %s esta truncado (falta el cierre de la lista json)' % ruta)
+                buf = f.read(tam_bloque)
+                pos = 0
+                eof = not buf
+                continue
+            if not abierto:
+                if buf[pos] != '[':
+                    raise ValueError('el snapshot %s no contiene una lista json' % ruta)
+                abierto = True
+                pos += 1
+                continue
+            if buf[pos] == ']':
+                return
+            try:
+                obj, fin = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # registro partido entre bloques: leer mas y reintentar
+                if eof:
+                    raise
+                if len(buf) - pos > max_chars_registro:
+                    raise ValueError('el snapshot %s tiene un registro invalido o de mas de %d caracteres'
+                                     % (ruta, max_chars_registro))
+                extra = f.read(tam_bloque)
+                eof = not extra
+                buf = buf[pos:] + extra
+                pos = 0
+                continue
+            yield obj
+            pos = fin
+
+
+def clave_arista(rec: dict) -> tuple:
+    """Clave estable de la arista (None se conserva para distinguir niveles tabla/campo)."""
+    return tuple(rec.get(k) for k in CAMPOS_CLAVE)
+
+
+def huella_registro(rec: dict) -> tuple:
+    """(transformacion, hash corto de la consulta) - lo que define si una arista cambio."""
+    consulta = rec.get('consulta') or ''
+    h = hashlib.sha1(consulta.encode('utf-8')).hexdigest()[:16]
+    return (rec.get('transformacion_aplicada'), h)
+
+# -------------------------
+# Modo en memoria (conjuntos hash)
+# -------------------------
+
+def indexar_snapshot(registros) -> dict:
+    """Construye clave_arista -> conjunto de huellas."""
+    idx = {}
+    for rec in registros:
+        idx.setdefault(clave_arista(rec), set()).add(huella_registro(rec))
+    return idx
+
+
+def iter_diferencias_memoria(registros_ant, registros_act):
+    """Produce (tipo, clave, huellas_antes, huellas_despues) comparando conjuntos hash."""
+    ant = indexar_snapshot(registros_ant)
+    act = indexar_snapshot(registros_act)
+    for clave, huellas in act.items():
+        previas = ant.get(clave)
+        if previas is None:
+            yield 'agregada', clave, [], sorted(huellas, key=_orden_huella)
+        elif previas != huellas:
+            yield 'cambiada', clave, sorted(previas, key=_orden_huella), sorted(huellas, key=_orden_huella)
+    for clave, huellas in ant.items():
+        if clave not in act:
+            yield 'eliminada', clave, sorted(huellas, key=_orden_huella), []
+
+
+def _orden_huella(h: tuple) -> tuple:
+    return (h[0] or '', h[1])
+
+# -------------------------
+# Modo externo (ordenamiento en disco + merge)
+# -------------------------
+
+def _linea_orden(rec: dict) -> str:
+    # la clave serializada primero: el orden lexicografico de la linea agrupa por arista
+    return json.dumps([list(clave_arista(rec)), list(huella_registro(rec))], ensure_ascii=False) + '\n'
+
+
+def _volcar_corrida(lineas: list, dir_tmp: str) -> str:
+    lineas.sort()
+    fd, ruta = tempfile.mkstemp(prefix='linaje_run_', suffix='.txt', dir=dir_tmp)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.writelines(lineas)
+    return ruta
+
+
+def iter_aristas_ordenadas(registros, dir_tmp: str, max_lineas: int = 200000):
+    """
+    Ordena las aristas de un snapshot con corridas de a lo sumo max_lineas en disco
+    y las mezcla con heapq.merge. Produce (clave_serializada, clave, huellas) agrupado por clave.
+    """
+    corridas = []
+    lineas = []
+    for rec in registros:
+        lineas.append(_linea_orden(rec))
+        if len(lineas) >= max_lineas:
+            corridas.append(_volcar_corrida(lineas, dir_tmp))
+            lineas = []
+    if lineas:
+        corridas.append(_volcar_corrida(lineas, dir_tmp))
+    archivos = [open(r, 'r', encoding='utf-8') for r in corridas]
+    try:
+        actual_ser = None
+        actual_clave = None
+        huellas = []
+        for linea in heapq.merge(*archivos):
+            clave, huella = json.loads(linea)
+            ser = json.dumps(clave, ensure_ascii=False)
+            huella = tuple(huella)
+            if ser != actual_ser:
+                if actual_ser is not None:
+                    yield actual_ser, actual_clave, huellas
+                actual_ser, actual_clave, huellas = ser, tuple(clave), []
+            if not huellas or huellas[-1] != huella:
+                huellas.append(huella)
+        if actual_ser is not None:
+            yield actual_ser, actual_clave, huellas
+    finally:
+        for f in archivos:
+            f.close()
+        for r in corridas:
+            os.remove(r)
+
+
+def iter_diferencias_externo(registros_ant, registros_act, max_lineas: int = 200000):
+    """Merge-join de los dos flujos ordenados; memoria acotada por max_lineas."""
+    with tempfile.TemporaryDirectory(prefix='linaje_diff_') as dir_tmp:
+        it_ant = iter_aristas_ordenadas(registros_ant, dir_tmp, max_lineas)
+        it_act = iter_aristas_ordenadas(registros_act, dir_tmp, max_lineas)
+        try:
+            a = next(it_ant, None)
+            b = next(it_act, None)
+            while a is not None or b is not None:
+                if b is None or (a is not None and a[0] < b[0]):
+                    yield 'eliminada', a[1], a[2], []
+                    a = next(it_ant, None)
+                elif a is None or b[0] < a[0]:
+                    yield 'agregada', b[1], [], b[2]
+                    b = next(it_act, None)
+                else:
+                    if a[2] != b[2]:
+                        yield 'cambiada', a[1], a[2], b[2]
+                    a = next(it_ant, None)
+                    b = next(it_act, None)
+        finally:
+            # cerrar los generadores antes de borrar el directorio temporal
+            it_ant.close()
+            it_act.close()
+
+# -------------------------
+# API publica
+# -------------------------
+
+def diff_snapshots(registros_ant, registros_act, externo: bool = False, max_lineas: int = 200000) -> dict:
+    """
+    Compara dos snapshots (iterables de registros de generar_linaje_impala) y agrupa por tabla destino:
+    {
+      'resumen': {'agregadas': n, 'eliminadas': n, 'cambiadas': n},
+      'tablas': {tabla_destino: {'agregadas': [...], 'eliminadas': [...], 'cambiadas': [...]}}
+    }
+    """
+    if externo:
+        difs = iter_diferencias_externo(registros_ant, registros_act, max_lineas)
+    else:
+        difs = iter_diferencias_memoria(registros_ant, registros_act)
+    resumen = {'agregadas': 0, 'eliminadas': 0, 'cambiadas': 0}
+    tablas = {}
+    for tipo, clave, antes, despues in difs:
+        arista = dict(zip(CAMPOS_CLAVE, clave))
+        if tipo == 'cambiada':
+            arista['transformaciones_antes'] = sorted({h[0] for h in antes if h[0]})
+            arista['transformaciones_despues'] = sorted({h[0] for h in despues if h[0]})
+        grupo = tablas.setdefault(arista['tabla_destino'] or '', {'agregadas': [], 'eliminadas': [], 'cambiadas': []})
+        llave = tipo + 's'  # agregada -> agregadas
+        grupo[llave].append(arista)
+        resumen[llave] += 1
+    # orden determinista para que el diff sea comparable entre corridas
+    for grupo in tablas.values():
+        for lista in grupo.values():
+            lista.sort(key=lambda a: tuple(a[k] or '' for k in CAMPOS_CLAVE))
+    return {'resumen': resumen, 'tablas': dict(sorted(tablas.items()))}
+
+
+def diff_archivos(ruta_ant: str, ruta_act: str, externo: bool = False, max_lineas: int = 200000) -> dict:
+    """Igual que diff_snapshots pero leyendo los snapshots json en streaming."""
+    return diff_snapshots(iter_registros_json(ruta_ant), iter_registros_json(ruta_act), externo, max_lineas)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Diff de linaje entre dos snapshots json')
+    parser.add_argument('anterior', help='snapshot de la corrida anterior')
+    parser.add_argument('actual', help='snapshot de la corrida actual')
+    parser.add_argument('--externo', action='store_true',
+                        help='usar ordenamiento externo en disco (memoria acotada)')
+    parser.add_argument('--max-lineas', type=int, default=200000,
+                        help='aristas por corrida en modo externo')
+    parser.add_argument('--salida', help='ruta json de salida (por defecto stdout)')
+    args = parser.parse_args(argv)
+    res = diff_archivos(args.anterior, args.actual, args.externo, args.max_lineas)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(res, f, ensure_ascii=False, indent=2)
+    else:
+        json.dump(res, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write('\n')
+    r = res['resumen']
+    print('agregadas=%d eliminadas=%d cambiadas=%d' % (r['agregadas'], r['eliminadas'], r['cambiadas']),
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
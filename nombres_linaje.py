@@ -0,0 +1,308 @@
+"""
+Modelo canonico de nombres de tablas y campos del linaje
+Un solo lugar para las reglas que antes se repetian en normalize_sql, el loop de
+minusculas de generar_linaje_impala, normalizeTable/normalizeField de app.js y
+parse_schema/zone_prefix del notebook.
+
+Notas:
+- cada nombre se normaliza (trim + minusculas) y se parsea una sola vez
+- los nombres se internan en una tabla de simbolos global (SIMBOLOS): nombre -> id entero
+- atributos derivados (zona, tipo de zona, prefijo S/P/R/U, iniciable, lz, permitida) quedan cacheados por id
+- el cache de textos normalizados (SIMBOLOS.texto) es acotado: al llegar a MAX_TEXTOS se vacia,
+  asi un parseo en streaming o pedidos con nombres arbitrarios no lo hacen crecer sin limite
+- las etapas posteriores (indices, api) trabajan con ids y consultan estos atributos sin re-parsear
+"""
+
+import re
+import sys
+import threading
+from collections import namedtuple
+
+# palabras que no pueden ser nombre de campo (mismo listado que app.js)
+RESERVED_FIELD_WORDS = frozenset([
+    'abort','add','add_months','adddate','aggregate','all','alter','analyze','analytic','and','any',
+    'appx_median','archive','array','as','asc','authorization','avg','between','bigint','binary',
+    'boolean','both','break','bucket','buckets','by','cache','case','cascade','cast','change',
+    'char','class','close','cluster','clustered','coalesce','collection','column','columns',
+    'comment','compact','compactions','compute','conf','continue','count','create','cross',
+    'current','current_date','current_timestamp','cursor','data','database','databases','date',
+    'date_add','date_sub','datediff','datetime','day','dayname','dayofmonth','dayofweek',
+    'dayofyear','dbproperties','decimal','deferred','delimited','dependency','desc','describe',
+    'directories','directory','disable','distinct','distribute','div','double','drop','else',
+    'enable','end','escape','escaped','except','exchange','exclusive','exists','explain','extract',
+    'extended','external','false','fetch','field','fields','file','fileformat','files','finalize',
+    'first','float','floor','following','for','format','from','from_timestamp','from_unixtime',
+    'from_utc_timestamp','full','function','functions','grant','group','having','hold','hour','if',
+    'ifnull','import','in','incremental','init','initially','inner','inputdriver','inputformat',
+    'inpath','insert','int','integer','intersect','interval','into','is','isnull','item','join',
+    'key','keys','last','last_day','lateral','left','length','like','limit','lines','load','local',
+    'location','lock','locks','log','lower','macro','map','mapjoin','materialized','max','merge',
+    'metadata','min','minus','minute','more','months_between','none','nonstrict','not','now','null',
+    'nulls','nvl','offset','on','or','order','outer','outputdriver','outputformat','over',
+    'overwrite','parquet','partition','partitioned','partitions','percent','power','preceding',
+    'primary','procedure','protection','purge','range','read','readonly','real','rebuild',
+    'recordreader','recordwriter','recover','regexp_count','regexp_extract','regexp_instr',
+    'regexp_like','regexp_replace','regexp_substr','reload','rename','replace','replication',
+    'repair','restrict','revoke','rewrite','right','rlike','role','roles','rollback','round','row',
+    'rows','schema','schemas','second','select','semi','sequencefile','serde','serdeproperties',
+    'server','set','sets','shared','show','skewed','smallint','sort','sqrt','ssl','statistics',
+    'stored','streamtable','str_to_timestamp','string','struct','substr','sum','table','tables',
+    'tablesample','tblproperties','temporary','terminated','textfile','then','timestamp',
+    'timestamp_micros','timestamp_millis','timestamp_seconds','tinyint','to','to_date',
+    'to_timestamp','to_unix_timestamp','touch','transform','transaction','transactions','trim',
+    'true','trunc','truncate','typeof','unarchive','unbounded','union','unique','unix_timestamp',
+    'unlock','unsigned','update','upper','use','using','validate','value','values','variance',
+    'varchar','view','views','wait','when','where','while','with','write'
+])
+
+# prefijos de esquema permitidos (TABLE_PATTERNS de app.js)
+_RX_TABLA_PERMITIDA = re.compile(r'^(?:s_bani[^.]*|proceso[^.]*|resultados[^.]*)\.[^.]+$')
+_RX_CAMPO_VALIDO = re.compile(r'^[a-z0-9]+(?:_[a-z0-9]+)*$')
+_RX_NUMERO = re.compile(r'^-?\d+(\.\d+)?$')
+
+# orden de presentacion de los tipos de zona (zoneTypeOrder de app.js)
+# entradas del cache crudo -> normalizado de TablaSimbolos.texto antes de vaciarlo
+MAX_TEXTOS = 100000
+
+ORDEN_TIPO_ZONA = {'resultados': 0, 'proceso': 1, 's_bani': 2, 'lz-estatico': 3, 'lz-funcion': 4, 'otro': 5}
+
+InfoTabla = namedtuple('InfoTabla', [
+    'id', 'nombre', 'esquema', 'base', 'zona', 'tipo_zona', 'prefijo_zona', 'iniciable', 'es_lz', 'permitida'
+])
+InfoCampo = namedtuple('InfoCampo', ['id', 'tabla_id', 'campo', 'nombre', 'valido'])
+
+# -------------------------
+# Reglas de nombres (funciones puras)
+# -------------------------
+
+def normalizar_nombre(valor) -> str:
+    """trim + minusculas; None -> None (normalizeField de app.js)."""
+    if valor is None:
+        return None
+    if not isinstance(valor, str):
+        valor = str(valor)
+    return valor.strip().lower()
+
+
+def es_lz(tabla: str) -> bool:
+    return bool(tabla) and (tabla.startswith('lz.estatico') or tabla.startswith('lz.funcion'))
+
+
+def zona_de_tabla(tabla: str) -> str:
+    """Zona = esquema, salvo lz.estatico / lz.funcion que son zonas propias."""
+    if not tabla:
+        return None
+    if tabla.startswith('lz.estatico'):
+        return 'lz.estatico'
+    if tabla.startswith('lz.funcion'):
+        return 'lz.funcion'
+    return tabla.split('.', 1)[0]
+
+
+def tipo_zona(zona: str) -> str:
+    if not zona:
+        return 'otro'
+    if zona.startswith('resultados'):
+        return 'resultados'
+    if zona.startswith('proceso'):
+        return 'proceso'
+    if zona.startswith('s_bani'):
+        return 's_bani'
+    if zona.startswith('lz.estatico'):
+        return 'lz-estatico'
+    if zona.startswith('lz.funcion'):
+        return 'lz-funcion'
+    return 'otro'
+
+
+def prefijo_zona(tabla: str) -> str:
+    """Prefijo corto por zona usado en los ids del notebook: S (s_*), P, R o U."""
+    esquema = (tabla or '').split('.', 1)[0]
+    if esquema.startswith('s_'):
+        return 'S'
+    if esquema.startswith('proceso'):
+        return 'P'
+    if esquema.startswith('resultados'):
+        return 'R'
+    return 'U'
+
+
+def es_tabla_iniciable(tabla: str) -> bool:
+    """Tablas desde las que se inicia/recorre el cierre upstream (resultados*/proceso*)."""
+    return bool(tabla) and (tabla.startswith('resultados') or tabla.startswith('proceso'))
+
+
+def es_tabla_permitida(tabla: str) -> bool:
+    if not tabla:
+        return False
+    if es_lz(tabla):
+        return True
+    return bool(_RX_TABLA_PERMITIDA.match(tabla))
+
+
+def es_campo_valido(campo: str, tabla: str = None) -> bool:
+    """
+    '*' permitido; no palabra reservada; numeros puros solo si vienen de lz.estatico;
+    snake_case que empieza y termina en [a-z0-9].
+    """
+    if not campo:
+        return False
+    if campo == '*':
+        return True
+    if campo in RESERVED_FIELD_WORDS:
+        return False
+    if _RX_NUMERO.match(campo):
+        return bool(tabla) and tabla.startswith('lz.estatico')
+    return bool(_RX_CAMPO_VALIDO.match(campo))
+
+# -------------------------
+# Tabla de simbolos
+# -------------------------
+
+class TablaSimbolos:
+    """
+    Interna nombres de tablas y campos. Las lecturas no toman lock (dict.get es atomico);
+    las altas si, con doble verificacion.
+    """
+
+    def __init__(self, max_textos: int = MAX_TEXTOS):
+        self._lock = threading.Lock()
+        self.max_textos = max_textos
+        self._ids_tabla = {}   # texto (crudo o normalizado) -> id de tabla
+        self._tablas = []      # id -> InfoTabla (None: podado, ver podar)
+        self._ids_campo = {}   # (tabla_id, texto de campo) -> id de campo
+        self._campos = []      # id -> InfoCampo (None: podado)
+        self._textos = {}      # texto crudo -> texto normalizado internado (acotado, ver texto)
+
+    def __len__(self) -> int:
+        return len(self._tablas) + len(self._campos)
+
+    def texto(self, valor) -> str:
+        """
+        Normaliza e interna un texto (sin alta en la tabla de simbolos).
+        El cache se vacia al llegar a max_textos entradas (reasignacion: las lecturas sin lock
+        ven el dict anterior o el nuevo).
+        """
+        if valor is None:
+            return None
+        t = self._textos.get(valor)
+        if t is None:
+            t = sys.intern(normalizar_nombre(valor))
+            textos = self._textos
+            if len(textos) >= self.max_textos:
+                textos = self._textos = {}
+            textos[valor] = t
+        return t
+
+    def id_tabla(self, nombre) -> int:
+        """Id de la tabla (la da de alta si no existe). None o '' -> None."""
+        if not nombre:
+            return None
+        tid = self._ids_tabla.get(nombre)
+        if tid is not None:
+            return tid
+        norm = self.texto(nombre)
+        if not norm:
+            return None
+        with self._lock:
+            tid = self._ids_tabla.get(norm)
+            if tid is None:
+                tid = len(self._tablas)
+                self._tablas.append(_info_tabla(tid, norm))
+                self._ids_tabla[norm] = tid
+            self._ids_tabla[nombre] = tid
+        return tid
+
+    def id_campo(self, tabla_id: int, campo) -> int:
+        """Id del campo dentro de su tabla. None o '' -> None."""
+        if tabla_id is None or not campo:
+            return None
+        cid = self._ids_campo.get((tabla_id, campo))
+        if cid is not None:
+            return cid
+        norm = self.texto(campo)
+        if not norm:
+            return None
+        with self._lock:
+            cid = self._ids_campo.get((tabla_id, norm))
+            if cid is None:
+                cid = len(self._campos)
+                tabla = self._tablas[tabla_id].nombre
+                self._campos.append(InfoCampo(cid, tabla_id, norm, sys.intern(tabla + '.' + norm),
+                                              es_campo_valido(norm, tabla)))
+                self._ids_campo[(tabla_id, norm)] = cid
+            self._ids_campo[(tabla_id, campo)] = cid
+        return cid
+
+    def id_nombre_calificado(self, nombre: str) -> tuple:
+        """'schema.tabla.columna' -> (tabla_id, campo_id); 'schema.tabla' -> (tabla_id, None)."""
+        norm = self.texto(nombre)
+        if not norm:
+            return None, None
+        partes = norm.split('.')
+        if len(partes) <= 2:
+            return self.id_tabla(norm), None
+        tid = self.id_tabla(partes[0] + '.' + partes[1])
+        return tid, self.id_campo(tid, '.'.join(partes[2:]))
+
+    def tabla(self, tid: int) -> InfoTabla:
+        return self._tablas[tid]
+
+    def campo(self, cid: int) -> InfoCampo:
+        return self._campos[cid]
+
+    def nombre_tabla(self, tid: int) -> str:
+        return None if tid is None else self._tablas[tid].nombre
+
+    def podar(self, tablas_vivas) -> int:
+        """
+        Da de baja las tablas (y sus campos) que no estan en tablas_vivas y vacia el cache de textos.
+        Los ids vivos no cambian; los dados de baja quedan como hueco (None) y no se reutilizan,
+        asi que solo debe llamarse cuando ningun indice usa ya los ids podados
+        (GestorSnapshots lo hace al retirar el ultimo snapshot anterior). Retorna tablas podadas.
+        """
+        vivas = set(tablas_vivas)
+        with self._lock:
+            podadas = 0
+            for tid, info in enumerate(self._tablas):
+                if info is not None and tid not in vivas:
+                    self._tablas[tid] = None
+                    podadas += 1
+            for cid, info in enumerate(self._campos):
+                if info is not None and info.tabla_id not in vivas:
+                    self._campos[cid] = None
+            # dicts nuevos y reasignacion: las lecturas sin lock nunca ven un dict a medio podar
+            self._ids_tabla = {k: v for k, v in self._ids_tabla.items() if v in vivas}
+            self._ids_campo = {k: v for k, v in self._ids_campo.items() if k[0] in vivas}
+            self._textos = {}
+        return podadas
+
+    def buscar_tabla(self, nombre) -> int:
+        """Id de una tabla ya conocida, sin darla de alta (None si no existe)."""
+        if not nombre:
+            return None
+        tid = self._ids_tabla.get(nombre)
+        if tid is None:
+            tid = self._ids_tabla.get(normalizar_nombre(nombre))
+        return tid
+
+
+def _info_tabla(tid: int, nombre: str) -> InfoTabla:
+    esquema, _, base = nombre.rpartition('.')
+    zona = zona_de_tabla(nombre)
+    return InfoTabla(
+        id=tid,
+        nombre=nombre,
+        esquema=esquema,
+        base=base,
+        zona=sys.intern(zona) if zona else zona,
+        tipo_zona=tipo_zona(zona),
+        prefijo_zona=prefijo_zona(nombre),
+        iniciable=es_tabla_iniciable(nombre),
+        es_lz=es_lz(nombre),
+        permitida=es_tabla_permitida(nombre),
+    )
+
+
+# tabla de simbolos global compartida por el parser y la api
+SIMBOLOS = TablaSimbolos()
@@ -0,0 +1,166 @@
+"""
+Paginacion por cursor (keyset) sobre indices de aristas preordenados
+El paginado por offset sobre una lista filtrada re-filtra y re-corta en cada pagina:
+la pagina 500 cuesta lo mismo que el recorrido completo. Aqui cada (zona, tabla, nivel)
+tiene su arreglo de aristas ya ordenado y el cursor es la clave de la ultima arista entregada.
+
+Notas:
+- clave de orden estable: (tabla_destino, campo_destino, tabla_origen, campo_origen, transformacion,
+  consulta_id, n) derivada solo del contenido (el id uuid4 cambia en cada corrida de linaje.py);
+  n numera registros de contenido identico, que son intercambiables: el cursor sigue siendo
+  valido despues de recargar datos
+- mismos filtros que el visor (IndiceNivel.posiciones_filtradas / getFilteredRecords):
+  zona y 'all' solo traen aristas con destino iniciable (resultados*/proceso*); tabla trae las
+  aristas entrantes de todo su cierre upstream restringido (lo mismo que dibuja /api/closure)
+- costo por pagina: busqueda binaria + corte de tamano limite (O(log n + limite))
+- un solo ordenamiento global; los arreglos de zona se reparten al construir, los de tabla se
+  arman bajo demanda (cierre + orden por rango global) y quedan en un LRU de MAX_TABLAS_CACHEADAS
+- la variante que oculta lz se construye bajo demanda y queda cacheada
+- el cursor viaja como texto opaco (base64url de la clave en json)
+"""
+
+import base64
+import bisect
+import json
+import threading
+from collections import OrderedDict
+
+from formato_compacto import id_consulta
+from nombres_linaje import SIMBOLOS
+
+LIMITE_POR_DEFECTO = 100
+LIMITE_MAXIMO = 5000
+# arreglos por tabla (cierre upstream) cacheados por indice
+MAX_TABLAS_CACHEADAS = 256
+
+
+def clave_orden(rec: dict) -> tuple:
+    """Clave de contenido (sin el ordinal de duplicados que agrega IndicePaginacion)."""
+    consulta = rec.get('consulta')
+    return (
+        rec.get('tabla_destino') or '',
+        rec.get('campo_destino') or '',
+        rec.get('tabla_origen') or '',
+        rec.get('campo_origen') or '',
+        rec.get('transformacion_aplicada') or '',
+        id_consulta(consulta) if consulta else '',
+    )
+
+
+def codificar_cursor(clave: tuple) -> str:
+    crudo = json.dumps(list(clave), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(crudo).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor: str) -> tuple:
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        clave = json.loads(base64.urlsafe_b64decode(cursor + relleno).decode('utf-8'))
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('cursor invalido')
+    if (not isinstance(clave, list) or len(clave) != 7 or not all(isinstance(c, str) for c in clave[:6])
+            or not isinstance(clave[6], int)):
+        raise ValueError('cursor invalido')
+    return tuple(clave)
+
+
+class _Arreglo:
+    """Claves ordenadas + posiciones de registro en el mismo orden."""
+    __slots__ = ('claves', 'posiciones')
+
+    def __init__(self):
+        self.claves = []
+        self.posiciones = []
+
+
+class IndicePaginacion:
+    """Arreglos preordenados por zona (y por tabla, bajo demanda) sobre un IndiceNivel."""
+
+    def __init__(self, indice_nivel):
+        self.indice = indice_nivel
+        self._arreglos = {}
+        self._tablas = OrderedDict()  # (id de tabla, ocultar_lz) -> _Arreglo (LRU)
+        self._lock = threading.Lock()
+        registros = indice_nivel.registros
+        claves = [clave_orden(r) for r in registros]
+        orden = sorted(range(len(registros)), key=claves.__getitem__)
+        # ordinal entre registros de contenido identico: la clave final es unica
+        previa = None
+        n = 0
+        self._rango = [0] * len(registros)
+        for i, pos in enumerate(orden):
+            clave = claves[pos]
+            n = n + 1 if clave == previa else 0
+            previa = clave
+            claves[pos] = clave + (n,)
+            self._rango[pos] = i
+        self._claves = claves
+        todos = self._arreglos[('all', 'all', False)] = _Arreglo()
+        for pos in orden:
+            info = SIMBOLOS.tabla(indice_nivel.destino[pos])
+            if not info.iniciable:
+                continue
+            for arr in (todos, self._arreglos.setdefault((info.zona, 'all', False), _Arreglo())):
+                arr.claves.append(claves[pos])
+                arr.posiciones.append(pos)
+
+    def _arreglo_tabla(self, tabla: str, ocultar_lz: bool) -> _Arreglo:
+        """Aristas del cierre upstream de la tabla (posiciones_filtradas), en el orden global."""
+        tid = SIMBOLOS.buscar_tabla(tabla)
+        if tid is None:
+            return None
+        llave = (tid, ocultar_lz)
+        with self._lock:
+            arr = self._tablas.get(llave)
+            if arr is not None:
+                self._tablas.move_to_end(llave)
+                return arr
+        posiciones = self.indice.posiciones_filtradas(tabla=SIMBOLOS.nombre_tabla(tid), ocultar_lz=ocultar_lz)
+        posiciones.sort(key=self._rango.__getitem__)
+        arr = _Arreglo()
+        arr.posiciones = posiciones
+        arr.claves = [self._claves[p] for p in posiciones]
+        with self._lock:
+            self._tablas[llave] = arr
+            while len(self._tablas) > MAX_TABLAS_CACHEADAS:
+                self._tablas.popitem(last=False)
+        return arr
+
+    def _arreglo(self, zona: str, tabla: str, ocultar_lz: bool) -> _Arreglo:
+        if tabla != 'all':
+            return self._arreglo_tabla(tabla, ocultar_lz)  # la tabla ya determina la zona
+        arr = self._arreglos.get((zona, tabla, ocultar_lz))
+        if arr is not None or not ocultar_lz:
+            return arr
+        base = self._arreglos.get((zona, tabla, False))
+        if base is None:
+            return None
+        with self._lock:
+            arr = self._arreglos.get((zona, tabla, True))
+            if arr is None:
+                arr = _Arreglo()
+                for clave, pos in zip(base.claves, base.posiciones):
+                    if not SIMBOLOS.tabla(self.indice.origen[pos]).es_lz:
+                        arr.claves.append(clave)
+                        arr.posiciones.append(pos)
+                self._arreglos[(zona, tabla, True)] = arr
+        return arr
+
+    def pagina(self, zona: str = 'all', tabla: str = 'all', cursor: str = None,
+               limite: int = LIMITE_POR_DEFECTO, ocultar_lz: bool = False) -> dict:
+        """
+        Siguiente pagina despues del cursor. Retorna
+        {'records': [...], 'next_cursor': str o None, 'total': n, 'limit': limite}.
+        """
+        limite = max(1, min(int(limite), LIMITE_MAXIMO))
+        zona = (zona or 'all').strip().lower()
+        tabla = (tabla or 'all').strip().lower()
+        arr = self._arreglo(zona, tabla, ocultar_lz)
+        if arr is None:
+            return {'records': [], 'next_cursor': None, 'total': 0, 'limit': limite}
+        inicio = bisect.bisect_right(arr.claves, decodificar_cursor(cursor)) if cursor else 0
+        fin = min(inicio + limite, len(arr.claves))
+        registros = self.indice.registros
+        pagina = [registros[p] for p in arr.posiciones[inicio:fin]]
+        siguiente = codificar_cursor(arr.claves[fin - 1]) if fin < len(arr.claves) else None
+        return {'records': pagina, 'next_cursor': siguiente, 'total': len(arr.claves), 'limit': limite}
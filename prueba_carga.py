@@ -0,0 +1,473 @@
+"""
+Prueba de carga del API de linaje con datos sinteticos del tamano del lago
+Genera linaje con las convenciones de zonas (s_bani_*, lz.estatico / lz.funcion, proceso_*,
+resultados_bipa_*), levanta el API localmente y lo golpea con clientes concurrentes
+(zonas, tablas, cierres, paginacion, busqueda). Reporta p50/p95/p99, throughput y memoria.
+
+Notas:
+- el backend FastAPI del README (backend/main:app) no esta en este repo: el script levanta un
+  servidor http minimo (http.server, un hilo por pedido) sobre GestorSnapshots con las mismas
+  piezas que usa el backend (indice, paginacion, cierres cacheados); con --url se apunta a
+  cualquier otro servidor que exponga las mismas rutas
+- rutas: /api/metadata/zones, /api/metadata/tables, /api/closure, /api/relations, /api/search;
+  /api/_stats (solo del servidor de prueba) da el rss maximo del proceso servidor y el snapshot
+- --url no recibe datos del servidor: los pedidos se arman con los datos sinteticos generados en
+  el cliente, por lo que hay que pasar los mismos --tablas, --campos y --semilla que al servidor
+  (si /api/_stats informa otra cantidad de registros se avisa en el reporte)
+- los clientes comparten proceso (y GIL) con el servidor local; para medir sin esa interferencia
+  usar --solo-servidor en un proceso y --url en otro
+- memoria: rss maximo del proceso servidor (via /api/_stats, tambien con --url) y del cliente;
+  con --memoria, tracemalloc (actual/pico) del snapshot y durante la corrida (tracemalloc hace todo mas lento: no mezclar con mediciones de latencia)
+- --max-p95 hace que el script salga con codigo 1 si se supera (gate antes de desplegar)
+
+Uso:
+    python prueba_carga.py --tablas 5000 --clientes 16 --duracion 30
+    python prueba_carga.py --solo-servidor --puerto 8001 --tablas 20000
+    python prueba_carga.py --url http://localhost:8001 --tablas 20000 --clientes 32 --mezcla cierre=50,paginacion=50
+"""
+
+import argparse
+import json
+import math
+import random
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import HTTPError
+from urllib.parse import parse_qs, quote, urlparse
+from urllib.request import urlopen
+
+from indice_linaje import construir_elementos
+from nombres_linaje import SIMBOLOS
+from snapshot_linaje import GestorSnapshots
+
+try:
+    import resource
+except ImportError:  # no disponible en windows
+    resource = None
+
+MEZCLA_POR_DEFECTO = {'zonas': 10, 'tablas': 15, 'cierre': 30, 'paginacion': 35, 'busqueda': 10}
+PAGINAS_POR_RECORRIDO = 5
+
+# -------------------------
+# Generador de linaje sintetico
+# -------------------------
+
+def generar_linaje_sintetico(tablas: int = 5000, campos_por_tabla: int = 8, semilla: int = 1) -> list:
+    """
+    Registros con la forma de generar_linaje_impala, en capas:
+    s_bani_* (fuentes) + lz -> proceso_* (varias capas) -> resultados_bipa_*.
+    Cada tabla destino sale de una sentencia insert con 1 a 3 tablas origen.
+    """
+    rnd = random.Random(semilla)
+    n_fuentes = max(1, tablas * 30 // 100)
+    n_lz = max(1, tablas * 2 // 100)
+    n_resultados = max(1, tablas * 20 // 100)
+    n_proceso = max(1, tablas - n_fuentes - n_lz - n_resultados)
+    esquemas_s = ['s_bani_core', 's_bani_clientes', 's_bani_productos', 's_bani_canales']
+    fuentes = ['%s.t%05d' % (esquemas_s[i % len(esquemas_s)], i) for i in range(n_fuentes)]
+    lz = [('lz.estatico_%03d' if i % 2 else 'lz.funcion_%03d') % i for i in range(n_lz)]
+    n_esquemas_proc = max(1, n_proceso // 200)
+    proceso = ['proceso_bipa_%02d.p%05d' % (i % n_esquemas_proc, i) for i in range(n_proceso)]
+    n_esquemas_res = max(1, n_resultados // 100)
+    resultados = ['resultados_bipa_%02d.r%05d' % (i % n_esquemas_res, i) for i in range(n_resultados)]
+
+    def campos(tabla: str) -> list:
+        if tabla.startswith('lz.estatico'):
+            return [str(i) for i in range(1, 4)]
+        return ['c%02d' % i for i in range(campos_por_tabla)]
+
+    registros = []
+
+    def sentencia(destino: str, origenes: list) -> None:
+        cols_dest = campos(destino)
+        items = []
+        mapeo = []
+        for j, col in enumerate(cols_dest):
+            origen = origenes[j % len(origenes)]
+            col_o = rnd.choice(campos(origen))
+            transformacion = rnd.choice(('copy', 'copy', 'copy', 'cast', 'coalesce', 'upper'))
+            alias = 't%d' % origenes.index(origen)
+            expr = '%s.%s' % (alias, col_o) if transformacion == 'copy' else '%s(%s.%s)' % (transformacion, alias, col_o)
+            items.append('%s as %s' % (expr, col))
+            mapeo.append((origen, col_o, col, transformacion))
+        desde = ' join '.join('%s t%d' % (o, k) for k, o in enumerate(origenes))
+        consulta = 'insert overwrite table %s select %s from %s' % (destino, ', '.join(items), desde)
+        for origen, col_o, col, transformacion in mapeo:
+            registros.append({
+                'id': str(uuid.UUID(int=rnd.getrandbits(128), version=4)),
+                'consulta': consulta,
+                'tabla_origen': origen,
+                'tabla_destino': destino,
+                'campo_origen': col_o,
+                'campo_destino': col,
+                'transformacion_aplicada': transformacion,
+                'recomendaciones': 'mapping inferido sin lista destino; se recomienda especificar columnas en el insert para mayor claridad',
+            })
+
+    for i, destino in enumerate(proceso):
+        # capas: cada proceso lee de fuentes, lz o procesos anteriores
+        candidatos = fuentes if i < len(proceso) // 4 else fuentes + proceso[max(0, i - 500):i]
+        origenes = rnd.sample(candidatos, min(rnd.randint(1, 3), len(candidatos)))
+        if rnd.random() < 0.1:
+            origenes.append(rnd.choice(lz))
+        sentencia(destino, origenes)
+    for destino in resultados:
+        origenes = rnd.sample(proceso, min(rnd.randint(1, 3), len(proceso)))
+        if rnd.random() < 0.2:
+            origenes.append(rnd.choice(fuentes))
+        sentencia(destino, origenes)
+    return registros
+
+# -------------------------
+# Servidor http minimo
+# -------------------------
+
+def _flag(params: dict, nombre: str) -> bool:
+    return params.get(nombre, ['false'])[0].lower() in ('1', 'true', 'si', 'yes')
+
+
+class _Busqueda:
+    """Nombres de tabla ordenados por snapshot (se reconstruye cuando cambia la version)."""
+
+    def __init__(self):
+        self._version = None
+        self._nombres = []
+        self._lock = threading.Lock()
+
+    def nombres(self, snap) -> list:
+        if self._version != snap.version:
+            with self._lock:
+                if self._version != snap.version:
+                    nivel = snap.indice.nivel('tablas')
+                    tids = set(nivel.entrantes) | set(nivel.salientes)
+                    self._nombres = sorted(SIMBOLOS.nombre_tabla(t) for t in tids)
+                    self._version = snap.version
+        return self._nombres
+
+
+def _manejar(gestor: GestorSnapshots, busqueda: _Busqueda, ruta: str, params: dict):
+    """(status, cuerpo) para una ruta del API."""
+    nivel = params.get('nivel', ['tablas'])[0]
+    ocultar_lz = _flag(params, 'ocultar_lz')
+    with gestor.usar() as snap:
+        if ruta == '/api/_stats':
+            return 200, {'rss_maximo_mb': _rss_maximo_mb(), 'snapshot': {
+                'version': snap.version,
+                'registros': len(snap.indice.nivel('tablas').registros),
+                'segundos_construccion': round(snap.segundos_construccion, 2),
+            }}
+        if ruta == '/api/metadata/zones':
+            return 200, snap.indice.nivel(nivel).zonas(ocultar_lz)
+        if ruta == '/api/metadata/tables':
+            zona = params.get('zona', ['all'])[0]
+            tablas = set()
+            for z in snap.indice.nivel(nivel).zonas(ocultar_lz):
+                if zona in ('all', z['zone']):
+                    tablas.update(z['startTables'])
+            return 200, sorted(tablas)
+        if ruta == '/api/closure':
+            tabla = params.get('tabla', [''])[0]
+            cierre = snap.cierre_upstream(nivel, tabla, ocultar_lz)
+            registros = snap.indice.nivel(nivel).registros_filtrados(tabla=tabla, ocultar_lz=ocultar_lz)
+            return 200, {'tables': sorted(SIMBOLOS.nombre_tabla(t) for t in cierre),
+                         'elements': construir_elementos(registros, nivel, catalogo=snap.catalogo)}
+        if ruta == '/api/relations':
+            return 200, snap.paginacion[nivel].pagina(
+                params.get('zona', ['all'])[0], params.get('tabla', ['all'])[0],
+                params.get('cursor', [None])[0], int(params.get('limit', ['100'])[0]), ocultar_lz)
+        if ruta == '/api/search':
+            q = params.get('q', [''])[0].strip().lower()
+            limite = int(params.get('limit', ['50'])[0])
+            res = []
+            for nombre in busqueda.nombres(snap):
+                if q in nombre:
+                    res.append(nombre)
+                    if len(res) >= limite:
+                        break
+            return 200, res
+    return 404, {'error': 'ruta no encontrada: %s' % ruta}
+
+
+def crear_servidor(gestor: GestorSnapshots, host: str = '127.0.0.1', puerto: int = 0) -> ThreadingHTTPServer:
+    """Servidor http (un hilo por pedido) sobre el snapshot vigente del gestor. puerto 0 = libre."""
+    busqueda = _Busqueda()
+
+    class _Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            try:
+                status, cuerpo = _manejar(gestor, busqueda, url.path, parse_qs(url.query))
+            except (ValueError, LookupError) as exc:
+                status, cuerpo = 400, {'error': str(exc)}
+            datos = json.dumps(cuerpo, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(datos)))
+            self.end_headers()
+            self.wfile.write(datos)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer((host, puerto), _Handler)
+    servidor.daemon_threads = True
+    return servidor
+
+# -------------------------
+# Clientes y metricas
+# -------------------------
+
+def percentil(valores_ordenados: list, p: float) -> float:
+    """Percentil por rango mas cercano sobre una lista ya ordenada."""
+    if not valores_ordenados:
+        return 0.0
+    # rango mas cercano: el menor valor con al menos p% de las muestras <= el
+    k = max(0, math.ceil(p / 100.0 * len(valores_ordenados)) - 1)
+    return valores_ordenados[min(k, len(valores_ordenados) - 1)]
+
+
+def _resumen_latencias(latencias: list) -> dict:
+    orden = sorted(latencias)
+    return {
+        'n': len(orden),
+        'p50_ms': round(percentil(orden, 50) * 1000, 3),
+        'p95_ms': round(percentil(orden, 95) * 1000, 3),
+        'p99_ms': round(percentil(orden, 99) * 1000, 3),
+        'max_ms': round(orden[-1] * 1000, 3) if orden else 0.0,
+    }
+
+
+class _Cliente(threading.Thread):
+    """Un analista: elige operaciones segun la mezcla y recorre paginas con el cursor."""
+
+    def __init__(self, base: str, mezcla: dict, muestras: dict, fin: float, max_peticiones: int, semilla: int):
+        super().__init__(daemon=True)
+        self.base = base
+        self.operaciones = list(mezcla)
+        self.pesos = [mezcla[o] for o in self.operaciones]
+        self.muestras = muestras
+        self.fin = fin
+        self.max_peticiones = max_peticiones
+        self.rnd = random.Random(semilla)
+        self.latencias = {o: [] for o in self.operaciones}
+        self.errores = {}
+        self._cursor = None
+        self._paginas = 0
+        self._tabla_pag = 'all'
+
+    def _url(self, op: str) -> str:
+        rnd = self.rnd
+        nivel = 'campos' if rnd.random() < 0.3 else 'tablas'
+        if op == 'zonas':
+            return '/api/metadata/zones?nivel=%s' % nivel
+        if op == 'tablas':
+            return '/api/metadata/tables?nivel=%s&zona=%s' % (nivel, quote(rnd.choice(self.muestras['zonas'])))
+        if op == 'cierre':
+            return '/api/closure?nivel=%s&tabla=%s' % (nivel, quote(rnd.choice(self.muestras['iniciables'])))
+        if op == 'busqueda':
+            return '/api/search?q=%s' % quote(rnd.choice(self.muestras['busquedas']))
+        # paginacion: sigue el cursor unas cuantas paginas y vuelve a empezar
+        if self._cursor is None or self._paginas >= PAGINAS_POR_RECORRIDO:
+            self._cursor = None
+            self._paginas = 0
+            self._tabla_pag = rnd.choice(self.muestras['iniciables']) if rnd.random() < 0.5 else 'all'
+        url = '/api/relations?tabla=%s&limit=100' % quote(self._tabla_pag)
+        if self._cursor:
+            url += '&cursor=' + self._cursor
+        return url
+
+    def run(self):
+        n = 0
+        while time.perf_counter() < self.fin and (not self.max_peticiones or n < self.max_peticiones):
+            op = self.rnd.choices(self.operaciones, self.pesos)[0]
+            url = self._url(op)
+            inicio = time.perf_counter()
+            try:
+                with urlopen(self.base + url, timeout=60) as resp:
+                    cuerpo = resp.read()
+                self.latencias[op].append(time.perf_counter() - inicio)
+                if op == 'paginacion':
+                    self._cursor = json.loads(cuerpo).get('next_cursor')
+                    self._paginas += 1
+            except (HTTPError, OSError) as exc:
+                clave = '%s: %s' % (op, getattr(exc, 'code', type(exc).__name__))
+                self.errores[clave] = self.errores.get(clave, 0) + 1
+            n += 1
+
+
+def muestras_de_registros(registros: list, semilla: int = 1, n: int = 500) -> dict:
+    """Zonas, tablas iniciables y textos de busqueda para armar pedidos realistas."""
+    rnd = random.Random(semilla)
+    zonas = set()
+    iniciables = set()
+    for rec in registros:
+        info = SIMBOLOS.tabla(SIMBOLOS.id_tabla(rec['tabla_destino']))
+        zonas.add(info.zona)
+        if info.iniciable:
+            iniciables.add(info.nombre)
+    iniciables = sorted(iniciables)
+    iniciables = rnd.sample(iniciables, min(n, len(iniciables)))
+    busquedas = [t.split('.', 1)[1][:3] for t in iniciables[:50]] + ['resultados', 'proceso_bipa', 's_bani', 'c0']
+    return {'zonas': sorted(zonas), 'iniciables': iniciables, 'busquedas': busquedas}
+
+
+def ejecutar_carga(base: str, muestras: dict, clientes: int = 8, duracion: float = 10.0,
+                   max_peticiones: int = 0, mezcla: dict = None, semilla: int = 1) -> dict:
+    """Corre los clientes concurrentes y retorna latencias por operacion, throughput y errores."""
+    mezcla = mezcla or MEZCLA_POR_DEFECTO
+    inicio = time.perf_counter()
+    hilos = [_Cliente(base, mezcla, muestras, inicio + duracion, max_peticiones, semilla + i)
+             for i in range(clientes)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    segundos = time.perf_counter() - inicio
+    por_operacion = {}
+    todas = []
+    errores = {}
+    for op in mezcla:
+        lat = [x for h in hilos for x in h.latencias[op]]
+        todas.extend(lat)
+        por_operacion[op] = _resumen_latencias(lat)
+    for h in hilos:
+        for k, v in h.errores.items():
+            errores[k] = errores.get(k, 0) + v
+    total = _resumen_latencias(todas)
+    total['throughput_rps'] = round(len(todas) / segundos, 1) if segundos else 0.0
+    total['segundos'] = round(segundos, 2)
+    total['clientes'] = clientes
+    return {'total': total, 'operaciones': por_operacion, 'errores': errores}
+
+
+def _rss_maximo_mb() -> float:
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux reporta kB, macos bytes
+    return round(rss / 1024.0 / (1024.0 if sys.platform == 'darwin' else 1.0), 1)
+
+
+def consultar_stats(base: str) -> dict:
+    """/api/_stats del servidor (None si el servidor no la expone)."""
+    try:
+        with urlopen(base + '/api/_stats', timeout=60) as resp:
+            return json.loads(resp.read())
+    except (HTTPError, OSError, ValueError):
+        return None
+
+
+def _parsear_mezcla(texto: str) -> dict:
+    mezcla = {}
+    for parte in texto.split(','):
+        op, _, peso = parte.partition('=')
+        op = op.strip()
+        if op not in MEZCLA_POR_DEFECTO:
+            raise ValueError('operacion desconocida en --mezcla: %s (usar %s)' % (op, ', '.join(MEZCLA_POR_DEFECTO)))
+        mezcla[op] = float(peso or 1)
+    return mezcla
+
+# -------------------------
+# CLI
+# -------------------------
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Prueba de carga del API de linaje con datos sinteticos')
+    parser.add_argument('--tablas', type=int, default=5000, help='tablas sinteticas a generar')
+    parser.add_argument('--campos', type=int, default=8, help='campos por tabla')
+    parser.add_argument('--clientes', type=int, default=8)
+    parser.add_argument('--duracion', type=float, default=10.0, help='segundos de carga')
+    parser.add_argument('--peticiones', type=int, default=0, help='maximo de pedidos por cliente (0 = sin limite)')
+    parser.add_argument('--mezcla', help='pesos por operacion, ej. cierre=30,paginacion=40,busqueda=10')
+    parser.add_argument('--semilla', type=int, default=1)
+    parser.add_argument('--url', help='servidor ya levantado (no se genera ni levanta nada local)')
+    parser.add_argument('--puerto', type=int, default=0)
+    parser.add_argument('--solo-servidor', action='store_true', help='levantar el servidor y quedar escuchando')
+    parser.add_argument('--memoria', action='store_true', help='medir con tracemalloc (mas lento)')
+    parser.add_argument('--max-p95', type=float, help='ms; salir con codigo 1 si el p95 total lo supera')
+    parser.add_argument('--salida', help='escribir el reporte en json')
+    args = parser.parse_args(argv)
+    mezcla = _parsear_mezcla(args.mezcla) if args.mezcla else None
+    reporte = {}
+
+    registros = generar_linaje_sintetico(args.tablas, args.campos, args.semilla)
+    muestras = muestras_de_registros(registros, args.semilla)
+    servidor = None
+    if args.url:
+        base = args.url.rstrip('/')
+    else:
+        if args.memoria:
+            tracemalloc.start()
+        inicio = time.perf_counter()
+        gestor = GestorSnapshots(lambda: registros, origen='sintetico')
+        reporte['datos'] = {'registros': len(registros), 'tablas': args.tablas,
+                            'segundos_snapshot': round(time.perf_counter() - inicio, 2)}
+        if args.memoria:
+            reporte['datos']['snapshot_mb'] = round(tracemalloc.get_traced_memory()[0] / 2 ** 20, 1)
+            tracemalloc.reset_peak()
+        servidor = crear_servidor(gestor, puerto=args.puerto)
+        base = 'http://%s:%d' % servidor.server_address[:2]
+        if args.solo_servidor:
+            print('escuchando en %s (%d registros)' % (base, len(registros)))
+            try:
+                servidor.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            servidor.server_close()
+            print('memoria servidor: rss_maximo_mb=%s' % _rss_maximo_mb())
+            return 0
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+
+    try:
+        reporte['carga'] = ejecutar_carga(base, muestras, args.clientes, args.duracion, args.peticiones,
+                                          mezcla, args.semilla)
+        stats = consultar_stats(base)
+    finally:
+        if servidor is not None:
+            servidor.shutdown()
+            servidor.server_close()
+    # con servidor local cliente y servidor son el mismo proceso
+    memoria = {'rss_maximo_mb_servidor': stats['rss_maximo_mb'] if stats else None,
+               'rss_maximo_mb_cliente': _rss_maximo_mb()}
+    if stats:
+        reporte['servidor'] = stats
+        if stats['snapshot']['registros'] != len(registros):
+            reporte['aviso'] = ('el servidor tiene %d registros y el cliente genero %d: usar los mismos '
+                                '--tablas/--campos/--semilla' % (stats['snapshot']['registros'], len(registros)))
+    if args.memoria and tracemalloc.is_tracing():
+        actual, pico = tracemalloc.get_traced_memory()
+        memoria.update({'tracemalloc_actual_mb': round(actual / 2 ** 20, 1), 'tracemalloc_pico_mb': round(pico / 2 ** 20, 1)})
+        tracemalloc.stop()
+    reporte['memoria'] = memoria
+
+    total = reporte['carga']['total']
+    if 'datos' in reporte:
+        print('datos: %(registros)d registros, snapshot en %(segundos_snapshot)ss' % reporte['datos'])
+    print('%d clientes, %.1fs: %d pedidos, %.1f req/s, p50 %.2fms p95 %.2fms p99 %.2fms' % (
+        total['clientes'], total['segundos'], total['n'], total['throughput_rps'],
+        total['p50_ms'], total['p95_ms'], total['p99_ms']))
+    print('%-12s %8s %10s %10s %10s %10s' % ('operacion', 'n', 'p50 ms', 'p95 ms', 'p99 ms', 'max ms'))
+    for op, r in reporte['carga']['operaciones'].items():
+        print('%-12s %8d %10.2f %10.2f %10.2f %10.2f' % (op, r['n'], r['p50_ms'], r['p95_ms'], r['p99_ms'], r['max_ms']))
+    for k, v in sorted(reporte['carga']['errores'].items()):
+        print('error %s: %d' % (k, v))
+    print('memoria: %s' % ', '.join('%s=%s' % kv for kv in memoria.items()))
+    if 'aviso' in reporte:
+        print('aviso: ' + reporte['aviso'])
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(reporte, f, ensure_ascii=False, indent=2)
+    if args.max_p95 is not None and total['p95_ms'] > args.max_p95:
+        print('p95 %.2fms supera el maximo %.2fms' % (total['p95_ms'], args.max_p95))
+        return 1
+    return 1 if reporte['carga']['errores'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,186 @@
+"""
+Resumen por nivel de detalle (LOD) para cierres de linaje muy grandes
+Un resultados con miles de tablas upstream bloquea drawGraph/buildFieldElements en el navegador.
+Este modulo colapsa el grafo en el servidor antes de enviarlo.
+
+Notas:
+- se trabaja a nivel tabla (los campos de un cierre enorme se resumen en su tabla)
+- los nodos se rankean por grado (in + out) o pagerank; los top_k quedan en detalle
+- el resto se agrupa en super-nodos por zona o esquema con conteo de miembros
+- las aristas hacia/desde super-nodos se agregan con conteo de relaciones
+- cada super-nodo trae un handle 'expand' para pedir su detalle (expandir_supernodo)
+- la tabla objetivo siempre queda en detalle
+"""
+
+from nombres_linaje import SIMBOLOS
+
+CRITERIOS = ('grado', 'pagerank')
+AGRUPACIONES = ('zona', 'esquema')
+
+# -------------------------
+# Grafo de tablas y ranking
+# -------------------------
+
+def _grafo_tablas(registros) -> tuple:
+    """(nodos, aristas) con aristas = {(origen, destino): conteo de registros}."""
+    nodos = set()
+    aristas = {}
+    for rec in registros:
+        o = rec.get('tabla_origen')
+        d = rec.get('tabla_destino')
+        if not o or not d:
+            continue
+        nodos.add(o)
+        nodos.add(d)
+        aristas[(o, d)] = aristas.get((o, d), 0) + 1
+    return nodos, aristas
+
+
+def puntajes_grado(nodos, aristas: dict) -> dict:
+    grado = dict.fromkeys(nodos, 0)
+    for (o, d) in aristas:
+        grado[o] += 1
+        grado[d] += 1
+    return grado
+
+
+def puntajes_pagerank(nodos, aristas: dict, iteraciones: int = 20, amortiguacion: float = 0.85) -> dict:
+    """PageRank sobre el grafo invertido (destino -> origen): pesan las tablas que alimentan mucho linaje."""
+    nodos = list(nodos)
+    n = len(nodos)
+    if n == 0:
+        return {}
+    salientes = {x: [] for x in nodos}
+    for (o, d) in aristas:
+        salientes[d].append(o)
+    rank = dict.fromkeys(nodos, 1.0 / n)
+    base = (1.0 - amortiguacion) / n
+    for _ in range(iteraciones):
+        nuevo = dict.fromkeys(nodos, base)
+        colgante = 0.0
+        for x in nodos:
+            vecinos = salientes[x]
+            if vecinos:
+                parte = amortiguacion * rank[x] / len(vecinos)
+                for v in vecinos:
+                    nuevo[v] += parte
+            else:
+                colgante += amortiguacion * rank[x] / n
+        for x in nodos:
+            nuevo[x] += colgante
+        rank = nuevo
+    return rank
+
+
+def _grupo(tabla: str, agrupar_por: str) -> str:
+    info = SIMBOLOS.tabla(SIMBOLOS.id_tabla(tabla))
+    if agrupar_por == 'esquema':
+        return info.esquema or info.zona or tabla
+    return info.zona or tabla
+
+# -------------------------
+# Resumen
+# -------------------------
+
+def _nodo_detalle(tabla: str) -> dict:
+    info = SIMBOLOS.tabla(SIMBOLOS.id_tabla(tabla))
+    return {
+        'data': {'id': 'table:' + tabla, 'label': tabla, 'table': tabla, 'type': 'table',
+                 'zone': info.zona or tabla, 'zoneType': info.tipo_zona, 'columns': []},
+        'classes': 'table-node zone-' + info.tipo_zona,
+    }
+
+
+def _nodo_grupo(grupo: str, miembros: list, agrupar_por: str) -> dict:
+    info = SIMBOLOS.tabla(SIMBOLOS.id_tabla(miembros[0]))
+    return {
+        'data': {'id': 'group:' + grupo, 'label': '%s (%d)' % (grupo, len(miembros)), 'type': 'group',
+                 'zone': info.zona or grupo, 'zoneType': info.tipo_zona, 'miembros': len(miembros),
+                 'expand': {'grupo': grupo, 'agrupar_por': agrupar_por}},
+        'classes': 'group-node zone-' + info.tipo_zona,
+    }
+
+
+def resumir_grafo(registros, objetivo: str = None, top_k: int = 50, criterio: str = 'grado',
+                  agrupar_por: str = 'zona', expandidos=()) -> dict:
+    """
+    Colapsa un cierre a top_k tablas en detalle + super-nodos por zona/esquema.
+    expandidos: grupos que el cliente ya abrio (sus miembros quedan en detalle).
+    Retorna {'nodes', 'edges', 'resumen': {...}} en formato de elementos cytoscape.
+    """
+    if criterio not in CRITERIOS:
+        raise ValueError('criterio no soportado: %s (usar %s)' % (criterio, ', '.join(CRITERIOS)))
+    if agrupar_por not in AGRUPACIONES:
+        raise ValueError('agrupacion no soportada: %s (usar %s)' % (agrupar_por, ', '.join(AGRUPACIONES)))
+    nodos, aristas = _grafo_tablas(registros)
+    puntajes = puntajes_grado(nodos, aristas) if criterio == 'grado' else puntajes_pagerank(nodos, aristas)
+    ranking = sorted(nodos, key=lambda t: (-puntajes[t], t))
+    detalle = set(ranking[:top_k])
+    if objetivo and objetivo in nodos:
+        detalle.add(objetivo)
+    expandidos = set(expandidos or ())
+    grupos = {}
+    for t in sorted(nodos):
+        g = _grupo(t, agrupar_por)
+        if g in expandidos:
+            detalle.add(t)
+        elif t not in detalle:
+            grupos.setdefault(g, []).append(t)
+
+    def representante(t):
+        return 'table:' + t if t in detalle else 'group:' + _grupo(t, agrupar_por)
+
+    aristas_res = {}
+    for (o, d), conteo in aristas.items():
+        ro, rd = representante(o), representante(d)
+        if ro == rd:
+            continue  # relaciones internas de un super-nodo
+        a = aristas_res.get((ro, rd))
+        if a is None:
+            a = aristas_res[(ro, rd)] = {'relaciones': 0, 'pares': 0}
+        a['relaciones'] += conteo
+        a['pares'] += 1
+    edges = []
+    for (ro, rd), a in sorted(aristas_res.items()):
+        agregada = ro.startswith('group:') or rd.startswith('group:')
+        edges.append({
+            'data': {'id': '%s->%s' % (ro, rd), 'source': ro, 'target': rd,
+                     'relaciones': a['relaciones'], 'pares': a['pares'], 'agregada': agregada},
+            'classes': 'summary-edge' if agregada else 'table-edge',
+        })
+    nodes = [_nodo_detalle(t) for t in sorted(detalle)]
+    nodes += [_nodo_grupo(g, miembros, agrupar_por) for g, miembros in sorted(grupos.items())]
+    return {
+        'nodes': nodes,
+        'edges': edges,
+        'resumen': {
+            'tablas': len(nodos),
+            'relaciones': len(aristas),
+            'detalle': len(detalle),
+            'supernodos': len(grupos),
+            'criterio': criterio,
+            'agrupar_por': agrupar_por,
+        },
+    }
+
+
+def expandir_supernodo(registros, grupo: str, objetivo: str = None, top_k: int = 50,
+                       criterio: str = 'grado', agrupar_por: str = 'zona', expandidos=()) -> dict:
+    """
+    Detalle de un super-nodo: nodos de sus miembros y aristas que los tocan, expresadas
+    contra el resumen actual (los demas grupos siguen colapsados).
+    'remove' indica el id del super-nodo que el cliente debe reemplazar.
+    """
+    antes = resumir_grafo(registros, objetivo, top_k, criterio, agrupar_por, expandidos)
+    despues = resumir_grafo(registros, objetivo, top_k, criterio, agrupar_por, set(expandidos) | {grupo})
+    ids_antes = {n['data']['id'] for n in antes['nodes']}
+    nuevos = [n for n in despues['nodes'] if n['data']['id'] not in ids_antes]
+    ids_nuevos = {n['data']['id'] for n in nuevos}
+    edges = [e for e in despues['edges']
+             if e['data']['source'] in ids_nuevos or e['data']['target'] in ids_nuevos]
+    return {
+        'grupo': grupo,
+        'remove': ['group:' + grupo] if ('group:' + grupo) in ids_antes else [],
+        'nodes': nuevos,
+        'edges': edges,
+    }
@@ -0,0 +1,256 @@
+"""
+Consultas de rutas entre dos tablas (o campos) sobre el indice de linaje
+Para responder "como llega s_bani.x a resultados_y" hoy se pide el cierre upstream completo
+(computeUpstreamClosureConstrained / upstream_closure) y se busca a ojo entre miles de nodos.
+Aqui se devuelven solo los nodos y aristas que estan en las rutas pedidas.
+
+Notas:
+- direccion del linaje: tabla_origen -> tabla_destino (se busca desde el origen hacia el destino)
+- nivel 'tablas': nodo = id de tabla; nivel 'campos': nodo = (id de tabla, campo)
+- ruta mas corta: BFS bidireccional (expande siempre la frontera mas chica)
+- k rutas mas cortas: algoritmo de Yen sobre el BFS bidireccional (grafo sin pesos)
+- todas las rutas hasta una profundidad: DFS podado con distancias hacia el destino
+  (un nodo solo se expande si todavia puede llegar al destino con los saltos que quedan)
+- el resultado trae los registros de las aristas de las rutas y, opcionalmente,
+  los elementos cytoscape (indice_linaje.construir_elementos)
+"""
+
+from indice_linaje import construir_elementos
+from nombres_linaje import SIMBOLOS
+
+MAX_PROFUNDIDAD_POR_DEFECTO = 6
+MAX_RUTAS_POR_DEFECTO = 1000
+MODOS = ('corta', 'k', 'todas')
+
+
+class GrafoRutas:
+    """Adyacencias nodo -> {vecino: [posiciones de registro]} en ambos sentidos sobre un IndiceNivel."""
+
+    def __init__(self, indice_nivel, ocultar_lz: bool = False):
+        self.indice = indice_nivel
+        self.nivel = indice_nivel.nivel
+        self.ocultar_lz = ocultar_lz
+        self.sucesores = {}
+        self.predecesores = {}
+        campos = self.nivel == 'campos'
+        for pos, rec in enumerate(indice_nivel.registros):
+            tid_o = indice_nivel.origen[pos]
+            if ocultar_lz and SIMBOLOS.tabla(tid_o).es_lz:
+                continue
+            tid_d = indice_nivel.destino[pos]
+            if campos:
+                u = (tid_o, rec['campo_origen'])
+                v = (tid_d, rec['campo_destino'])
+            else:
+                u, v = tid_o, tid_d
+            if u == v:
+                continue
+            self.sucesores.setdefault(u, {}).setdefault(v, []).append(pos)
+            self.predecesores.setdefault(v, {}).setdefault(u, []).append(pos)
+
+    # --- nombres <-> nodos ---
+
+    def nodo(self, valor):
+        """
+        Resuelve el nodo de una tabla ('esquema.tabla') o de un campo
+        ('esquema.tabla.campo' o (tabla, campo)) segun el nivel. Retorna None si no existe.
+        """
+        if self.nivel != 'campos':
+            return SIMBOLOS.buscar_tabla(valor) if isinstance(valor, str) else valor
+        if isinstance(valor, str):
+            tabla, _, campo = valor.strip().lower().rpartition('.')
+        else:
+            tabla, campo = valor
+        if isinstance(tabla, int):
+            tid = tabla
+        else:
+            tid = SIMBOLOS.buscar_tabla(tabla)
+        if tid is None or not campo:
+            return None
+        return (tid, SIMBOLOS.texto(campo.strip().lower()))
+
+    def nombre(self, nodo) -> str:
+        if self.nivel != 'campos':
+            return SIMBOLOS.nombre_tabla(nodo)
+        return '%s.%s' % (SIMBOLOS.nombre_tabla(nodo[0]), nodo[1])
+
+    def existe(self, nodo) -> bool:
+        return nodo in self.sucesores or nodo in self.predecesores
+
+    # --- busquedas ---
+
+    def ruta_mas_corta(self, origen, destino, excluir_nodos=(), excluir_aristas=()) -> list:
+        """BFS bidireccional. Retorna la lista de nodos origen..destino o None."""
+        if origen == destino:
+            return [origen]
+        if origen in excluir_nodos or destino in excluir_nodos:
+            return None
+        padres = {origen: None}     # lado origen: nodo -> anterior
+        hijos = {destino: None}     # lado destino: nodo -> siguiente
+        frontera_o = [origen]
+        frontera_d = [destino]
+        while frontera_o and frontera_d:
+            if len(frontera_o) <= len(frontera_d):
+                siguiente = []
+                for u in frontera_o:
+                    for v in self.sucesores.get(u, ()):
+                        if v in padres or v in excluir_nodos or (u, v) in excluir_aristas:
+                            continue
+                        padres[v] = u
+                        if v in hijos:
+                            return _unir(padres, hijos, v)
+                        siguiente.append(v)
+                frontera_o = siguiente
+            else:
+                siguiente = []
+                for v in frontera_d:
+                    for u in self.predecesores.get(v, ()):
+                        if u in hijos or u in excluir_nodos or (u, v) in excluir_aristas:
+                            continue
+                        hijos[u] = v
+                        if u in padres:
+                            return _unir(padres, hijos, u)
+                        siguiente.append(u)
+                frontera_d = siguiente
+        return None
+
+    def k_rutas_mas_cortas(self, origen, destino, k: int = 3) -> list:
+        """Algoritmo de Yen: hasta k rutas simples en orden de longitud."""
+        primera = self.ruta_mas_corta(origen, destino)
+        if primera is None or k < 1:
+            return []
+        rutas = [primera]
+        candidatas = []
+        vistas = {tuple(primera)}
+        while len(rutas) < k:
+            previa = rutas[-1]
+            for i in range(len(previa) - 1):
+                raiz = previa[:i + 1]
+                excluir_aristas = {(r[i], r[i + 1]) for r in rutas if len(r) > i + 1 and r[:i + 1] == raiz}
+                excluir_nodos = set(raiz[:-1])
+                desvio = self.ruta_mas_corta(raiz[-1], destino, excluir_nodos, excluir_aristas)
+                if desvio is None:
+                    continue
+                total = raiz[:-1] + desvio
+                if tuple(total) not in vistas:
+                    vistas.add(tuple(total))
+                    candidatas.append(total)
+            if not candidatas:
+                break
+            candidatas.sort(key=len)
+            rutas.append(candidatas.pop(0))
+        return rutas
+
+    def distancias_hacia(self, destino, max_profundidad: int) -> dict:
+        """BFS hacia atras desde destino: nodo -> saltos hasta destino (<= max_profundidad)."""
+        dist = {destino: 0}
+        frontera = [destino]
+        for d in range(1, max_profundidad + 1):
+            siguiente = []
+            for v in frontera:
+                for u in self.predecesores.get(v, ()):
+                    if u not in dist:
+                        dist[u] = d
+                        siguiente.append(u)
+            if not siguiente:
+                break
+            frontera = siguiente
+        return dist
+
+    def todas_las_rutas(self, origen, destino, max_profundidad: int = MAX_PROFUNDIDAD_POR_DEFECTO,
+                        max_rutas: int = MAX_RUTAS_POR_DEFECTO) -> list:
+        """Rutas simples de hasta max_profundidad aristas (se corta al llegar a max_rutas)."""
+        dist = self.distancias_hacia(destino, max_profundidad)
+        if origen not in dist:
+            return []
+        rutas = []
+        ruta = [origen]
+        en_ruta = {origen}
+        # pila de iteradores de vecinos (DFS sin recursion)
+        pila = [iter(self.sucesores.get(origen, ()))]
+        while pila and len(rutas) < max_rutas:
+            v = next(pila[-1], None)
+            if v is None:
+                pila.pop()
+                en_ruta.discard(ruta.pop())
+                continue
+            restantes = max_profundidad - len(ruta)
+            if v in en_ruta or dist.get(v, restantes + 1) > restantes:
+                continue
+            if v == destino:
+                rutas.append(ruta + [v])
+                continue
+            ruta.append(v)
+            en_ruta.add(v)
+            pila.append(iter(self.sucesores.get(v, ())))
+        if origen == destino:
+            rutas.insert(0, [origen])
+        rutas.sort(key=len)
+        return rutas
+
+    # --- resultado ---
+
+    def posiciones_de_rutas(self, rutas: list) -> list:
+        posiciones = set()
+        for ruta in rutas:
+            for u, v in zip(ruta, ruta[1:]):
+                posiciones.update(self.sucesores[u][v])
+        return sorted(posiciones)
+
+    def resultado(self, rutas: list, elementos: bool = True) -> dict:
+        """{'paths': [[nombres]], 'nodes': [nombres], 'records': [...], 'elements': {...}}"""
+        nodos = []
+        vistos = set()
+        for ruta in rutas:
+            for n in ruta:
+                if n not in vistos:
+                    vistos.add(n)
+                    nodos.append(self.nombre(n))
+        registros = [self.indice.registros[p] for p in self.posiciones_de_rutas(rutas)]
+        res = {
+            'paths': [[self.nombre(n) for n in ruta] for ruta in rutas],
+            'nodes': nodos,
+            'records': registros,
+        }
+        if elementos:
+            res['elements'] = construir_elementos(registros, self.nivel, catalogo=self.indice.catalogo)
+        return res
+
+
+def _unir(padres: dict, hijos: dict, encuentro) -> list:
+    ruta = []
+    n = encuentro
+    while n is not None:
+        ruta.append(n)
+        n = padres[n]
+    ruta.reverse()
+    n = hijos[encuentro]
+    while n is not None:
+        ruta.append(n)
+        n = hijos[n]
+    return ruta
+
+
+def consultar_rutas(grafo: GrafoRutas, origen, destino, modo: str = 'corta', k: int = 3,
+                    max_profundidad: int = MAX_PROFUNDIDAD_POR_DEFECTO,
+                    max_rutas: int = MAX_RUTAS_POR_DEFECTO, elementos: bool = True) -> dict:
+    """
+    Punto de entrada del endpoint de rutas.
+    modo: 'corta' (una ruta), 'k' (k mas cortas) o 'todas' (hasta max_profundidad).
+    """
+    if modo not in MODOS:
+        raise ValueError('modo no soportado: %s (usar %s)' % (modo, ', '.join(MODOS)))
+    n_o = grafo.nodo(origen)
+    n_d = grafo.nodo(destino)
+    if n_o is None or n_d is None or not grafo.existe(n_o) or not grafo.existe(n_d):
+        rutas = []
+    elif modo == 'corta':
+        ruta = grafo.ruta_mas_corta(n_o, n_d)
+        rutas = [ruta] if ruta else []
+    elif modo == 'k':
+        rutas = grafo.k_rutas_mas_cortas(n_o, n_d, k)
+    else:
+        rutas = grafo.todas_las_rutas(n_o, n_d, max_profundidad, max_rutas)
+    res = grafo.resultado(rutas, elementos)
+    res.update({'source': origen, 'target': destino, 'mode': modo, 'nivel': grafo.nivel})
+    return res
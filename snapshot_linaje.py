@@ -0,0 +1,261 @@
+"""
+Recarga en caliente de los datos de linaje con swap atomico de snapshots
+Despues de cada ingesta nocturna hay que refrescar lo que sirven /api/metadata/* y las
+relaciones. Recargar en el lugar bloquea pedidos o sirve indices a medio actualizar
+(lo mismo que loadData(fromReload=true) en app.js del lado cliente).
+
+Notas:
+- doble buffer: el snapshot nuevo (indices, paginacion, vistas, caches) se construye en un hilo aparte
+- publicar = reasignar una sola referencia (GestorSnapshots.actual); no hay estado intermedio visible
+- cada pedido toma el snapshot una vez (gestor.usar()) y termina sobre ese, aunque llegue otro
+- catalogo de sql, caches de cierres, grafos de rutas y vistas materializadas viven dentro del snapshot: se invalidan junto con el swap
+- si llega una recarga mientras otra se construye, se encadena una sola reconstruccion extra
+- SIMBOLOS (global) se poda a las tablas del snapshot vigente cuando ya nadie usa los anteriores;
+  los streams que consumen un snapshot deben hacerlo dentro de gestor.usar()
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from formato_compacto import responder_consulta
+from indice_linaje import IndiceLinaje, NIVELES
+from linaje_diff import iter_registros_json
+from nombres_linaje import SIMBOLOS
+from paginacion import IndicePaginacion
+from rutas_linaje import GrafoRutas
+from vistas_materializadas import VistasMaterializadas
+
+# cierres cacheados por snapshot (LRU): el cache no crece con cada tabla que piden los clientes
+MAX_CIERRES_CACHEADOS = 1024
+
+
+class SnapshotLinaje:
+    """Version inmutable de los datos servidos: indices + caches que dependen de ellos."""
+
+    def __init__(self, registros, version: int, origen: str = None, objetivos_vistas: list = None):
+        inicio = time.perf_counter()
+        self.version = version
+        self.origen = origen
+        self.indice = IndiceLinaje(registros)
+        self.catalogo = self.indice.catalogo
+        self.paginacion = {nivel: IndicePaginacion(self.indice.nivel(nivel)) for nivel in NIVELES}
+        self.vistas = VistasMaterializadas(self.indice, objetivos_vistas)
+        self._cierres = OrderedDict()
+        self._lock_cierres = threading.Lock()
+        self._grafos = {}
+        self.en_uso = 0
+        self.creado = time.time()
+        self.segundos_construccion = time.perf_counter() - inicio
+
+    def cierre_upstream(self, nivel: str, tabla: str, ocultar_lz: bool = False) -> frozenset:
+        """
+        Cierre cacheado por snapshot (la cache muere con el snapshot). Solo se cachean tablas
+        que existen, por id, en un LRU de MAX_CIERRES_CACHEADOS entradas.
+        """
+        indice_nivel = self.indice.nivel(nivel)
+        tid = SIMBOLOS.buscar_tabla(tabla) if isinstance(tabla, str) else tabla
+        if tid is None:
+            return frozenset()
+        clave = (nivel, tid, ocultar_lz)
+        with self._lock_cierres:
+            cierre = self._cierres.get(clave)
+            if cierre is not None:
+                self._cierres.move_to_end(clave)
+                return cierre
+        cierre = frozenset(indice_nivel.cierre_upstream(tid, ocultar_lz))
+        with self._lock_cierres:
+            self._cierres[clave] = cierre
+            while len(self._cierres) > MAX_CIERRES_CACHEADOS:
+                self._cierres.popitem(last=False)
+        return cierre
+
+    def grafo_rutas(self, nivel: str, ocultar_lz: bool = False) -> GrafoRutas:
+        """Grafo para consultas de rutas, construido bajo demanda y cacheado por snapshot."""
+        clave = (nivel, ocultar_lz)
+        grafo = self._grafos.get(clave)
+        if grafo is None:
+            grafo = GrafoRutas(self.indice.nivel(nivel), ocultar_lz)
+            self._grafos[clave] = grafo
+        return grafo
+
+    def responder_consulta(self, cid: str) -> tuple:
+        """sql de una arista (consulta_id) para renderEdgeDetails: (status, headers, cuerpo)."""
+        return responder_consulta(self.catalogo, cid)
+
+    def tablas_vivas(self) -> set:
+        """Ids de tabla (SIMBOLOS) que usan los indices de este snapshot."""
+        vivas = set()
+        for nivel in self.indice.niveles.values():
+            vivas.update(nivel.origen)
+            vivas.update(nivel.destino)
+        vivas.discard(None)
+        return vivas
+
+    def info(self) -> dict:
+        return {
+            'version': self.version,
+            'origen': self.origen,
+            'registros': self.indice.total_registros,
+            'creado': self.creado,
+            'segundos_construccion': round(self.segundos_construccion, 3),
+            'en_uso': self.en_uso,
+        }
+
+
+def cargador_json(ruta: str):
+    """Cargador por defecto: lee el json de linaje en streaming."""
+    return lambda: iter_registros_json(ruta)
+
+
+class GestorSnapshots:
+    """Mantiene el snapshot vigente y construye el siguiente en segundo plano."""
+
+    def __init__(self, cargador, origen: str = None, objetivos_vistas: list = None, cargar: bool = True):
+        self.cargador = cargador
+        self.origen = origen
+        self.objetivos_vistas = objetivos_vistas
+        self.actual = None
+        self.ultimo_error = None
+        self._version = 0
+        self._lock_construccion = threading.Lock()
+        self._lock_uso = threading.Lock()
+        self._pendiente = False
+        self._construyendo = False
+        self._retirados = []    # snapshots reemplazados que todavia tienen pedidos en curso
+        self._hilo = None
+        self._vigia = None
+        self._detener = threading.Event()
+        if cargar:
+            self.recargar()
+
+    @classmethod
+    def desde_json(cls, ruta: str = 'json/linaje.json', **kwargs):
+        return cls(cargador_json(ruta), origen=ruta, **kwargs)
+
+    # --- lectura ---
+
+    @contextmanager
+    def usar(self):
+        """Fija el snapshot vigente durante un pedido (los pedidos en curso no ven el swap)."""
+        with self._lock_uso:
+            # leer y marcar en uso bajo el mismo lock: la poda no puede colarse en el medio
+            snap = self.actual
+            if snap is None:
+                raise LookupError('no hay datos de linaje cargados')
+            snap.en_uso += 1
+        try:
+            yield snap
+        finally:
+            with self._lock_uso:
+                snap.en_uso -= 1
+                liberado = snap is not self.actual and snap.en_uso == 0
+            if liberado and self._lock_construccion.acquire(blocking=False):
+                # si hay una construccion en curso, ella poda al publicar
+                try:
+                    self._podar_simbolos()
+                finally:
+                    self._lock_construccion.release()
+
+    # --- recarga ---
+
+    def recargar(self) -> SnapshotLinaje:
+        """Construye y publica un snapshot nuevo de forma sincronica."""
+        with self._lock_construccion:
+            self._version += 1
+            snap = SnapshotLinaje(self.cargador(), self._version, self.origen, self.objetivos_vistas)
+            # swap atomico: una sola reasignacion de referencia
+            with self._lock_uso:
+                previo = self.actual
+                self.actual = snap
+                if previo is not None:
+                    self._retirados.append(previo)
+            self.ultimo_error = None
+            self._podar_simbolos()
+            return snap
+
+    def _podar_simbolos(self) -> int:
+        """
+        Poda SIMBOLOS a las tablas del snapshot vigente cuando ya no queda ningun pedido
+        sobre snapshots anteriores (sus ids dejarian de ser validos). Requiere _lock_construccion.
+        Retorna las tablas podadas (None si todavia hay snapshots anteriores en uso).
+        """
+        with self._lock_uso:
+            self._retirados = [s for s in self._retirados if s.en_uso > 0]
+            if self._retirados or self.actual is None:
+                return None
+            vivas = self.actual.tablas_vivas()
+        return SIMBOLOS.podar(vivas)
+
+    def recargar_en_segundo_plano(self) -> bool:
+        """
+        Dispara la reconstruccion en un hilo. Si ya hay una en curso, marca otra pendiente
+        (se ejecuta al terminar la actual). Retorna True si se inicio un hilo nuevo.
+        """
+        with self._lock_uso:
+            if self._construyendo:
+                self._pendiente = True
+                return False
+            self._construyendo = True
+            self._hilo = threading.Thread(target=self._construir, name='recarga-linaje', daemon=True)
+            self._hilo.start()
+            return True
+
+    def _construir(self) -> None:
+        while True:
+            try:
+                self.recargar()
+            except Exception as exc:
+                # se sigue sirviendo el snapshot anterior
+                self.ultimo_error = repr(exc)
+            with self._lock_uso:
+                if not self._pendiente:
+                    self._construyendo = False
+                    return
+                self._pendiente = False
+
+    def esperar(self, timeout: float = None) -> None:
+        """Espera a que termine la recarga en segundo plano en curso (util en scripts y pruebas)."""
+        hilo = self._hilo
+        if hilo is not None:
+            hilo.join(timeout)
+
+    def vigilar(self, ruta: str = None, intervalo: float = 30.0) -> None:
+        """
+        Recarga en segundo plano cuando cambia el archivo fuente (fecha de modificacion y tamano).
+        Solo recarga cuando el cambio se mantiene entre dos revisiones seguidas: un archivo que
+        todavia se esta escribiendo en el lugar no se carga a medias.
+        """
+        ruta = ruta or self.origen
+        if not ruta or self._vigia is not None:
+            return
+
+        def _firma():
+            try:
+                st = os.stat(ruta)
+            except OSError:
+                return None
+            return st.st_mtime_ns, st.st_size
+
+        def _loop():
+            cargada = _firma()
+            anterior = cargada
+            while not self._detener.wait(intervalo):
+                actual = _firma()
+                if actual is not None and actual != cargada and actual == anterior:
+                    cargada = actual
+                    self.recargar_en_segundo_plano()
+                anterior = actual
+
+        self._detener.clear()
+        self._vigia = threading.Thread(target=_loop, name='vigia-linaje', daemon=True)
+        self._vigia.start()
+
+    def detener(self) -> None:
+        self._detener.set()
+        if self._vigia is not None:
+            self._vigia.join()
+            self._vigia = None
+        self.esperar()
@@ -0,0 +1,28 @@
+"""
+Configuracion comun de pytest: raiz del repo en sys.path y ejemplos del bloque __main__ de linaje.py.
+"""
+
+import os
+import sys
+import textwrap
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+
+def ejemplos_main() -> list:
+    """Lista `ejemplos` del bloque __main__ de linaje.py (sin ejecutar el bloque)."""
+    with open(os.path.join(RAIZ, 'linaje.py'), encoding='utf-8-sig') as f:
+        src = f.read()
+    bloque = src[src.index('ejemplos = ['):src.index('    linajes = []')]
+    ns = {}
+    exec(textwrap.dedent(bloque), ns)
+    return ns['ejemplos']
+
+
+@pytest.fixture(scope='session')
+def ejemplos() -> list:
+    return ejemplos_main()
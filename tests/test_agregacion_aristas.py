@@ -0,0 +1,60 @@
+"""
+Agregacion de aristas duplicadas (agregacion_aristas.py) y su uso en indice_linaje.construir_elementos.
+
+Ejecutar: python -m pytest -q tests
+"""
+
+import pytest
+
+from agregacion_aristas import agregar_aristas
+from formato_compacto import CatalogoConsultas
+from indice_linaje import construir_elementos
+
+
+def _registro(i, consulta, origen='s_bani.a', destino='proceso_a.p', co='x', cd='x', transformacion='copy'):
+    return {'id': 'r%d' % i, 'consulta': consulta, 'tabla_origen': origen, 'tabla_destino': destino,
+            'campo_origen': co, 'campo_destino': cd, 'transformacion_aplicada': transformacion,
+            'recomendaciones': None}
+
+
+REGISTROS = [
+    _registro(0, 'insert overwrite proceso_a.p select x from s_bani.a'),
+    _registro(1, 'insert overwrite proceso_a.p select x from s_bani.a'),
+    _registro(2, 'insert into proceso_a.p select upper(x) from s_bani.a', transformacion='upper'),
+    _registro(3, 'insert into proceso_a.p select y from s_bani.a', co='y', cd='y'),
+]
+
+
+def test_agregar_por_campos_y_por_tablas():
+    catalogo = CatalogoConsultas()
+    campos = agregar_aristas(REGISTROS, 'campos', catalogo=catalogo)
+    assert [(a['campo_origen'], a['conteo']) for a in campos] == [('x', 3), ('y', 1)]
+    assert campos[0]['ids'] == ['r0', 'r1', 'r2']
+    assert campos[0]['transformaciones'] == ['copy', 'upper']
+    assert len(campos[0]['consulta_ids']) == 2
+    assert catalogo.consulta(campos[0]['consulta_ids'][1]) == REGISTROS[2]['consulta']
+
+    tablas = agregar_aristas(REGISTROS, 'tablas', catalogo=catalogo, max_consultas=1)
+    assert len(tablas) == 1 and tablas[0]['conteo'] == 4 and 'campo_origen' not in tablas[0]
+    assert len(tablas[0]['consulta_ids']) == 3 and len(tablas[0]['consultas']) == 1
+
+    with pytest.raises(ValueError):
+        agregar_aristas(REGISTROS, 'zonas', catalogo=catalogo)
+
+
+@pytest.mark.parametrize('nivel', ['tablas', 'campos'])
+def test_elementos_cytoscape_usan_la_misma_agregacion(nivel):
+    catalogo = CatalogoConsultas()
+    elementos = construir_elementos(REGISTROS * 50, nivel, catalogo=catalogo)
+    planas = agregar_aristas(REGISTROS * 50, nivel, catalogo=catalogo)
+    assert len(elementos['edges']) == len(planas)
+    for arista, plana in zip(elementos['edges'], planas):
+        for k in ('conteo', 'consulta_ids', 'transformaciones', 'recomendaciones', 'consultas'):
+            assert arista['data'][k] == plana[k]
+
+
+def test_muchas_sentencias_en_una_arista():
+    registros = [_registro(i, 'insert into proceso_a.p select x from s_bani.a -- job %d' % i) for i in range(20000)]
+    arista, = agregar_aristas(registros, 'tablas', catalogo=CatalogoConsultas())
+    assert arista['conteo'] == 20000 and len(set(arista['consulta_ids'])) == 20000
+    assert arista['consultas'] == [r['consulta'] for r in registros[:3]]
@@ -0,0 +1,93 @@
+"""
+Almacen de linaje en SQLite (almacen_sqlite.py).
+
+Ejecutar: python -m pytest -q tests
+"""
+
+import threading
+
+import pytest
+
+import linaje
+from almacen_sqlite import AlmacenLinaje, guardar_linaje_en_sqlite
+from indice_linaje import IndiceLinaje
+from nombres_linaje import SIMBOLOS
+
+SQL = """
+insert into proceso_a.p select x, y from s_bani.a;
+insert into proceso_a.q select p.x from proceso_a.p p join lz.estatico_01 l on p.y = l.1;
+insert into resultados_a.r select q.x, b.z from proceso_a.q q join s_bani.b b on q.x = b.x;
+insert into resultados_a.s select r.x from resultados_a.r r;
+"""
+
+
+@pytest.fixture
+def almacen():
+    with AlmacenLinaje(':memory:') as a:
+        yield a
+
+
+def test_reingestar_el_mismo_linaje_no_duplica(almacen):
+    # cada corrida de linaje.py genera ids uuid4 nuevos para las mismas aristas
+    primera = linaje.generar_linaje_impala(SQL)
+    segunda = linaje.generar_linaje_impala(SQL)
+    assert {r['id'] for r in primera}.isdisjoint(r['id'] for r in segunda)
+    almacen.agregar_registros(primera)
+    antes = almacen.contar()['aristas']
+    almacen.agregar_registros(segunda)
+    assert almacen.contar()['aristas'] == antes == len(primera)
+
+
+def test_reemplazar_borra_linaje_que_ya_no_existe(tmp_path):
+    ruta = str(tmp_path / 'l.sqlite')
+    guardar_linaje_en_sqlite(linaje.generar_linaje_impala(SQL), ruta)
+    nuevo = linaje.generar_linaje_impala('insert into resultados_a.r select x from proceso_a.p;')
+    guardar_linaje_en_sqlite(nuevo, ruta)
+    with AlmacenLinaje(ruta) as almacen:
+        assert almacen.contar()['aristas'] == len(nuevo)
+        assert almacen.cierre_upstream('resultados_a.r') == ['proceso_a.p', 'resultados_a.r']
+
+
+def test_cierre_igual_al_indice_en_memoria(almacen):
+    registros = linaje.generar_linaje_impala(SQL)
+    almacen.agregar_registros(registros, tam_lote=2)
+    nivel = IndiceLinaje(registros).nivel('tablas')
+    for tabla in ('resultados_a.s', 'resultados_a.r', 'proceso_a.q'):
+        esperado = sorted(SIMBOLOS.nombre_tabla(t) for t in nivel.cierre_upstream(tabla))
+        assert almacen.cierre_upstream(tabla) == esperado
+        esperados = sorted(r['id'] for r in nivel.registros_filtrados(tabla=tabla))
+        assert sorted(r['id'] for r in almacen.registros_cierre_upstream(tabla)) == esperados
+    assert almacen.cierre_downstream('s_bani.a') == ['proceso_a.p', 'proceso_a.q', 'resultados_a.r',
+                                                     'resultados_a.s', 's_bani.a']
+    assert sorted(r['id'] for r in almacen.iter_registros(tam_lote=3)) == sorted(r['id'] for r in registros)
+
+
+def test_lote_fallido_no_deja_ids_cacheados(almacen):
+    registros = linaje.generar_linaje_impala(SQL)
+    malo = dict(registros[0], campo_origen=object())  # sqlite no sabe guardar el valor
+    with pytest.raises(Exception):
+        almacen.agregar_registros([registros[1], malo])
+    assert almacen.contar()['aristas'] == 0
+    almacen.agregar_registros(registros[1:2])
+    assert almacen.contar()['aristas'] == 1
+    assert almacen.relaciones_entrantes(registros[1]['tabla_destino'])[0]['consulta'] == registros[1]['consulta']
+
+
+def test_instancia_compartida_entre_hilos(almacen):
+    almacen.agregar_registros(linaje.generar_linaje_impala(SQL))
+    errores = []
+
+    def consultar():
+        try:
+            for _ in range(50):
+                assert almacen.cierre_upstream('resultados_a.s')
+                assert almacen.relaciones_salientes('s_bani.a')
+        except Exception as exc:
+            errores.append(exc)
+
+    hilos = [threading.Thread(target=consultar) for _ in range(4)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    assert errores == []
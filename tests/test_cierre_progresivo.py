@@ -0,0 +1,145 @@
+"""
+Envio progresivo del cierre por niveles (cierre_progresivo.py).
+
+Ejecutar: python -m pytest -q tests
+"""
+
+import json
+import threading
+
+import pytest
+
+import linaje
+from cierre_progresivo import CancelacionesPorCliente, iter_cierre_por_niveles, responder_cierre_stream
+from indice_linaje import IndiceLinaje, construir_elementos
+from nombres_linaje import SIMBOLOS
+
+# proceso_a.p sale en el nivel 0 como origen (solo x) y gana y, z en el nivel 1 como destino
+SQL = """
+insert into proceso_a.p select x, y, z from s_bani.a;
+insert into proceso_a.p select x, w as y from lz.funcion_01;
+insert into proceso_a.p select x from proceso_a.p;
+insert into proceso_b.q select p.x, c.v from proceso_a.p p join s_bani.c c on p.y = c.y;
+insert into resultados_a.r select q.x, q.v, b.z from proceso_b.q q join s_bani.b b on q.x = b.x;
+insert into resultados_a.r select p.x from proceso_a.p p;
+insert into s_bani.d select x from s_bani.a;
+"""
+
+
+def _indice(nivel):
+    return IndiceLinaje(linaje.generar_linaje_impala(SQL)).nivel(nivel)
+
+
+def _normalizar(data: dict) -> dict:
+    # el orden de las listas depende del orden de recorrido; el contenido no
+    return {k: sorted(v) if isinstance(v, list) else v for k, v in data.items()}
+
+
+def _union(eventos: list) -> tuple:
+    nodos = {}
+    aristas = {}
+    for ev in eventos:
+        if ev['event'] != 'level':
+            continue
+        for n in ev['nodes']:
+            assert n['data']['id'] not in nodos
+            padre = n['data'].get('parent')
+            assert padre is None or padre in nodos
+            nodos[n['data']['id']] = n['data']
+        for n in ev['updates']:
+            previo = nodos[n['data']['id']]
+            assert set(previo['columns']) < set(n['data']['columns'])
+            nodos[n['data']['id']] = n['data']
+        for a in ev['edges']:
+            assert a['data']['id'] not in aristas
+            assert a['data']['source'] in nodos and a['data']['target'] in nodos
+            aristas[a['data']['id']] = a['data']
+    return nodos, aristas
+
+
+def _referencia(idx, tabla, direccion, ocultar_lz):
+    if direccion == 'upstream':
+        posiciones = idx.posiciones_filtradas(tabla=tabla, ocultar_lz=ocultar_lz)
+    else:
+        posiciones = sorted(p for t in idx.cierre_downstream(tabla, ocultar_lz)
+                            if not (ocultar_lz and SIMBOLOS.tabla(t).es_lz)
+                            for p in idx.salientes.get(t, ()))
+    elementos = construir_elementos([idx.registros[p] for p in posiciones], idx.nivel, catalogo=idx.catalogo)
+    return ({n['data']['id']: n['data'] for n in elementos['nodes']},
+            {a['data']['id']: a['data'] for a in elementos['edges']}, len(posiciones))
+
+
+@pytest.mark.parametrize('nivel', ['tablas', 'campos'])
+@pytest.mark.parametrize('direccion,tabla', [('upstream', 'resultados_a.r'), ('upstream', 'proceso_b.q'),
+                                              ('downstream', 's_bani.a'), ('downstream', 'lz.funcion_01')])
+@pytest.mark.parametrize('ocultar_lz', [False, True])
+@pytest.mark.parametrize('tam_lote', [1, 500])
+def test_union_de_eventos_igual_al_cierre_completo(nivel, direccion, tabla, ocultar_lz, tam_lote):
+    idx = _indice(nivel)
+    eventos = list(iter_cierre_por_niveles(idx, tabla, direccion, ocultar_lz, tam_lote=tam_lote))
+    nodos, aristas = _union(eventos)
+    ref_nodos, ref_aristas, n_registros = _referencia(idx, tabla, direccion, ocultar_lz)
+    assert {k: _normalizar(v) for k, v in nodos.items()} == {k: _normalizar(v) for k, v in ref_nodos.items()}
+    assert {k: _normalizar(v) for k, v in aristas.items()} == {k: _normalizar(v) for k, v in ref_aristas.items()}
+    fin = eventos[-1]
+    assert fin['event'] == 'done' and not fin['cancelled']
+    assert fin['nodes'] == len(nodos) and fin['edges'] == len(aristas)
+    assert sum(ev.get('records', 0) for ev in eventos) == n_registros
+
+
+def test_nodo_enviado_gana_columnas_en_otro_nivel():
+    eventos = list(iter_cierre_por_niveles(_indice('tablas'), 'resultados_a.r'))
+    (actualizado,) = [n for ev in eventos[:-1] for n in ev['updates'] if n['data']['id'] == 'table:proceso_a.p']
+    assert set(actualizado['data']['columns']) == {'x', 'y', 'z'}
+    assert eventos[-1]['updates'] >= 1
+
+
+def test_tabla_inexistente_y_direccion_invalida():
+    idx = _indice('tablas')
+    assert list(iter_cierre_por_niveles(idx, 'proceso_x.no_existe')) == [
+        {'event': 'done', 'levels': 0, 'nodes': 0, 'updates': 0, 'edges': 0, 'cancelled': False}]
+    with pytest.raises(ValueError):
+        list(iter_cierre_por_niveles(idx, 'resultados_a.r', 'lateral'))
+
+
+def test_cancelacion_por_cliente():
+    idx = _indice('campos')
+    cancelaciones = CancelacionesPorCliente()
+    evento = cancelaciones.nuevo('cliente-1')
+    stream = iter_cierre_por_niveles(idx, 'resultados_a.r', cancelar=evento, tam_lote=1)
+    primero = next(stream)
+    assert primero['event'] == 'level' and primero['level'] == 0
+    otro = cancelaciones.nuevo('cliente-1')  # el cliente pidio otra tabla
+    assert evento.is_set() and not otro.is_set()
+    resto = list(stream)
+    assert resto[-1]['event'] == 'done' and resto[-1]['cancelled']
+    assert len(resto) == 1
+    cancelaciones.terminar('cliente-1', evento)
+    assert not otro.is_set()
+    cancelaciones.cancelar('cliente-1')
+    assert otro.is_set()
+
+
+def test_max_niveles():
+    eventos = list(iter_cierre_por_niveles(_indice('tablas'), 'resultados_a.r', max_niveles=1))
+    assert {ev['level'] for ev in eventos[:-1]} == {0} and eventos[-1]['levels'] == 1
+
+
+@pytest.mark.parametrize('formato', ['ndjson', 'sse'])
+def test_formatos_de_stream(formato):
+    idx = _indice('tablas')
+    status, headers, cuerpo = responder_cierre_stream(idx, 'resultados_a.r', formato=formato,
+                                                      cancelar=threading.Event())
+    assert status == 200
+    texto = b''.join(cuerpo).decode('utf-8')
+    if formato == 'ndjson':
+        assert headers['Content-Type'].startswith('application/x-ndjson')
+        eventos = [json.loads(linea) for linea in texto.splitlines()]
+    else:
+        assert headers['Content-Type'].startswith('text/event-stream')
+        bloques = [b for b in texto.split('\n\n') if b]
+        eventos = [json.loads(b.split('\ndata: ', 1)[1]) for b in bloques]
+        assert all(b.startswith('event: %s\n' % ev['event']) for b, ev in zip(bloques, eventos))
+    assert eventos == list(iter_cierre_por_niveles(idx, 'resultados_a.r'))
+    with pytest.raises(ValueError):
+        responder_cierre_stream(idx, 'resultados_a.r', formato='xml')
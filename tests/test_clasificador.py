@@ -0,0 +1,61 @@
+"""
+Clasificacion de sentencias por palabra clave inicial y omision de sql sin linaje (linaje.py).
+
+Ejecutar: python -m pytest -q tests
+"""
+
+import linaje
+
+
+def test_clasificador_en_ejemplos(ejemplos):
+    clases = [linaje.clasificar_sentencia(linaje.normalize_sql(s)) for s in ejemplos]
+    assert clases == ['insert', 'insert', 'create', 'with', 'create', 'create', 'create']
+    extras = {
+        'compute stats proceso_a.t': 'compute_stats',
+        'compute incremental stats proceso_a.t': 'compute_stats',
+        'refresh proceso_a.t': 'refresh',
+        'invalidate metadata proceso_a.t': 'invalidate_metadata',
+        'drop table if exists proceso_a.t': 'drop',
+        'set mem_limit=4g': 'set',
+        'use proceso_a': 'use',
+        'alter table proceso_a.t add partition (anio=2024)': 'alter_particion',
+        'alter table proceso_a.t rename to proceso_a.u': 'otro',
+        'select a from s_bani.t': 'select',
+        'insert into proceso_a.t select * from (select 1) x where 1 in (select 1) ': 'insert',
+        'insert into proceso_a.t select create_date from s_bani.t': 'insert',
+        "insert into proceso_a.t select a from s_bani.t where b = 'create'": 'otro',
+        '(select a from s_bani.t)': 'select',
+        '-- comentario\ninsert into proceso_a.t select a from s_bani.t': 'otro',
+    }
+    for sql, clase in extras.items():
+        assert linaje.clasificar_sentencia(linaje.normalize_sql(sql)) == clase, sql
+
+
+def test_enrutamiento_no_cambia_el_linaje(ejemplos):
+    def sin_id(recs):
+        return sorted(tuple(sorted((k, str(v)) for k, v in r.items() if k != 'id')) for r in recs)
+
+    for sql in ejemplos:
+        for stmt in linaje.split_statements_top_level(sql):
+            s = linaje.normalize_sql(stmt)
+            clase = linaje.clasificar_sentencia(s)
+            assert sin_id(linaje.lineage_from_statement(s, clase=clase)) == sin_id(linaje.lineage_from_statement(s))
+
+
+def test_sentencias_sin_linaje_se_omiten():
+    assert linaje.generar_linaje_impala('compute stats proceso_a.t; refresh proceso_a.t; use proceso_a;') == []
+
+
+def test_omitidas_no_llegan_al_extractor(monkeypatch):
+    llamadas = []
+    original = linaje.lineage_from_statement
+
+    def contar(stmt, *args, **kwargs):
+        llamadas.append(stmt)
+        return original(stmt, *args, **kwargs)
+
+    monkeypatch.setattr(linaje, 'lineage_from_statement', contar)
+    sql = 'set mem_limit=4g; insert into proceso_a.t select a from s_bani.x; compute stats proceso_a.t; drop table proceso_a.u'
+    registros = linaje.generar_linaje_impala(sql)
+    assert len(llamadas) == 1 and llamadas[0].startswith('insert')
+    assert {(r['tabla_origen'], r['tabla_destino']) for r in registros} == {('s_bani.x', 'proceso_a.t')}
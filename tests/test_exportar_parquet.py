@@ -0,0 +1,72 @@
+"""
+Exportacion a parquet particionado por zona (exportar_parquet.py).
+
+Ejecutar: python -m pytest -q tests
+"""
+
+import os
+
+import pytest
+
+pq = pytest.importorskip('pyarrow.parquet')
+
+import exportar_parquet as ep  # noqa: E402
+import linaje  # noqa: E402
+
+SQL = """
+insert into proceso_a.p select x, y from s_bani.a;
+insert into lz.estatico_01 select x from s_bani.a;
+insert into resultados_a.r select p.x, b.z from proceso_a.p p join s_bani.b b on p.y = b.y;
+"""
+
+
+def _particiones(destino) -> list:
+    return sorted(os.listdir(os.path.join(destino, 'aristas')))
+
+
+def test_particiones_y_sentencias(tmp_path):
+    destino = str(tmp_path / 'pq')
+    registros = linaje.generar_linaje_impala(SQL)
+    res = ep.exportar_parquet(registros, destino, tam_lote=2)
+    assert _particiones(destino) == ['tipo_zona=lz', 'tipo_zona=proceso', 'tipo_zona=resultados']
+    assert sum(res['aristas'].values()) == len(registros) and res['sentencias'] == 3
+    tabla = pq.read_table(os.path.join(destino, 'aristas', 'tipo_zona=resultados'))
+    assert tabla.num_rows == res['aristas']['resultados']
+    assert set(tabla.column('zona_destino').to_pylist()) == {'resultados_a'}
+    assert str(tabla.schema.field('tabla_origen').type).startswith('dictionary')
+    sentencias = pq.read_table(os.path.join(destino, 'sentencias')).to_pydict()
+    todas = pq.read_table(os.path.join(destino, 'aristas'))
+    assert sorted(sentencias['consulta_id']) == sorted(set(todas.column('consulta_id').to_pylist()))
+    assert [n for n in os.listdir(destino) if n.startswith('.')] == []
+
+
+def test_reexportar_no_deja_particiones_viejas(tmp_path):
+    destino = str(tmp_path / 'pq')
+    ep.exportar_parquet(linaje.generar_linaje_impala(SQL), destino)
+    ep.exportar_parquet(linaje.generar_linaje_impala('insert into proceso_a.p select x from s_bani.a'), destino)
+    assert _particiones(destino) == ['tipo_zona=proceso']
+
+
+def test_exportacion_fallida_no_toca_la_anterior(tmp_path):
+    destino = str(tmp_path / 'pq')
+    ep.exportar_parquet(linaje.generar_linaje_impala(SQL), destino)
+
+    def registros_que_fallan():
+        yield from linaje.generar_linaje_impala('insert into proceso_a.z select x from s_bani.a')
+        raise RuntimeError('corte')
+
+    with pytest.raises(RuntimeError):
+        ep.exportar_parquet(registros_que_fallan(), destino)
+    assert _particiones(destino) == ['tipo_zona=lz', 'tipo_zona=proceso', 'tipo_zona=resultados']
+    assert [n for n in os.listdir(destino) if n.startswith('.')] == []
+
+
+def test_reemplazo_interrumpido_se_recupera(tmp_path):
+    destino = str(tmp_path / 'pq')
+    ep.exportar_parquet(linaje.generar_linaje_impala(SQL), destino)
+    # caida entre los dos renames: la carpeta vieja quedo apartada y la nueva no llego a entrar
+    os.rename(os.path.join(destino, 'aristas'), os.path.join(destino, '.anterior-aristas'))
+    os.makedirs(os.path.join(destino, '.exportando-caida'))
+    ep._recuperar_reemplazo(destino)
+    assert _particiones(destino) == ['tipo_zona=lz', 'tipo_zona=proceso', 'tipo_zona=resultados']
+    assert sorted(os.listdir(destino)) == ['aristas', 'sentencias']
@@ -0,0 +1,72 @@
+"""
+Formato columnar, negociacion de contenido y catalogo de consultas (formato_compacto.py).
+
+Ejecutar: python -m pytest -q tests
+"""
+
+import gzip
+import json
+
+import pytest
+
+import formato_compacto as fc
+import linaje
+from indice_linaje import IndiceLinaje
+
+SQL = """
+insert into proceso_a.p select x, upper(y) as y from s_bani.a;
+insert into resultados_a.r select p.x, b.z from proceso_a.p p join s_bani.b b on p.y = b.y;
+"""
+
+
+def _registros() -> list:
+    return linaje.generar_linaje_impala(SQL)
+
+
+def test_columnar_ida_y_vuelta():
+    registros = _registros()
+    catalogo = fc.CatalogoConsultas()
+    payload = fc.codificar_columnar(registros, catalogo, incluir_ids=True)
+    assert payload['n'] == len(registros)
+    assert len(payload['strings']) == len(set(payload['strings']))
+    for rec, dec in zip(registros, fc.decodificar_columnar(payload)):
+        for c in fc.COLUMNAS_DICCIONARIO + ('id',):
+            assert dec[c] == rec[c]
+        assert catalogo.consulta(dec['consulta_id']) == rec['consulta']
+
+
+def test_formato_desconocido():
+    with pytest.raises(ValueError):
+        fc.decodificar_columnar({'formato': 'otro/1'})
+
+
+def test_negociacion():
+    assert fc.negociar(None, None) == (fc.TIPO_JSON, None)
+    assert fc.negociar(fc.TIPO_COLUMNAR_JSON + ', application/json;q=0.5', 'gzip')[0] == fc.TIPO_COLUMNAR_JSON
+    assert fc.negociar('application/json;q=0.1, %s' % fc.TIPO_COLUMNAR_JSON)[0] == fc.TIPO_COLUMNAR_JSON
+    assert fc.negociar('*/*', 'identity')[1] is None
+    assert fc.negociar(None, 'gzip;q=0, *')[1] == ('br' if fc.brotli else 'gzip')
+    if fc.msgpack is None:
+        assert fc.negociar(fc.TIPO_COLUMNAR_MSGPACK)[0] == fc.TIPO_JSON
+
+
+def test_respuesta_json_compatible_y_comprimida():
+    registros = _registros() * 20
+    status, headers, cuerpo = fc.responder_relaciones(registros, 'application/json', 'gzip')
+    assert status == 200 and headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(cuerpo)) == registros
+    # respuestas chicas no se comprimen
+    _, headers, cuerpo = fc.responder_relaciones(registros[:1], fc.TIPO_COLUMNAR_JSON, 'gzip')
+    assert 'Content-Encoding' not in headers
+    assert fc.decodificar_columnar(json.loads(cuerpo))[0]['tabla_destino'] == registros[0]['tabla_destino']
+
+
+def test_consulta_bajo_demanda_desde_el_catalogo_del_indice():
+    registros = _registros()
+    indice = IndiceLinaje(registros)
+    # sin serializar nada antes: el catalogo se arma al construir el indice
+    cid = fc.id_consulta(registros[-1]['consulta'])
+    status, headers, cuerpo = fc.responder_consulta(indice.catalogo, cid)
+    assert status == 200 and 'immutable' in headers['Cache-Control']
+    assert json.loads(cuerpo) == {'consulta_id': cid, 'consulta': registros[-1]['consulta']}
+    assert fc.responder_consulta(indice.catalogo, '0' * 16)[0] == 404
@@ -0,0 +1,75 @@
+"""
+Regresion del divisor de sentencias en streaming de linaje.py (incluido su presupuesto de tamano)
+contra los ejemplos del bloque __main__ de linaje.py.
+
+Ejecutar: python -m pytest -q tests
+"""
+
+import linaje
+from conftest import ejemplos_main
+
+
+def _split_referencia(sql: str) -> list:
+    """Divisor original (caracter a caracter, todo en memoria) previo a iter_statements_stream."""
+    parts = []
+    cur = []
+    depth = 0
+    in_s = False
+    in_d = False
+    for ch in sql:
+        if ch == "'" and not in_d:
+            in_s = not in_s
+        elif ch == '"' and not in_s:
+            in_d = not in_d
+        elif not (in_s or in_d):
+            if ch == '(':
+                depth += 1
+            elif ch == ')':
+                if depth > 0:
+                    depth -= 1
+            elif ch == ';' and depth == 0:
+                stmt = ''.join(cur).strip()
+                if stmt:
+                    parts.append(stmt)
+                cur = []
+                continue
+        cur.append(ch)
+    last = ''.join(cur).strip()
+    if last:
+        parts.append(last)
+    return parts
+
+
+EJEMPLOS = ejemplos_main()
+SCRIPT = ';\n'.join(EJEMPLOS) + ';\ncompute stats proceso_a.t;\nset mem_limit=4g;\n' \
+         "select 'a;b', \"c;d\" from (select 1; ) x;\nalter table resultados_x.t add partition (anio=2024)"
+
+
+def test_split_igual_al_original_en_ejemplos():
+    for sql in EJEMPLOS + [SCRIPT]:
+        esperado = _split_referencia(sql)
+        assert linaje.split_statements_top_level(sql) == esperado
+        # el estado debe sobrevivir a cualquier corte de bloque
+        for tam_bloque in (1, 2, 7, 64):
+            assert list(linaje.iter_statements_stream(sql, tam_bloque)) == esperado
+
+
+def test_split_desde_archivo_e_iterable():
+    esperado = _split_referencia(SCRIPT)
+    trozos = [SCRIPT[i:i + 5] for i in range(0, len(SCRIPT), 5)]
+    assert list(linaje.iter_statements_stream(iter(trozos))) == esperado
+
+
+def test_presupuesto_de_tamano_en_el_divisor():
+    # una comilla en un comentario deja el resto del dump "entre comillas"
+    cuerpo = ''.join('insert into proceso_a.t%d select a from s_bani.x%d;\n' % (i, i) for i in range(2000))
+    dump = "-- don't\ninsert into proceso_a.z select b from s_bani.w;\n" + cuerpo
+    for tam_bloque in (100, 4096, 1 << 20):
+        sentencias = list(linaje.iter_statements_stream(dump, tam_bloque, max_chars=1000))
+        truncadas = [s for s in sentencias if isinstance(s, linaje.SentenciaTruncada)]
+        assert len(truncadas) == 1
+        assert len(truncadas[0]) <= 1000 and truncadas[0].largo > 1000
+        # se resincroniza: el resto del dump vuelve a dividirse sentencia por sentencia
+        assert max(len(s) for s in sentencias) <= 1000
+        assert sentencias[-1] == 'insert into proceso_a.t1999 select a from s_bani.x1999'
+
@@ -0,0 +1,92 @@
+"""
+Lectura en streaming de snapshots y diff de linaje (linaje_diff.py).
+
+Ejecutar: python -m pytest -q tests
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import linaje_diff  # noqa: E402
+
+
+def _registro(origen, destino, co, cd, transformacion='copy', consulta='insert into x select 1'):
+    return {'id': '%s.%s->%s.%s' % (origen, co, destino, cd), 'consulta': consulta, 'tabla_origen': origen,
+            'tabla_destino': destino, 'campo_origen': co, 'campo_destino': cd,
+            'transformacion_aplicada': transformacion, 'recomendaciones': None}
+
+
+ANTERIOR = [
+    _registro('s_bani.a', 'proceso_a.t', 'x', 'x'),
+    _registro('s_bani.a', 'proceso_a.t', 'y', 'y'),
+    _registro('s_bani.b', 'resultados_a.r', 'z', 'z'),
+]
+ACTUAL = [
+    _registro('s_bani.a', 'proceso_a.t', 'x', 'x'),
+    _registro('s_bani.a', 'proceso_a.t', 'y', 'y', transformacion='upper'),
+    _registro('s_bani.c', 'resultados_a.r', 'w', 'w'),
+]
+
+
+def _escribir(ruta, registros):
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(registros, f, ensure_ascii=False, indent=2)
+
+
+def test_lectura_igual_a_json_load_con_cualquier_bloque(tmp_path):
+    ruta = str(tmp_path / 'l.json')
+    registros = [_registro('s_bani.a%d' % i, 'proceso_a.t', 'c%d' % i, 'c', consulta='ñ' * i) for i in range(200)]
+    _escribir(ruta, registros)
+    for tam_bloque in (1, 7, 100, 1 << 20):
+        assert list(linaje_diff.iter_registros_json(ruta, tam_bloque)) == registros
+
+
+def test_lista_vacia(tmp_path):
+    ruta = str(tmp_path / 'l.json')
+    _escribir(ruta, [])
+    assert list(linaje_diff.iter_registros_json(ruta)) == []
+
+
+def test_snapshot_truncado_es_error(tmp_path):
+    ruta = str(tmp_path / 'l.json')
+    _escribir(ruta, ANTERIOR)
+    with open(ruta, encoding='utf-8') as f:
+        texto = f.read()
+    with open(ruta, 'w', encoding='utf-8') as f:
+        f.write(texto[:texto.rindex('}') + 1])
+    with pytest.raises(ValueError, match='truncado'):
+        list(linaje_diff.iter_registros_json(ruta, 16))
+
+
+def test_registro_invalido_no_lee_todo_el_archivo(tmp_path):
+    ruta = str(tmp_path / 'l.json')
+    with open(ruta, 'w', encoding='utf-8') as f:
+        f.write('[{"id": 1}, {"id": 2 "x": 3},\n' + '{"id": 4},\n' * 10000 + '{"id": 5}]')
+    with pytest.raises(ValueError, match='registro invalido'):
+        list(linaje_diff.iter_registros_json(ruta, 64, max_chars_registro=1000))
+
+
+@pytest.mark.parametrize('externo', [False, True])
+def test_diff_agregadas_eliminadas_cambiadas(externo):
+    res = linaje_diff.diff_snapshots(ANTERIOR, ACTUAL, externo=externo, max_lineas=1)
+    assert res['resumen'] == {'agregadas': 1, 'eliminadas': 1, 'cambiadas': 1}
+    tabla = res['tablas']['proceso_a.t']
+    assert tabla['cambiadas'][0]['campo_destino'] == 'y'
+    assert tabla['cambiadas'][0]['transformaciones_antes'] == ['copy']
+    assert tabla['cambiadas'][0]['transformaciones_despues'] == ['upper']
+    assert res['tablas']['resultados_a.r']['agregadas'][0]['tabla_origen'] == 's_bani.c'
+    assert res['tablas']['resultados_a.r']['eliminadas'][0]['tabla_origen'] == 's_bani.b'
+
+
+def test_diff_archivos_igual_en_memoria_y_externo(tmp_path):
+    ant = str(tmp_path / 'ant.json')
+    act = str(tmp_path / 'act.json')
+    _escribir(ant, ANTERIOR * 3)
+    _escribir(act, ACTUAL)
+    assert linaje_diff.diff_archivos(ant, act) == linaje_diff.diff_archivos(ant, act, externo=True, max_lineas=2)
@@ -0,0 +1,59 @@
+"""
+Reglas de nombres y tabla de simbolos (nombres_linaje.py).
+
+Ejecutar: python -m pytest -q tests
+"""
+
+import linaje
+from nombres_linaje import TablaSimbolos, es_campo_valido, tipo_zona, zona_de_tabla
+
+
+def test_reglas_de_zona_y_campos():
+    assert zona_de_tabla('lz.estatico_001') == 'lz.estatico'
+    assert zona_de_tabla('proceso_bipa.t') == 'proceso_bipa'
+    assert tipo_zona('lz.funcion') == 'lz-funcion'
+    assert tipo_zona('s_bani_core') == 's_bani'
+    assert es_campo_valido('fecha_corte') and es_campo_valido('*')
+    assert not es_campo_valido('select') and not es_campo_valido('upper(t.x)')
+    assert es_campo_valido('1', 'lz.estatico_001') and not es_campo_valido('1', 'proceso_a.t')
+
+
+def test_ids_por_nombre_crudo_y_normalizado():
+    s = TablaSimbolos()
+    tid = s.id_tabla(' Proceso_A.T ')
+    assert s.id_tabla('proceso_a.t') == tid
+    assert s.buscar_tabla('PROCESO_A.T') == tid
+    assert s.buscar_tabla('proceso_a.otra') is None
+    info = s.tabla(tid)
+    assert (info.zona, info.tipo_zona, info.prefijo_zona, info.iniciable) == ('proceso_a', 'proceso', 'P', True)
+    assert s.id_campo(tid, 'X') == s.id_campo(tid, 'x')
+    assert s.id_nombre_calificado('proceso_a.t.x') == (tid, s.id_campo(tid, 'x'))
+
+
+def test_podar_conserva_ids_vivos():
+    s = TablaSimbolos()
+    viva = s.id_tabla('proceso_a.viva')
+    muerta = s.id_tabla('proceso_a.muerta')
+    s.id_campo(muerta, 'c')
+    assert s.podar([viva]) == 1
+    assert s.buscar_tabla('proceso_a.muerta') is None
+    assert s.tabla(viva).nombre == 'proceso_a.viva'
+    assert s.id_tabla('proceso_a.nueva') not in (viva, muerta)
+
+
+def test_cache_de_textos_acotado():
+    s = TablaSimbolos(max_textos=10)
+    for i in range(1000):
+        assert s.texto(' Campo_%d ' % i) == 'campo_%d' % i
+    assert len(s._textos) <= 10
+
+
+def test_parseo_no_interna_expresiones(monkeypatch):
+    simbolos = TablaSimbolos()
+    monkeypatch.setattr(linaje, 'SIMBOLOS', simbolos)
+    sql = ';'.join('insert into proceso_a.t%d select count(*) as n, a.x%d as y from s_bani.a a' % (i, i)
+                   for i in range(50))
+    recs = linaje.generar_linaje_impala(sql)
+    assert {r['campo_origen'] for r in recs} >= {'count(*)', 'x0', 'x49'}
+    assert 'x49' in simbolos._textos and 'proceso_a.t49' in simbolos._textos
+    assert not any('(' in t for t in simbolos._textos)
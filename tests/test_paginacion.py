@@ -0,0 +1,91 @@
+"""
+Paginacion por cursor sobre aristas preordenadas (paginacion.py).
+
+Ejecutar: python -m pytest -q tests
+"""
+
+import random
+
+import pytest
+
+import linaje
+import paginacion
+from indice_linaje import IndiceLinaje
+
+SQL = """
+insert into proceso_a.p select x, y from s_bani.a;
+insert into proceso_a.p select x, z as y from lz.funcion_01;
+insert into proceso_b.q select p.x, c.w from proceso_a.p p join s_bani.c c on p.y = c.y;
+insert into resultados_a.r select q.x, b.z, q.w from proceso_b.q q join s_bani.b b on q.x = b.x;
+insert into resultados_a.s select r.x from resultados_a.r r;
+insert into s_bani.d select x from s_bani.a;
+"""
+
+
+def _indice(registros=None, nivel='campos'):
+    return IndiceLinaje(registros or linaje.generar_linaje_impala(SQL)).nivel(nivel)
+
+
+def _recorrer(pag, limite=2, **filtros) -> list:
+    vistos = []
+    cursor = None
+    while True:
+        res = pag.pagina(cursor=cursor, limite=limite, **filtros)
+        vistos.extend(res['records'])
+        assert res['total'] >= len(vistos)
+        cursor = res['next_cursor']
+        if cursor is None:
+            return vistos
+
+
+@pytest.mark.parametrize('nivel', ['tablas', 'campos'])
+@pytest.mark.parametrize('ocultar_lz', [False, True])
+def test_mismos_registros_que_el_filtro_del_visor(nivel, ocultar_lz):
+    idx = _indice(nivel=nivel)
+    pag = paginacion.IndicePaginacion(idx)
+    filtros = [{'tabla': t} for t in ('resultados_a.s', 'resultados_a.r', 'proceso_b.q', 'proceso_a.p', 's_bani.a')]
+    filtros += [{'zona': z} for z in ('all', 'proceso_a', 'resultados_a', 's_bani')]
+    for f in filtros:
+        esperado = sorted(id(idx.registros[p]) for p in idx.posiciones_filtradas(ocultar_lz=ocultar_lz, **f))
+        assert sorted(id(r) for r in _recorrer(pag, ocultar_lz=ocultar_lz, **f)) == esperado, f
+
+
+def test_tabla_desconocida():
+    res = paginacion.IndicePaginacion(_indice()).pagina(tabla='proceso_x.no_existe')
+    assert res == {'records': [], 'next_cursor': None, 'total': 0, 'limit': paginacion.LIMITE_POR_DEFECTO}
+
+
+def test_cache_de_tablas_acotado(monkeypatch):
+    monkeypatch.setattr(paginacion, 'MAX_TABLAS_CACHEADAS', 2)
+    pag = paginacion.IndicePaginacion(_indice())
+    for t in ('resultados_a.s', 'resultados_a.r', 'proceso_b.q', 'proceso_a.p'):
+        pag.pagina(tabla=t)
+    assert len(pag._tablas) == 2
+
+
+def test_cursor_valido_despues_de_recargar():
+    # misma salida de linaje con ids nuevos y otro orden de registros
+    base = linaje.generar_linaje_impala(SQL)
+    base = base + [dict(r) for r in base[:3]]  # duplicados exactos
+    completo = [paginacion.clave_orden(r) for r in _recorrer(paginacion.IndicePaginacion(_indice(base)))]
+    recargado = linaje.generar_linaje_impala(SQL)
+    recargado = recargado + [dict(r) for r in recargado[:3]]
+    random.Random(3).shuffle(recargado)
+    primera = paginacion.IndicePaginacion(_indice(base)).pagina(limite=4)
+    resto = _recorrer(paginacion.IndicePaginacion(_indice(recargado)), limite=3)
+    cursor = primera['next_cursor']
+    pag = paginacion.IndicePaginacion(_indice(recargado))
+    vistos = list(primera['records'])
+    while cursor:
+        res = pag.pagina(cursor=cursor, limite=3)
+        vistos.extend(res['records'])
+        cursor = res['next_cursor']
+    assert [paginacion.clave_orden(r) for r in vistos] == completo
+    assert len(resto) == len(completo)
+
+
+def test_cursor_invalido():
+    pag = paginacion.IndicePaginacion(_indice())
+    for cursor in ('no-es-base64!', paginacion.codificar_cursor(('a', 'b'))):
+        with pytest.raises(ValueError):
+            pag.pagina(cursor=cursor)
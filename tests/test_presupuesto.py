@@ -0,0 +1,59 @@
+"""
+Presupuestos de tamano y tiempo por sentencia de linaje.py: degradacion a nivel de tablas y metricas.
+
+Ejecutar: python -m pytest -q tests
+"""
+
+import linaje
+
+RECOMENDACION = 'presupuesto de parseo excedido (%s)'
+
+
+def _degradados(recs, motivo):
+    return recs and all(r['recomendaciones'].startswith(RECOMENDACION % motivo) for r in recs)
+
+
+def test_sentencia_truncada_se_degrada_a_nivel_tabla():
+    sql = "insert into proceso_a.z select 'x from s_bani.w, s_bani.v" + ' ' * 5000 + ';'
+    recs = list(linaje.generar_linaje_impala_stream(sql, max_chars=1000))
+    assert _degradados(recs, 'tamano')
+    assert {r['tabla_destino'] for r in recs} == {'proceso_a.z'}
+
+
+def test_sentencia_grande_se_degrada_con_tablas_de_from_y_join():
+    sql = ('insert into proceso_a.z select a.x, b.y from s_bani.a a join s_bani.b b on a.k = b.k where '
+           + ' or '.join('a.x = %d' % i for i in range(300)))
+    recs = list(linaje.generar_linaje_impala_stream(sql, max_chars=500))
+    assert _degradados(recs, 'tamano')
+    assert sorted(r['tabla_origen'] for r in recs) == ['s_bani.a', 's_bani.b']
+    assert all(r['campo_origen'] is None and r['campo_destino'] is None for r in recs)
+    # sin limite la misma sentencia da linaje por columna
+    completos = list(linaje.generar_linaje_impala_stream(sql, max_chars=0))
+    assert {(r['campo_origen'], r['campo_destino']) for r in completos} == {('x', 'x'), ('y', 'y')}
+
+
+def test_presupuesto_de_tiempo_excedido(monkeypatch):
+    def lento(stmt, clase=None):
+        linaje._presupuesto.limite = 0.0
+        linaje._verificar_presupuesto()
+
+    monkeypatch.setattr(linaje, 'lineage_from_statement', lento)
+    recs = list(linaje.generar_linaje_impala_stream('insert into proceso_a.z select x from s_bani.a'))
+    assert _degradados(recs, 'tiempo')
+    assert [(r['tabla_origen'], r['tabla_destino']) for r in recs] == [('s_bani.a', 'proceso_a.z')]
+    # el limite no queda activo para la sentencia siguiente
+    assert getattr(linaje._presupuesto, 'limite', None) is None
+
+
+def test_metricas_de_degradacion():
+    linaje.reiniciar_metricas()
+    sql = 'insert into proceso_a.z select x from s_bani.a;' \
+          'insert into proceso_a.y select x from s_bani.b where ' + ' and '.join(['x = 1'] * 200)
+    list(linaje.generar_linaje_impala_stream(sql, max_chars=500))
+    m = linaje.obtener_metricas()
+    assert m['sentencias'] == 2
+    assert m['degradadas_tamano'] == 1
+    assert m['eventos_presupuesto'][-1]['motivo'] == 'tamano'
+    assert m['eventos_presupuesto'][-1]['tabla_destino'] == 'proceso_a.y'
+    linaje.reiniciar_metricas()
+    assert linaje.obtener_metricas()['sentencias'] == 0
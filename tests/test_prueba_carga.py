@@ -0,0 +1,93 @@
+"""
+Prueba de carga con datos sinteticos (prueba_carga.py): percentiles, generador y rutas del servidor.
+
+Ejecutar: python -m pytest -q tests
+"""
+
+import json
+import threading
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import pytest
+
+import prueba_carga
+from nombres_linaje import SIMBOLOS
+from snapshot_linaje import GestorSnapshots
+
+
+@pytest.mark.parametrize('n,p,esperado', [
+    (100, 50, 50), (100, 95, 95), (100, 99, 99), (100, 100, 100), (100, 0, 1),
+    (10, 95, 10), (10, 50, 5), (1, 99, 1), (3, 34, 2), (20, 95, 19),
+])
+def test_percentil_rango_mas_cercano(n, p, esperado):
+    assert prueba_carga.percentil(list(range(1, n + 1)), p) == esperado
+
+
+def test_percentil_lista_vacia():
+    assert prueba_carga.percentil([], 95) == 0.0
+
+
+def test_generador_sintetico_determinista():
+    registros = prueba_carga.generar_linaje_sintetico(tablas=200, campos_por_tabla=4, semilla=7)
+    assert registros == prueba_carga.generar_linaje_sintetico(tablas=200, campos_por_tabla=4, semilla=7)
+    destinos = {r['tabla_destino'] for r in registros}
+    assert all(d.startswith(('proceso_bipa_', 'resultados_bipa_')) for d in destinos)
+    assert any(r['tabla_origen'].startswith('lz.') for r in registros)
+    assert all(r['consulta'].startswith('insert overwrite table %s ' % r['tabla_destino']) for r in registros)
+
+
+@pytest.fixture(scope='module')
+def servidor():
+    registros = prueba_carga.generar_linaje_sintetico(tablas=120, campos_por_tabla=3, semilla=3)
+    gestor = GestorSnapshots(lambda: registros, origen='sintetico')
+    srv = prueba_carga.crear_servidor(gestor)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    base = 'http://%s:%d' % srv.server_address[:2]
+    yield base, registros
+    srv.shutdown()
+    srv.server_close()
+
+
+def _get(base, ruta):
+    with urlopen(base + ruta, timeout=30) as resp:
+        return json.loads(resp.read())
+
+
+def test_rutas_del_servidor(servidor):
+    base, registros = servidor
+    muestras = prueba_carga.muestras_de_registros(registros, n=5)
+    tabla = muestras['iniciables'][0]
+    zonas = _get(base, '/api/metadata/zones')
+    assert zonas and tabla in _get(base, '/api/metadata/tables?zona=%s' % SIMBOLOS.tabla(
+        SIMBOLOS.buscar_tabla(tabla)).zona)
+    cierre = _get(base, '/api/closure?nivel=campos&tabla=' + tabla)
+    assert tabla in cierre['tables'] and cierre['elements']['edges']
+    pagina = _get(base, '/api/relations?tabla=%s&limit=2' % tabla)
+    assert len(pagina['records']) <= 2 and pagina['total'] >= len(pagina['records'])
+    assert _get(base, '/api/search?q=resultados&limit=3') == sorted(_get(base, '/api/search?q=resultados&limit=3'))
+    stats = _get(base, '/api/_stats')
+    assert stats['snapshot']['registros'] == len(registros)
+    assert prueba_carga.consultar_stats(base) == stats
+    with pytest.raises(HTTPError) as err:
+        _get(base, '/api/no_existe')
+    assert err.value.code == 404
+    with pytest.raises(HTTPError) as err:
+        _get(base, '/api/relations?cursor=no-es-base64!')
+    assert err.value.code == 400
+
+
+def test_ejecutar_carga_corta(servidor):
+    base, registros = servidor
+    muestras = prueba_carga.muestras_de_registros(registros, n=20)
+    reporte = prueba_carga.ejecutar_carga(base, muestras, clientes=2, duracion=30, max_peticiones=15)
+    assert reporte['errores'] == {}
+    assert reporte['total']['n'] == 30 and reporte['total']['clientes'] == 2
+    assert set(reporte['operaciones']) == set(prueba_carga.MEZCLA_POR_DEFECTO)
+    assert reporte['total']['p50_ms'] <= reporte['total']['p95_ms'] <= reporte['total']['p99_ms']
+
+
+def test_mezcla_invalida():
+    assert prueba_carga._parsear_mezcla('cierre=3,paginacion') == {'cierre': 3.0, 'paginacion': 1.0}
+    with pytest.raises(ValueError):
+        prueba_carga._parsear_mezcla('borrar=1')
@@ -0,0 +1,68 @@
+"""
+Resumen por nivel de detalle de cierres grandes (resumen_grafo.py).
+
+Ejecutar: python -m pytest -q tests
+"""
+
+import pytest
+
+from resumen_grafo import expandir_supernodo, puntajes_pagerank, resumir_grafo
+
+OBJETIVO = 'resultados_a.r'
+
+
+def _registro(origen, destino):
+    return {'tabla_origen': origen, 'tabla_destino': destino, 'campo_origen': 'x', 'campo_destino': 'x'}
+
+
+def _registros() -> list:
+    # 30 fuentes s_bani -> 10 procesos -> objetivo; proceso_a.p0 recibe de todas las fuentes
+    recs = []
+    for i in range(30):
+        recs.append(_registro('s_bani_core.t%02d' % i, 'proceso_a.p%d' % (i % 10)))
+        recs.append(_registro('s_bani_core.t%02d' % i, 'proceso_a.p0'))
+    for j in range(10):
+        recs.append(_registro('proceso_a.p%d' % j, OBJETIVO))
+    return recs
+
+
+def test_top_k_y_supernodos():
+    res = resumir_grafo(_registros(), objetivo=OBJETIVO, top_k=2)
+    detalle = {n['data']['id'] for n in res['nodes'] if n['data']['type'] == 'table'}
+    grupos = {n['data']['id']: n['data'] for n in res['nodes'] if n['data']['type'] == 'group'}
+    assert detalle == {'table:proceso_a.p0', 'table:' + OBJETIVO}
+    assert grupos['group:s_bani_core']['miembros'] == 30
+    assert grupos['group:proceso_a']['miembros'] == 9
+    assert res['resumen'] == {'tablas': 41, 'relaciones': 67, 'detalle': 2, 'supernodos': 2,
+                              'criterio': 'grado', 'agrupar_por': 'zona'}
+    # relaciones = pares distintos; las aristas agregadas suman registros
+    aristas = {e['data']['id']: e['data'] for e in res['edges']}
+    assert aristas['group:s_bani_core->table:proceso_a.p0']['relaciones'] == 33  # t00, t10 y t20 llegan dos veces
+    assert aristas['group:proceso_a->table:' + OBJETIVO]['pares'] == 9
+    ids = {n['data']['id'] for n in res['nodes']}
+    assert all(e['data']['source'] in ids and e['data']['target'] in ids for e in res['edges'])
+
+
+def test_expandir_supernodo():
+    registros = _registros()
+    exp = expandir_supernodo(registros, 'proceso_a', objetivo=OBJETIVO, top_k=2)
+    assert exp['remove'] == ['group:proceso_a']
+    assert len(exp['nodes']) == 9
+    assert all(n['data']['id'].startswith('table:proceso_a.') for n in exp['nodes'])
+    assert {'group:s_bani_core->table:proceso_a.p5', 'table:proceso_a.p5->table:' + OBJETIVO} <= \
+        {e['data']['id'] for e in exp['edges']}
+
+
+def test_pagerank_favorece_a_quien_alimenta_mas_linaje():
+    nodos = {'a', 'b', 'c'}
+    rank = puntajes_pagerank(nodos, {('a', 'b'): 1, ('b', 'c'): 1, ('a', 'c'): 1})
+    assert abs(sum(rank.values()) - 1.0) < 1e-9
+    assert rank['a'] > rank['b'] > rank['c']
+    assert resumir_grafo(_registros(), OBJETIVO, top_k=1, criterio='pagerank')['resumen']['detalle'] == 2
+
+
+def test_parametros_invalidos():
+    with pytest.raises(ValueError):
+        resumir_grafo([], criterio='otro')
+    with pytest.raises(ValueError):
+        resumir_grafo([], agrupar_por='otro')
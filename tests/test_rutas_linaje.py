@@ -0,0 +1,107 @@
+"""
+Rutas entre tablas y campos sobre el indice de linaje (rutas_linaje.py).
+
+Ejecutar: python -m pytest -q tests
+"""
+
+import itertools
+import random
+
+import pytest
+
+import linaje
+from indice_linaje import IndiceLinaje
+from rutas_linaje import GrafoRutas, consultar_rutas
+
+# s_bani.a llega a resultados_a.r por b, por c y por d -> e (y lz.f entra por b)
+SQL = """
+insert into proceso_a.b select x from s_bani.a;
+insert into proceso_a.b select y as x from lz.funcion_01;
+insert into proceso_a.c select x from s_bani.a;
+insert into proceso_a.d select x from s_bani.a;
+insert into proceso_a.e select x from proceso_a.d;
+insert into resultados_a.r select x from proceso_a.b;
+insert into resultados_a.r select x from proceso_a.c;
+insert into resultados_a.r select x from proceso_a.e;
+"""
+
+
+def _grafo(nivel='tablas', ocultar_lz=False, registros=None):
+    indice = IndiceLinaje(registros or linaje.generar_linaje_impala(SQL))
+    return GrafoRutas(indice.nivel(nivel), ocultar_lz)
+
+
+def test_ruta_mas_corta():
+    res = consultar_rutas(_grafo(), 's_bani.a', 'resultados_a.r')
+    assert len(res['paths']) == 1 and len(res['paths'][0]) == 3
+    assert res['paths'][0][0] == 's_bani.a' and res['paths'][0][-1] == 'resultados_a.r'
+    assert {(r['tabla_origen'], r['tabla_destino']) for r in res['records']} == {
+        ('s_bani.a', res['paths'][0][1]), (res['paths'][0][1], 'resultados_a.r')}
+    assert len(res['elements']['edges']) == 2
+
+
+def test_k_rutas_y_todas():
+    g = _grafo()
+    k = consultar_rutas(g, 's_bani.a', 'resultados_a.r', modo='k', k=5, elementos=False)
+    assert [len(r) for r in k['paths']] == [3, 3, 4]
+    assert 'elements' not in k
+    todas = consultar_rutas(g, 's_bani.a', 'resultados_a.r', modo='todas')
+    assert sorted(map(tuple, todas['paths'])) == sorted(map(tuple, k['paths']))
+    corta = consultar_rutas(g, 's_bani.a', 'resultados_a.r', modo='todas', max_profundidad=2)
+    assert [len(r) for r in corta['paths']] == [3, 3]
+
+
+def test_nivel_campos_y_lz_oculto():
+    res = consultar_rutas(_grafo('campos'), 'lz.funcion_01.y', 'resultados_a.r.x', modo='todas')
+    assert res['paths'] == [['lz.funcion_01.y', 'proceso_a.b.x', 'resultados_a.r.x']]
+    assert all(e['data']['nivel'] == 'campo' for e in res['elements']['edges'])
+    oculto = consultar_rutas(_grafo('campos', ocultar_lz=True), 'lz.funcion_01.y', 'resultados_a.r.x')
+    assert oculto['paths'] == []
+
+
+def test_sin_ruta_o_nodo_inexistente():
+    g = _grafo()
+    assert consultar_rutas(g, 'resultados_a.r', 's_bani.a')['paths'] == []
+    assert consultar_rutas(g, 'proceso_x.no_existe', 'resultados_a.r', modo='k')['paths'] == []
+    with pytest.raises(ValueError):
+        consultar_rutas(g, 's_bani.a', 'resultados_a.r', modo='bfs')
+
+
+def _rutas_fuerza_bruta(sucesores, origen, destino, max_profundidad):
+    rutas = []
+    pila = [[origen]]
+    while pila:
+        ruta = pila.pop()
+        if ruta[-1] == destino:
+            rutas.append(tuple(ruta))
+            continue
+        if len(ruta) > max_profundidad:
+            continue
+        for v in sucesores.get(ruta[-1], ()):
+            if v not in ruta:
+                pila.append(ruta + [v])
+    return rutas
+
+
+def test_grafo_aleatorio_contra_fuerza_bruta():
+    rnd = random.Random(11)
+    tablas = ['proceso_a.t%02d' % i for i in range(12)]
+    registros = []
+    for n, (o, d) in enumerate(p for p in itertools.permutations(tablas, 2) if rnd.random() < 0.2):
+        registros.append({'id': str(n), 'consulta': 'insert into %s select x from %s' % (d, o),
+                          'tabla_origen': o, 'tabla_destino': d, 'campo_origen': 'x', 'campo_destino': 'x',
+                          'transformacion_aplicada': None, 'recomendaciones': None})
+    g = _grafo(registros=registros)
+    for origen, destino in itertools.permutations(tablas[:6], 2):
+        u, v = g.nodo(origen), g.nodo(destino)
+        if u is None or v is None:
+            continue
+        esperadas = sorted(_rutas_fuerza_bruta(g.sucesores, u, v, 4), key=lambda r: (len(r), r))
+        todas = g.todas_las_rutas(u, v, max_profundidad=4, max_rutas=10 ** 6)
+        assert sorted(map(tuple, todas), key=lambda r: (len(r), r)) == esperadas
+        simples = sorted(len(r) for r in _rutas_fuerza_bruta(g.sucesores, u, v, len(tablas)))
+        corta = g.ruta_mas_corta(u, v)
+        assert (len(corta) if corta else None) == (simples[0] if simples else None)
+        k = g.k_rutas_mas_cortas(u, v, 4)
+        assert len(set(map(tuple, k))) == len(k)
+        assert [len(r) for r in k] == simples[:4]
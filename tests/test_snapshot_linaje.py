@@ -0,0 +1,97 @@
+"""
+Recarga en caliente con swap atomico de snapshots (snapshot_linaje.py) y escritura atomica del json.
+
+Ejecutar: python -m pytest -q tests
+"""
+
+import json
+import os
+import time
+
+import linaje
+import snapshot_linaje
+from snapshot_linaje import GestorSnapshots
+
+SQL = """
+insert into proceso_a.p select x, y from s_bani.a;
+insert into resultados_a.r select p.x, b.z from proceso_a.p p join s_bani.b b on p.y = b.y;
+"""
+EXTRA = 'insert into proceso_a.p select w from s_bani.c;'
+
+
+def _esperar(condicion, segundos: float = 5.0) -> bool:
+    limite = time.time() + segundos
+    while not condicion() and time.time() < limite:
+        time.sleep(0.01)
+    return condicion()
+
+
+def test_pedido_en_curso_no_ve_el_swap():
+    datos = {'sql': SQL}
+    gestor = GestorSnapshots(lambda: linaje.generar_linaje_impala(datos['sql']))
+    with gestor.usar() as snap:
+        datos['sql'] = SQL + EXTRA
+        gestor.recargar_en_segundo_plano()
+        gestor.esperar()
+        assert gestor.actual is not snap and gestor.actual.version == snap.version + 1
+        # el pedido sigue sobre su snapshot, con sus ids de tabla todavia validos
+        assert len(snap.cierre_upstream('tablas', 'resultados_a.r')) == 4
+    with gestor.usar() as snap:
+        assert len(snap.cierre_upstream('tablas', 'resultados_a.r')) == 5
+
+
+def test_recarga_fallida_sigue_sirviendo_la_anterior():
+    datos = {'sql': SQL}
+
+    def cargador():
+        if datos['sql'] is None:
+            raise RuntimeError('json roto')
+        return linaje.generar_linaje_impala(datos['sql'])
+
+    gestor = GestorSnapshots(cargador)
+    datos['sql'] = None
+    gestor.recargar_en_segundo_plano()
+    gestor.esperar()
+    assert gestor.actual.version == 1 and 'json roto' in gestor.ultimo_error
+
+
+def test_cache_de_cierres_acotado_y_sin_tablas_inexistentes(monkeypatch):
+    monkeypatch.setattr(snapshot_linaje, 'MAX_CIERRES_CACHEADOS', 2)
+    gestor = GestorSnapshots(lambda: linaje.generar_linaje_impala(SQL))
+    with gestor.usar() as snap:
+        for i in range(100):
+            assert snap.cierre_upstream('tablas', 'proceso_x.no_existe_%d' % i) == frozenset()
+        assert len(snap._cierres) == 0
+        for tabla in ('resultados_a.r', 'proceso_a.p', 's_bani.a', 'RESULTADOS_A.R'):
+            snap.cierre_upstream('tablas', tabla)
+        assert len(snap._cierres) == 2
+
+
+def test_vistas_usan_los_objetivos_del_entorno(monkeypatch):
+    monkeypatch.setenv('LINAJE_VISTAS_OBJETIVOS', 'resultados_a.r')
+    gestor = GestorSnapshots(lambda: linaje.generar_linaje_impala(SQL))
+    assert gestor.actual.vistas.objetivos == ['resultados_a.r']
+
+
+def test_json_atomico_y_vigia(tmp_path):
+    ruta = str(tmp_path / 'json' / 'linaje.json')
+    assert linaje.guardar_linaje_en_json_stream(linaje.generar_linaje_impala(SQL), ruta) > 0
+    assert os.listdir(os.path.dirname(ruta)) == ['linaje.json']
+    gestor = GestorSnapshots.desde_json(ruta)
+    total = gestor.actual.indice.total_registros
+    gestor.vigilar(intervalo=0.05)
+    try:
+        # escritura a medias en el lugar: no se recarga mientras el archivo sigue cambiando
+        with open(ruta, 'w', encoding='utf-8') as f:
+            f.write('[\n')
+            for r in linaje.generar_linaje_impala(SQL + EXTRA):
+                f.write(json.dumps(r) + ',\n')
+                f.flush()
+                time.sleep(0.03)
+            f.write('{}]\n')
+        assert _esperar(lambda: gestor.actual.version > 1)
+        gestor.esperar()
+        assert gestor.actual.indice.total_registros > total
+        assert gestor.ultimo_error is None
+    finally:
+        gestor.detener()
@@ -0,0 +1,93 @@
+"""
+Vistas materializadas por objetivo con refresco en segundo plano (vistas_materializadas.py).
+
+Ejecutar: python -m pytest -q tests
+"""
+
+import json
+import threading
+import time
+
+import linaje
+from indice_linaje import IndiceLinaje
+from vistas_materializadas import VistasMaterializadas
+
+SQL = """
+insert into proceso_a.p select x, y from s_bani.a;
+insert into resultados_a.r select p.x, b.z from proceso_a.p p join s_bani.b b on p.y = b.y;
+"""
+OBJETIVO = 'resultados_a.r'
+
+
+def _registros(extra: str = '') -> list:
+    return linaje.generar_linaje_impala(SQL + extra)
+
+
+def _cuerpo(vistas, **kw) -> dict:
+    return json.loads(vistas.vista(OBJETIVO, **kw)['cuerpo'])
+
+
+def test_vista_materializada_y_etag():
+    vistas = VistasMaterializadas(IndiceLinaje(_registros()), [OBJETIVO])
+    assert (OBJETIVO, 'tablas', False) in vistas._estado[1]
+    cuerpo = _cuerpo(vistas)
+    assert cuerpo['cierre'] == ['proceso_a.p', 'resultados_a.r', 's_bani.a', 's_bani.b']
+    status, headers, datos = vistas.servir(OBJETIVO)
+    assert status == 200 and json.loads(datos) == cuerpo
+    status, _, datos = vistas.servir(OBJETIVO, if_none_match='W/' + headers['ETag'])
+    assert (status, datos) == (304, b'')
+
+
+def test_objetivo_no_materializado_se_calcula_bajo_demanda():
+    vistas = VistasMaterializadas(IndiceLinaje(_registros()), [])
+    assert vistas._estado[1] == {}
+    assert _cuerpo(vistas, nivel='campos')['total'] > 0
+
+
+def test_ingesta_sincronica_y_con_worker():
+    vistas = VistasMaterializadas(IndiceLinaje(_registros()), [OBJETIVO])
+    extra = 'insert into proceso_a.p select w from s_bani.c;'
+    vistas.notificar_ingesta(_registros(extra))
+    assert 's_bani.c' in _cuerpo(vistas)['cierre']
+    vistas.iniciar()
+    try:
+        vistas.notificar_ingesta(_registros())
+        limite = time.time() + 5
+        while 's_bani.c' in _cuerpo(vistas)['cierre'] and time.time() < limite:
+            time.sleep(0.01)
+        assert 's_bani.c' not in _cuerpo(vistas)['cierre']
+        assert vistas.ultimo_error is None
+    finally:
+        vistas.detener()
+
+
+class _VistasConIngestaConcurrente(VistasMaterializadas):
+    """Al leer el pendiente por primera vez llega otra ingesta desde otro hilo."""
+
+    @property
+    def _pendiente(self):
+        valor = self.__dict__.get('_valor')
+        if valor is not None and not self.__dict__.get('_disparada'):
+            self.__dict__['_disparada'] = True
+            hilo = threading.Thread(target=self.notificar_ingesta, args=(self.__dict__['_segunda'],))
+            hilo.start()
+            hilo.join(0.2)  # con el lock el hilo espera a que se vacie el pendiente
+        return valor
+
+    @_pendiente.setter
+    def _pendiente(self, valor):
+        self.__dict__['_valor'] = valor
+
+
+def test_ingesta_durante_el_procesamiento_no_se_pierde():
+    vistas = _VistasConIngestaConcurrente(None, [OBJETIVO])
+    vistas._worker = object()  # notificar_ingesta solo encola (como con worker)
+    segunda = _registros('insert into proceso_a.p select w from s_bani.c;')
+    vistas.__dict__['_segunda'] = segunda
+    vistas.notificar_ingesta(_registros())
+    vistas._procesar_pendiente()
+    limite = time.time() + 5
+    while vistas.__dict__['_valor'] is None and time.time() < limite:
+        time.sleep(0.01)
+    assert vistas.__dict__['_valor'] is segunda
+    assert vistas._evento.is_set()
@@ -0,0 +1,167 @@
+"""
+Vistas materializadas por tabla objetivo (resultados mas consultados)
+Para un conjunto configurable de objetivos se precalcula lo que el visor pide siempre:
+cierre upstream, registros filtrados y elementos listos para el layout
+(getFilteredRecords -> buildTableElements/buildFieldElements de app.js).
+
+Notas:
+- las vistas se sirven como json ya serializado con ETag (sha256 del cuerpo) para cache de clientes/proxies
+- un worker en segundo plano las refresca despues de cada ingesta de linaje (notificar_ingesta)
+- el refresco construye un diccionario nuevo y lo reemplaza de una vez: nunca se sirve una mezcla
+- objetivos no materializados se calculan bajo demanda (mismo formato y ETag)
+- objetivos por defecto: variable de entorno LINAJE_VISTAS_OBJETIVOS (separados por coma)
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from indice_linaje import IndiceLinaje, construir_elementos
+from nombres_linaje import SIMBOLOS
+
+CACHE_CONTROL = 'public, max-age=0, must-revalidate'
+
+
+def objetivos_desde_env(var: str = 'LINAJE_VISTAS_OBJETIVOS') -> list:
+    valor = os.environ.get(var, '')
+    return [t.strip().lower() for t in valor.split(',') if t.strip()]
+
+
+def calcular_vista(indice: IndiceLinaje, objetivo: str, nivel: str = 'tablas', ocultar_lz: bool = False) -> dict:
+    """Cierre + elementos de un objetivo, serializado una vez. Retorna {'etag', 'cuerpo', 'generada'}."""
+    idx = indice.nivel(nivel)
+    cierre = idx.cierre_upstream(objetivo, ocultar_lz)
+    registros = idx.registros_filtrados(tabla=objetivo, ocultar_lz=ocultar_lz)
+    elementos = construir_elementos(registros, nivel, catalogo=indice.catalogo)
+    payload = {
+        'objetivo': objetivo,
+        'nivel': nivel,
+        'hideLz': ocultar_lz,
+        'cierre': sorted(SIMBOLOS.nombre_tabla(t) for t in cierre),
+        'total': len(registros),
+        'elements': elementos,
+    }
+    cuerpo = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return {
+        'etag': '"%s"' % hashlib.sha256(cuerpo).hexdigest()[:32],
+        'cuerpo': cuerpo,
+        'generada': time.time(),
+    }
+
+
+def _etag_coincide(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidatos = [c.strip() for c in if_none_match.split(',')]
+    # W/"..." debe coincidir en comparacion debil (RFC 7232)
+    return '*' in candidatos or etag in candidatos or ('W/' + etag) in candidatos
+
+
+class VistasMaterializadas:
+    """Cache de vistas por (objetivo, nivel, ocultar_lz) refrescada en segundo plano."""
+
+    def __init__(self, indice: IndiceLinaje = None, objetivos: list = None, niveles=('tablas', 'campos')):
+        self.objetivos = [o.lower() for o in (objetivos if objetivos is not None else objetivos_desde_env())]
+        self.niveles = tuple(niveles)
+        # (indice, vistas) en una sola tupla: los lectores toman ambos con una sola lectura
+        self._estado = (indice, {})
+        self._pendiente = None
+        self._lock_pendiente = threading.Lock()
+        self._evento = threading.Event()
+        self._detener = threading.Event()
+        self._worker = None
+        self.refrescos = 0
+        self.ultimo_error = None
+        if indice is not None:
+            self.refrescar()
+
+    # --- refresco ---
+
+    def refrescar(self, indice: IndiceLinaje = None) -> None:
+        """Recalcula todas las vistas (sin bloquear lectores) y las publica con un solo swap."""
+        indice = indice or self._estado[0]
+        if indice is None:
+            return
+        nuevas = {}
+        for objetivo in self.objetivos:
+            for nivel in self.niveles:
+                for ocultar_lz in (False, True):
+                    nuevas[(objetivo, nivel, ocultar_lz)] = calcular_vista(indice, objetivo, nivel, ocultar_lz)
+        # swap atomico: indice y vistas se publican juntos
+        self._estado = (indice, nuevas)
+        self.refrescos += 1
+
+    def notificar_ingesta(self, registros_o_indice) -> None:
+        """Encola un refresco con la nueva salida de linaje.py (registros o IndiceLinaje ya construido)."""
+        with self._lock_pendiente:
+            self._pendiente = registros_o_indice
+        if self._worker is None:
+            # sin worker: refresco sincronico
+            self._procesar_pendiente()
+        else:
+            self._evento.set()
+
+    def _procesar_pendiente(self) -> None:
+        # tomar y vaciar bajo el mismo lock que notificar_ingesta: una ingesta que llega en medio no se pierde
+        with self._lock_pendiente:
+            pendiente, self._pendiente = self._pendiente, None
+        if pendiente is None:
+            return
+        indice = pendiente if isinstance(pendiente, IndiceLinaje) else IndiceLinaje(pendiente)
+        self.refrescar(indice)
+
+    def iniciar(self) -> None:
+        """Arranca el worker de refresco en segundo plano."""
+        if self._worker is not None:
+            return
+        self._detener.clear()
+        self._worker = threading.Thread(target=self._loop, name='vistas-linaje', daemon=True)
+        self._worker.start()
+
+    def detener(self, timeout: float = 5.0) -> None:
+        if self._worker is None:
+            return
+        self._detener.set()
+        self._evento.set()
+        self._worker.join(timeout)
+        self._worker = None
+
+    def _loop(self) -> None:
+        while not self._detener.is_set():
+            self._evento.wait()
+            self._evento.clear()
+            if self._detener.is_set():
+                break
+            try:
+                self._procesar_pendiente()
+                self.ultimo_error = None
+            except Exception as exc:
+                # el worker no debe morir: se sigue sirviendo la version anterior
+                self.ultimo_error = repr(exc)
+
+    # --- lectura ---
+
+    def vista(self, objetivo: str, nivel: str = 'tablas', ocultar_lz: bool = False) -> dict:
+        objetivo = (objetivo or '').strip().lower()
+        indice, vistas = self._estado
+        v = vistas.get((objetivo, nivel, ocultar_lz))
+        if v is None:
+            if indice is None:
+                raise LookupError('no hay datos de linaje cargados')
+            v = calcular_vista(indice, objetivo, nivel, ocultar_lz)
+        return v
+
+    def servir(self, objetivo: str, nivel: str = 'tablas', ocultar_lz: bool = False,
+               if_none_match: str = None) -> tuple:
+        """
+        Respuesta http lista para el framework: (status, headers, cuerpo).
+        304 sin cuerpo si el cliente ya tiene la version (If-None-Match).
+        """
+        v = self.vista(objetivo, nivel, ocultar_lz)
+        headers = {'ETag': v['etag'], 'Cache-Control': CACHE_CONTROL}
+        if _etag_coincide(if_none_match, v['etag']):
+            return 304, headers, b''
+        headers['Content-Type'] = 'application/json; charset=utf-8'
+        return 200, headers, v['cuerpo']